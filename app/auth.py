@@ -1,10 +1,15 @@
 import firebase_admin
 from firebase_admin import credentials, auth
-from fastapi import HTTPException, Depends
+from fastapi import HTTPException, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
 from app.config import settings
+from app.rate_limit import rate_limiter
+from app.resilience import DependencyUnavailableError, firebase_breaker
+from app.tracing import trace_span
+import asyncio
 import logging
-from typing import Optional
+from typing import Any, Dict, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -35,25 +40,59 @@ def initialize_firebase():
 # Security scheme
 security = HTTPBearer()
 
-async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+def is_firebase_failure(error: BaseException) -> bool:
+    """Whether an error means Firebase could not be reached, rather than that the token is bad"""
+    return isinstance(error, (asyncio.TimeoutError, auth.CertificateFetchError))
+
+async def verify_id_token(token: str) -> Dict[str, Any]:
+    """Verify a Firebase ID token off the event loop, within the configured deadline.
+
+    Failing to reach Firebase is a 503, not a 401: the client should retry
+    with the same token rather than sign in again.
+    """
+    try:
+        with firebase_breaker.guard(is_firebase_failure), trace_span("firebase"):
+            return await asyncio.wait_for(
+                run_in_threadpool(auth.verify_id_token, token),
+                timeout=settings.firebase_verify_timeout_seconds
+            )
+    except (asyncio.TimeoutError, auth.CertificateFetchError) as e:
+        logger.error(f"Firebase unavailable during token verification: {e!r}")
+        raise DependencyUnavailableError("firebase", firebase_breaker.retry_after())
+
+async def verify_token(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
     """Verify Firebase ID token and return user ID"""
     try:
         # For development, allow dummy token
         if settings.app_env == "development" and credentials.credentials == "dummy_token":
-            return "dummy_user_id"
-        
-        # Verify with Firebase
-        decoded_token = auth.verify_id_token(credentials.credentials)
-        user_id = decoded_token['uid']
-        logger.info(f"Token verified for user: {user_id}")
-        return user_id
+            user_id = "dummy_user_id"
+        else:
+            # Verify with Firebase
+            decoded_token = await verify_id_token(credentials.credentials)
+            user_id = decoded_token['uid']
+            logger.info("Token verified for user: %s", user_id)
         
+    except DependencyUnavailableError:
+        raise
     except Exception as e:
-        logger.error(f"Token verification failed: {e}")
+        logger.error("Token verification failed: %s", e)
         raise HTTPException(
             status_code=401,
             detail="Invalid authentication credentials"
         )
+    
+    # Per-user rate limit, checked outside the try so a 429 is not turned into a 401
+    await rate_limiter.check_user(request, user_id)
+    return user_id
+
+async def verify_admin(user_id: str = Depends(verify_token)) -> str:
+    """Verify the authenticated user is an admin and return user ID"""
+    # In development with no admins configured, any authenticated user is admin
+    if not settings.admin_user_ids and settings.app_env == "development":
+        return user_id
+    if user_id not in settings.admin_user_ids:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user_id
 
 # Initialize Firebase on module import
 initialize_firebase() 
\ No newline at end of file
@@ -0,0 +1,252 @@
+from app.change_streams import ChangeEvent, change_events
+from app.config import settings
+from app.database import db_manager
+from app.metrics import metrics
+from app.models import RecitationStatus
+from app.text import normalize_name
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+import heapq
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Suggestion kinds and the recitation fields they come from
+KINDS = {
+    "reciter": "reciter_name",
+    "masjid": "masjid_name",
+    "surah": "surah_name",
+    "tag": "tags",
+}
+
+# Prefixes matching more entries than this have their results cached briefly
+_CACHED_RANGE = 256
+_MAX_CACHED = 10000
+
+
+class _Name:
+    """Popularity of one normalized name"""
+
+    __slots__ = ("spellings", "recitations", "likes")
+
+    def __init__(self):
+        self.spellings: Counter = Counter()
+        self.recitations = 0
+        self.likes = 0
+
+    @property
+    def display(self) -> str:
+        return self.spellings.most_common(1)[0][0]
+
+    @property
+    def weight(self) -> int:
+        return self.recitations + self.likes
+
+
+class AutocompleteIndex:
+    """Prefix index over the names in approved recitations.
+
+    Every word-start suffix of a normalized name is kept in one sorted list of
+    (suffix, kind, name) tuples, so a prefix lookup is two bisects plus a
+    top-k by popularity over the matching range. Short prefixes match
+    thousands of entries, so their ranking is cached for a few seconds.
+    Built from Mongo at startup and kept current from the change event bus;
+    events arriving during a rebuild are replayed onto the new index.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: List[Tuple[str, str, str]] = []
+        self._names: Dict[Tuple[str, str], _Name] = {}
+        # What each approved recitation contributes, so updates and deletes can be undone
+        self._recitations: Dict[str, Tuple[List[Tuple[str, str, str]], int]] = {}
+        # Short prefixes match thousands of names; their ranking may lag likes by a few seconds
+        self._cache: Dict[Tuple[str, Optional[str], int], Tuple[float, List[Dict[str, Any]]]] = {}
+        # Events seen while a rebuild reads Mongo, replayed onto its result
+        self._pending: Optional[List[ChangeEvent]] = None
+        self._subscribed = False
+        self.builds = 0
+        self.last_build_ms = 0.0
+        self.lookups = 0
+        metrics.register("autocomplete", self.stats)
+
+    def start(self):
+        """Build the index and follow writes"""
+        if not settings.autocomplete_enabled:
+            return
+        if not self._subscribed:
+            change_events.subscribe(self._on_change, ["recitations"])
+            self._subscribed = True
+        self.build()
+
+    def build(self):
+        """(Re)build the whole index from the approved recitations"""
+        started = time.perf_counter()
+        with self._lock:
+            self._pending = []
+        try:
+            self._build()
+        finally:
+            with self._lock:
+                self._pending = None
+        self.builds += 1
+        self.last_build_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Autocomplete index built: {len(self._names)} names in {self.last_build_ms:.0f} ms")
+
+    def _build(self):
+        cursor = db_manager.read_collection("recitations").find(
+            {"status": RecitationStatus.APPROVED.value},
+            {"reciter_name": 1, "masjid_name": 1, "surah_name": 1, "tags": 1, "likes_count": 1}
+        )
+        recitations = {str(doc["_id"]): (self._terms(doc), doc.get("likes_count", 0)) for doc in cursor}
+
+        names: Dict[Tuple[str, str], _Name] = {}
+        for terms, likes in recitations.values():
+            for kind, normalized, spelling in terms:
+                name = names.setdefault((kind, normalized), _Name())
+                name.spellings[spelling] += 1
+                name.recitations += 1
+                name.likes += likes
+        entries = sorted(entry for kind, normalized in names for entry in self._suffixes(kind, normalized))
+
+        with self._lock:
+            self._recitations = recitations
+            self._names = names
+            self._entries = entries
+            self._cache.clear()
+            # Writes that landed while the cursor was open may be missing from it
+            for event in self._pending:
+                self._apply(event)
+
+    def suggest(self, query: str, kind: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """The most popular names with a word starting with the query"""
+        prefix = normalize_name(query)
+        if not prefix:
+            return []
+        self.lookups += 1
+        with self._lock:
+            start = bisect_left(self._entries, (prefix,))
+            end = bisect_left(self._entries, (prefix + "\U0010ffff",), lo=start)
+            cache_key = (prefix, kind, limit)
+            if end - start > _CACHED_RANGE:
+                cached = self._cache.get(cache_key)
+                if cached and cached[0] > time.monotonic():
+                    return cached[1]
+            # A name matches once per word that starts with the prefix; keep it once
+            keys = {
+                (entry_kind, normalized)
+                for _, entry_kind, normalized in self._entries[start:end]
+                if kind is None or entry_kind == kind
+            }
+            best = heapq.nlargest(limit, keys, key=lambda key: (self._names[key].weight, key[1]))
+            suggestions = [
+                {
+                    "kind": entry_kind,
+                    "value": self._names[(entry_kind, normalized)].display,
+                    "recitations": self._names[(entry_kind, normalized)].recitations,
+                    "likes": self._names[(entry_kind, normalized)].likes,
+                }
+                for entry_kind, normalized in best
+            ]
+            if end - start > _CACHED_RANGE:
+                if len(self._cache) >= _MAX_CACHED:
+                    self._cache.clear()
+                self._cache[cache_key] = (time.monotonic() + settings.autocomplete_cache_seconds, suggestions)
+            return suggestions
+
+    def _on_change(self, event: ChangeEvent):
+        if event.operation == "resync":
+            self.build()
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(event)
+            self._apply(event)
+
+    def _apply(self, event: ChangeEvent):
+        """Apply one event; the caller holds the lock"""
+        recitation_id = str(event.document_id)
+        if event.operation == "delete":
+            self._remove(recitation_id)
+        elif event.full_document is not None:
+            self._remove(recitation_id)
+            if event.full_document.get("status") == RecitationStatus.APPROVED.value:
+                self._add(recitation_id, event.full_document)
+        elif "likes_count" in event.updated_fields:
+            self._set_likes(recitation_id, event.updated_fields["likes_count"])
+
+    def _add(self, recitation_id: str, doc: Dict[str, Any]):
+        terms = self._terms(doc)
+        likes = doc.get("likes_count", 0)
+        self._recitations[recitation_id] = (terms, likes)
+        for kind, normalized, spelling in terms:
+            name = self._names.get((kind, normalized))
+            if name is None:
+                name = self._names[(kind, normalized)] = _Name()
+                for entry in self._suffixes(kind, normalized):
+                    insort(self._entries, entry)
+                self._cache.clear()
+            name.spellings[spelling] += 1
+            name.recitations += 1
+            name.likes += likes
+
+    def _remove(self, recitation_id: str):
+        terms, likes = self._recitations.pop(recitation_id, ((), 0))
+        for kind, normalized, spelling in terms:
+            name = self._names[(kind, normalized)]
+            name.spellings[spelling] -= 1
+            if name.spellings[spelling] <= 0:
+                del name.spellings[spelling]
+            name.recitations -= 1
+            name.likes -= likes
+            if name.recitations <= 0:
+                del self._names[(kind, normalized)]
+                for entry in self._suffixes(kind, normalized):
+                    index = bisect_left(self._entries, entry)
+                    if index < len(self._entries) and self._entries[index] == entry:
+                        del self._entries[index]
+                self._cache.clear()
+
+    def _set_likes(self, recitation_id: str, likes: int):
+        if recitation_id not in self._recitations:
+            return
+        terms, old_likes = self._recitations[recitation_id]
+        self._recitations[recitation_id] = (terms, likes)
+        for kind, normalized, _ in terms:
+            self._names[(kind, normalized)].likes += likes - old_likes
+
+    def _terms(self, doc: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+        """(kind, normalized, spelling) for every name in a recitation, each name once"""
+        terms = {}
+        for kind, field in KINDS.items():
+            values = doc.get(field) or []
+            for value in values if isinstance(values, list) else [values]:
+                if isinstance(value, str):
+                    normalized = normalize_name(value)
+                    if normalized:
+                        terms.setdefault((kind, normalized), value.strip())
+        return [(kind, normalized, spelling) for (kind, normalized), spelling in terms.items()]
+
+    def _suffixes(self, kind: str, normalized: str) -> List[Tuple[str, str, str]]:
+        """One entry per word start, so "sud" finds "abdul rahman al sudais" """
+        words = normalized.split(" ")
+        return [(" ".join(words[i:]), kind, normalized) for i in range(len(words))]
+
+    def stats(self) -> Dict[str, Any]:
+        """Index size and build timings"""
+        return {
+            "enabled": settings.autocomplete_enabled,
+            "names": len(self._names),
+            "entries": len(self._entries),
+            "recitations": len(self._recitations),
+            "builds": self.builds,
+            "last_build_ms": round(self.last_build_ms, 1),
+            "lookups": self.lookups
+        }
+
+
+# Global autocomplete index instance
+autocomplete_index = AutocompleteIndex()
@@ -0,0 +1,430 @@
+from app.change_streams import ChangeEvent, change_events
+from app.config import settings
+from app.database import db_manager
+from app.metrics import metrics
+from app.models import RecitationStatus
+from bson import ObjectId
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+import re
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Interned string columns: column name -> recitation field
+STRING_COLUMNS = {
+    "reciter": "reciter_name",
+    "surah": "surah_name",
+    "location": "masjid_location",
+    "uploader": "uploader_id",
+}
+
+# Regex-searchable columns: search filter -> column
+SEARCH_COLUMNS = {
+    "reciter_name": "reciter",
+    "masjid_location": "location",
+    "surah_name": "surah",
+}
+
+# Search filters using any of these unescaped are real regexes; Mongo runs them under the request deadline
+_REGEX_SYNTAX = frozenset(".^$*+?{}[]|()")
+
+
+def _literal(pattern: str) -> Optional[str]:
+    """The text a pattern matches if it is plain or re.escape()d text, else None"""
+    text = []
+    escaped = False
+    for char in pattern:
+        if escaped:
+            # \d, \w and friends are classes, not escaped characters
+            if char.isalnum() or char == "_":
+                return None
+            text.append(char)
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char in _REGEX_SYNTAX:
+            return None
+        else:
+            text.append(char)
+    return None if escaped else "".join(text)
+
+
+def _with_updates(doc: Dict[str, Any], updated_fields: Dict[str, Any]) -> Dict[str, Any]:
+    """A copy of doc with a change event's updatedFields applied; dotted paths set nested values"""
+    doc = dict(doc)
+    for path, value in updated_fields.items():
+        *parents, last = path.split(".")
+        container = doc
+        for part in parents:
+            child = _get_part(container, part)
+            # Copy on the way down: the stored document may be shared with a page being served
+            child = list(child) if isinstance(child, list) else dict(child) if isinstance(child, dict) else {}
+            _set_part(container, part, child)
+            container = child
+        _set_part(container, last, value)
+    return doc
+
+
+def _get_part(container, part: str):
+    if isinstance(container, list):
+        index = int(part)
+        return container[index] if index < len(container) else None
+    return container.get(part)
+
+
+def _set_part(container, part: str, value: Any):
+    if isinstance(container, list):
+        index = int(part)
+        # Like Mongo, setting past the end pads the array with nulls
+        container.extend([None] * (index + 1 - len(container)))
+        container[index] = value
+    else:
+        container[part] = value
+
+
+def _micros(value: Optional[datetime]) -> int:
+    return (value - _EPOCH) // timedelta(microseconds=1) if value else 0
+
+
+class _Vocabulary:
+    """Interns the strings of one column as small integer codes (-1 for none)"""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, values: Iterable[str]) -> np.ndarray:
+        """Codes of the values already interned; unknown values cannot match anything"""
+        return np.array([self.codes[value] for value in values if value in self.codes], dtype=np.int32)
+
+    def matching(self, pattern: "re.Pattern") -> np.ndarray:
+        """Codes of every interned value the pattern finds a match in"""
+        return np.array(
+            [code for code, value in enumerate(self.values) if pattern.search(value)], dtype=np.int32
+        )
+
+
+class _Columns:
+    """The column arrays for one generation of the snapshot.
+
+    Rows of deleted or unapproved recitations are marked dead and reused.
+    """
+
+    def __init__(self, capacity: int):
+        capacity = max(1024, capacity)
+        self.size = 0
+        self.free: List[int] = []
+        self.rows: Dict[str, int] = {}
+        self.docs: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.created = np.zeros(capacity, dtype=np.int64)
+        self.likes = np.zeros(capacity, dtype=np.int64)
+        self.plays = np.zeros(capacity, dtype=np.int64)
+        self.strings = {column: np.full(capacity, -1, dtype=np.int32) for column in STRING_COLUMNS}
+        self.vocabularies = {column: _Vocabulary() for column in STRING_COLUMNS}
+        # Tag codes padded with -1; widened when a recitation has more tags
+        self.tags = np.full((capacity, 4), -1, dtype=np.int32)
+        self.tag_vocabulary = _Vocabulary()
+
+    def put(self, doc: Dict[str, Any]):
+        recitation_id = str(doc["_id"])
+        self.drop(recitation_id)
+        if self.free:
+            row = self.free.pop()
+        else:
+            if self.size == len(self.alive):
+                self._grow(len(self.alive) * 2)
+            row = self.size
+            self.size += 1
+
+        tags = [self.tag_vocabulary.intern(tag) for tag in dict.fromkeys(doc.get("tags") or [])]
+        if len(tags) > self.tags.shape[1]:
+            padding = np.full((len(self.tags), len(tags) - self.tags.shape[1]), -1, dtype=np.int32)
+            self.tags = np.hstack([self.tags, padding])
+        self.tags[row] = -1
+        self.tags[row, :len(tags)] = tags
+        self.created[row] = _micros(doc.get("created_at"))
+        self.likes[row] = doc.get("likes_count", 0)
+        self.plays[row] = doc.get("plays_count", 0)
+        for column, field in STRING_COLUMNS.items():
+            self.strings[column][row] = self.vocabularies[column].intern(doc.get(field))
+        self.alive[row] = True
+        self.docs[row] = doc
+        self.rows[recitation_id] = row
+
+    def drop(self, recitation_id: str):
+        row = self.rows.pop(recitation_id, None)
+        if row is None:
+            return
+        self.alive[row] = False
+        self.docs[row] = None
+        self.free.append(row)
+
+    def apply(self, event: ChangeEvent):
+        """Apply one recitations change event"""
+        recitation_id = str(event.document_id)
+        if event.operation == "delete":
+            self.drop(recitation_id)
+        elif event.full_document is not None:
+            if event.full_document.get("status") == RecitationStatus.APPROVED.value:
+                self.put(event.full_document)
+            else:
+                self.drop(recitation_id)
+        elif recitation_id in self.rows:
+            row = self.rows[recitation_id]
+            doc = _with_updates(self.docs[row], event.updated_fields)
+            if set(event.updated_fields) <= {"likes_count", "plays_count"}:
+                # Like and play counts are the hot path: patch the columns and the stored document in place
+                self.likes[row] = doc.get("likes_count", 0)
+                self.plays[row] = doc.get("plays_count", 0)
+                self.docs[row] = doc
+            elif doc.get("status") == RecitationStatus.APPROVED.value:
+                self.put(doc)
+            else:
+                self.drop(recitation_id)
+        elif event.updated_fields.get("status") == RecitationStatus.APPROVED.value:
+            # Newly approved but the event has no document; fetch it
+            doc = db_manager.get_db().recitations.find_one({"_id": ObjectId(recitation_id)})
+            if doc and doc.get("status") == RecitationStatus.APPROVED.value:
+                self.put(doc)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.strings[name][:self.size]
+
+    def has_tag(self, codes: np.ndarray) -> np.ndarray:
+        return np.isin(self.tags[:self.size], codes).any(axis=1)
+
+    def page(self, mask: np.ndarray, key: np.ndarray, skip: int, limit: int) -> List[Dict[str, Any]]:
+        """Rows in the mask, largest key first and ties by row, as documents.
+
+        Every page is cut from the same total order, so rows with equal keys
+        (the same created_at millisecond, the same engagement) are neither
+        repeated nor dropped across page boundaries.
+        """
+        rows = np.flatnonzero(mask)
+        wanted = skip + limit
+        values = key[rows]
+        if wanted < len(rows):
+            # Only rows up to the skip + limit-th largest key need sorting, including all tied with it
+            cut = -np.partition(-values, wanted - 1)[wanted - 1]
+            keep = values >= cut
+            rows, values = rows[keep], values[keep]
+        rows = rows[np.lexsort((rows, -values))][skip:wanted]
+        return [self.docs[row] for row in rows]
+
+    def _grow(self, capacity: int):
+        extra = capacity - len(self.alive)
+        self.docs.extend([None] * extra)
+        self.alive = np.concatenate([self.alive, np.zeros(extra, dtype=bool)])
+        self.created = np.concatenate([self.created, np.zeros(extra, dtype=np.int64)])
+        self.likes = np.concatenate([self.likes, np.zeros(extra, dtype=np.int64)])
+        self.plays = np.concatenate([self.plays, np.zeros(extra, dtype=np.int64)])
+        for column in STRING_COLUMNS:
+            self.strings[column] = np.concatenate([self.strings[column], np.full(extra, -1, dtype=np.int32)])
+        self.tags = np.vstack([self.tags, np.full((extra, self.tags.shape[1]), -1, dtype=np.int32)])
+
+
+class CatalogSnapshot:
+    """Columnar in-memory copy of the approved catalog.
+
+    One row per approved recitation: NumPy columns for creation time, like
+    and play counts, interned codes for the string fields and a padded matrix of
+    tag codes. Feed, search and recommendation filters run as vectorized
+    masks over the columns, and only the rows on the page are turned back
+    into documents. Built from Mongo in a background thread, kept current
+    from the change event bus and rebuilt periodically; queries return None
+    (use Mongo) until the first build has finished.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._columns: Optional[_Columns] = None
+        # Events that arrive while a build reads Mongo, replayed onto the new columns
+        self._pending: Optional[List[ChangeEvent]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._rebuild_now = threading.Event()
+        self._subscribed = False
+        self.builds = 0
+        self.last_build_ms = 0.0
+        self.served = 0
+        self.fallbacks = 0
+        self.events = 0
+        metrics.register("catalog_snapshot", self.stats)
+
+    @property
+    def ready(self) -> bool:
+        return self._columns is not None
+
+    def start(self):
+        """Follow writes and build (then periodically rebuild) in a daemon thread"""
+        if not settings.catalog_snapshot_enabled or self._thread:
+            return
+        if not self._subscribed:
+            change_events.subscribe(self._on_change, ["recitations"])
+            self._subscribed = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="catalog-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop rebuilding and drop the snapshot; queries fall back to Mongo"""
+        if not self._thread:
+            return
+        self._stop.set()
+        self._rebuild_now.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+        with self._lock:
+            self._columns = None
+
+    def build(self):
+        """(Re)build every column from the approved recitations"""
+        started = time.perf_counter()
+        with self._lock:
+            self._pending = []
+        try:
+            docs = list(db_manager.read_collection("recitations").find({"status": RecitationStatus.APPROVED.value}))
+            columns = _Columns(len(docs))
+            for doc in docs:
+                columns.put(doc)
+            with self._lock:
+                # Replaying is safe for writes the read already saw: events carry whole values
+                for event in self._pending:
+                    columns.apply(event)
+                self._columns = columns
+        finally:
+            with self._lock:
+                self._pending = None
+        self.builds += 1
+        self.last_build_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Catalog snapshot built: {len(docs)} recitations in {self.last_build_ms:.0f} ms")
+
+    # Queries; each returns None when the snapshot cannot answer and Mongo should
+
+    def feed(self, skip: int, limit: int, uploader_id: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """Newest approved recitations, optionally only one uploader's"""
+        with self._lock:
+            columns = self._columns
+            if columns is None:
+                return self._fallback()
+            mask = columns.alive[:columns.size].copy()
+            if uploader_id is not None:
+                mask &= np.isin(columns.column("uploader"), columns.vocabularies["uploader"].lookup([uploader_id]))
+            return self._served(columns.page(mask, columns.created, skip, limit))
+
+    def search(self, filters: Dict[str, Any], skip: int, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """search_recitations filters (case-insensitive substrings, any-of tags), newest first.
+
+        Only literal (or re.escape()d) text filters are answered here. A
+        pattern using regex syntax could backtrack for seconds while holding
+        the lock on the event loop, so it goes to Mongo instead.
+        """
+        patterns = {}
+        for field in SEARCH_COLUMNS:
+            if filters.get(field):
+                text = _literal(filters[field])
+                if text is None:
+                    return self._fallback()
+                patterns[field] = re.compile(re.escape(text), re.IGNORECASE)
+        with self._lock:
+            columns = self._columns
+            if columns is None:
+                return self._fallback()
+            mask = columns.alive[:columns.size].copy()
+            for field, column in SEARCH_COLUMNS.items():
+                pattern = patterns.get(field)
+                if pattern is not None:
+                    # The pattern runs once per distinct value, not once per recitation
+                    mask &= np.isin(columns.column(column), columns.vocabularies[column].matching(pattern))
+            if filters.get("tags"):
+                mask &= columns.has_tag(columns.tag_vocabulary.lookup(filters["tags"]))
+            return self._served(columns.page(mask, columns.created, skip, limit))
+
+    def recommend(self, exclude_ids: List[str], reciters: Iterable[str], surahs: Iterable[str],
+                  tags: Iterable[str], limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Most engaged (likes plus weighted plays) approved recitations sharing a
+        reciter, surah or tag (any when none given)"""
+        with self._lock:
+            columns = self._columns
+            if columns is None:
+                return self._fallback()
+            mask = columns.alive[:columns.size].copy()
+            reciter_codes = columns.vocabularies["reciter"].lookup(reciters)
+            surah_codes = columns.vocabularies["surah"].lookup(surahs)
+            tag_codes = columns.tag_vocabulary.lookup(tags)
+            if reciters or surahs or tags:
+                mask &= (
+                    np.isin(columns.column("reciter"), reciter_codes)
+                    | np.isin(columns.column("surah"), surah_codes)
+                    | columns.has_tag(tag_codes)
+                )
+            for recitation_id in exclude_ids:
+                row = columns.rows.get(recitation_id)
+                if row is not None:
+                    mask[row] = False
+            engagement = columns.likes[:columns.size] + settings.recommendation_play_weight * columns.plays[:columns.size]
+            return self._served(columns.page(mask, engagement, 0, limit))
+
+    def _on_change(self, event: ChangeEvent):
+        if event.operation == "resync":
+            self._rebuild_now.set()
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(event)
+            if self._columns is not None:
+                self.events += 1
+                self._columns.apply(event)
+
+    def _served(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        self.served += 1
+        return docs
+
+    def _fallback(self) -> None:
+        self.fallbacks += 1
+        return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.build()
+            except Exception as e:
+                logger.error(f"Catalog snapshot build failed: {e}")
+            # Rebuilds pick up writes the bus never saw (scripts, other instances without change streams)
+            self._rebuild_now.wait(settings.catalog_snapshot_rebuild_seconds)
+            self._rebuild_now.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot size, build timings and how many queries it answered"""
+        columns = self._columns
+        return {
+            "enabled": settings.catalog_snapshot_enabled,
+            "ready": columns is not None,
+            "recitations": len(columns.rows) if columns else 0,
+            "tags": len(columns.tag_vocabulary.values) if columns else 0,
+            "builds": self.builds,
+            "last_build_ms": round(self.last_build_ms, 1),
+            "served": self.served,
+            "fallbacks": self.fallbacks,
+            "events": self.events
+        }
+
+
+# Global catalog snapshot instance
+catalog_snapshot = CatalogSnapshot()
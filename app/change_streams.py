@@ -0,0 +1,262 @@
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
+from app.config import settings
+from app.database import db_manager
+from app.metrics import metrics
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import logging
+import os
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+WATCHED_COLLECTIONS = ["recitations", "likes"]
+
+# Server error codes meaning the stored resume token can no longer be used
+_RESUME_TOKEN_LOST_CODES = {260, 280, 286}
+
+# Worker slots tried per host before giving up on claiming one
+_MAX_SLOTS = 64
+
+
+class ChangeEvent:
+    """A write to a watched collection, from the change stream or a local write"""
+
+    def __init__(self, collection: str, operation: str, document_id: Any = None,
+                 full_document: Optional[Dict[str, Any]] = None,
+                 updated_fields: Optional[Dict[str, Any]] = None,
+                 removed_fields: Optional[List[str]] = None,
+                 source: str = "local"):
+        self.collection = collection
+        self.operation = operation  # insert, update, replace, delete or resync
+        self.document_id = document_id
+        self.full_document = full_document
+        self.updated_fields = updated_fields or {}
+        self.removed_fields = removed_fields or []
+        self.source = source
+
+    @classmethod
+    def from_change(cls, change: Dict[str, Any]) -> "ChangeEvent":
+        """Build an event from a raw change stream document"""
+        description = change.get("updateDescription") or {}
+        return cls(
+            collection=change["ns"]["coll"],
+            operation=change["operationType"],
+            document_id=(change.get("documentKey") or {}).get("_id"),
+            full_document=change.get("fullDocument"),
+            updated_fields=description.get("updatedFields"),
+            removed_fields=description.get("removedFields"),
+            source="stream"
+        )
+
+    def __repr__(self):
+        return f"ChangeEvent({self.collection}, {self.operation}, {self.document_id})"
+
+
+class ChangeEventBus:
+    """Fans change events out to in-process subscribers.
+
+    Subscribers may be called from the change stream thread, so they must be
+    thread-safe or hand the event over to their own loop.
+    """
+
+    def __init__(self):
+        self._subscribers: List[tuple] = []
+        self.stream_active = False
+        self.published = 0
+
+    def subscribe(self, callback: Callable[[ChangeEvent], None], collections: Optional[Iterable[str]] = None):
+        """Call callback for every event on the given collections (all when None)"""
+        self._subscribers.append((callback, set(collections) if collections else None))
+
+    def publish(self, event: ChangeEvent):
+        """Deliver an event to every matching subscriber"""
+        self.published += 1
+        for callback, collections in self._subscribers:
+            if collections is not None and event.collection not in collections and event.operation != "resync":
+                continue
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Change event subscriber failed on {event}: {e}")
+
+    def publish_local(self, event: ChangeEvent):
+        """Publish a write made by this process, unless the change stream will deliver it"""
+        if not self.stream_active:
+            self.publish(event)
+
+
+class ChangeStreamConsumer:
+    """Watches recitations and likes in a background thread and feeds the event bus"""
+
+    def __init__(self, bus: ChangeEventBus):
+        self.bus = bus
+        # Workers on a host must not share a position, so each claims a slot
+        # (<prefix>-<n>) with its own resume token; a restarted worker takes
+        # the slot its predecessor released and resumes from its token
+        self.prefix = settings.change_stream_consumer_name or socket.gethostname()
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.name: Optional[str] = None
+        self.db: Optional[Database] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._resume_token = None
+        self._last_saved = 0.0
+        self.events = 0
+        self.restarts = 0
+        metrics.register("change_stream", self.stats)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, db: Optional[Database] = None):
+        """Start consuming in a daemon thread"""
+        if self.running:
+            return
+        self.db = db if db is not None else db_manager.get_db()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-stream-consumer", daemon=True)
+        self._thread.start()
+        logger.info("Change stream consumer started")
+
+    def stop(self):
+        """Stop consuming and persist the last resume token"""
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+        self.bus.stream_active = False
+        if self.name is not None:
+            self._save_token(force=True)
+            self._release_slot()
+        logger.info(f"Change stream consumer '{self.name}' stopped")
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                if self.name is None:
+                    self.name = self._claim_slot()
+                    self._resume_token = self._load_token()
+                    logger.info(f"Change stream consumer claimed slot '{self.name}'")
+                with self.db.watch(
+                    pipeline=[{"$match": {"ns.coll": {"$in": WATCHED_COLLECTIONS}}}],
+                    full_document="updateLookup",
+                    resume_after=self._resume_token,
+                    max_await_time_ms=settings.change_stream_max_await_ms
+                ) as stream:
+                    self.bus.stream_active = True
+                    backoff = 1.0
+                    while not self._stop.is_set() and stream.alive:
+                        change = stream.try_next()
+                        self._resume_token = stream.resume_token
+                        if change is not None:
+                            self.events += 1
+                            self.bus.publish(ChangeEvent.from_change(change))
+                        self._save_token()
+            except OperationFailure as e:
+                # Until the stream is back, local writes are published directly
+                self.bus.stream_active = False
+                if e.code in _RESUME_TOKEN_LOST_CODES:
+                    # The oplog moved past our token: start fresh and tell
+                    # subscribers their derived state may have missed writes
+                    logger.warning(f"Change stream resume token lost, resyncing: {e}")
+                    self._resume_token = None
+                    self._save_token(force=True)
+                    self.bus.publish(ChangeEvent(collection="*", operation="resync"))
+                else:
+                    logger.error(f"Change stream failed: {e}")
+                    self._wait(backoff)
+                    backoff = min(backoff * 2, 30)
+                self.restarts += 1
+            except Exception as e:
+                # Anything else (a PyMongoError, a bad event) must not end the thread silently
+                self.bus.stream_active = False
+                logger.error(f"Change stream failed: {e}")
+                self.restarts += 1
+                self._wait(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def _wait(self, seconds: float):
+        self._stop.wait(seconds)
+
+    def _claim_slot(self) -> str:
+        """Claim the lowest slot on this host that no live worker holds"""
+        now = datetime.utcnow()
+        for index in range(_MAX_SLOTS):
+            name = f"{self.prefix}-{index}"
+            try:
+                self.db.change_stream_tokens.update_one(
+                    {"_id": name, "$or": [{"owner": self.worker_id}, {"lease_expires_at": {"$lt": now}},
+                                          {"owner": {"$exists": False}}]},
+                    {"$set": {"owner": self.worker_id, "lease_expires_at": self._lease_expiry(now)}},
+                    upsert=True
+                )
+                return name
+            except DuplicateKeyError:
+                # Held by a live worker: the upsert tried to insert a second slot
+                continue
+        raise RuntimeError(f"All {_MAX_SLOTS} change stream slots for '{self.prefix}' are held")
+
+    def _release_slot(self):
+        """Let the next worker on this host take the slot without waiting for the lease"""
+        try:
+            self.db.change_stream_tokens.update_one(
+                {"_id": self.name, "owner": self.worker_id},
+                {"$unset": {"owner": "", "lease_expires_at": ""}}
+            )
+        except PyMongoError as e:
+            logger.error(f"Failed to release change stream slot: {e}")
+
+    def _lease_expiry(self, now: datetime) -> datetime:
+        return now + timedelta(seconds=settings.change_stream_slot_lease_seconds)
+
+    def _load_token(self):
+        try:
+            state = self.db.change_stream_tokens.find_one({"_id": self.name})
+            return state.get("resume_token") if state else None
+        except PyMongoError as e:
+            logger.error(f"Failed to load change stream resume token: {e}")
+            return None
+
+    def _save_token(self, force: bool = False):
+        """Persist the resume token, at most once per save interval unless forced"""
+        now = time.monotonic()
+        if not force and now - self._last_saved < settings.change_stream_token_save_interval:
+            return
+        self._last_saved = now
+        try:
+            # Saving also renews the slot lease
+            utcnow = datetime.utcnow()
+            result = self.db.change_stream_tokens.update_one(
+                {"_id": self.name, "owner": self.worker_id},
+                {"$set": {"resume_token": self._resume_token, "updated_at": utcnow,
+                          "lease_expires_at": self._lease_expiry(utcnow)}}
+            )
+            if result.matched_count == 0:
+                # The lease lapsed and another worker took the slot: move to a free one
+                self.name = self._claim_slot()
+                logger.warning(f"Change stream slot lease lapsed, moved to '{self.name}'")
+                self._save_token(force=True)
+        except PyMongoError as e:
+            logger.error(f"Failed to save change stream resume token: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Consumer state and event counters"""
+        return {
+            "running": self.running,
+            "slot": self.name,
+            "events": self.events,
+            "restarts": self.restarts,
+            "published": self.bus.published
+        }
+
+
+# Global change event bus and consumer instances
+change_events = ChangeEventBus()
+change_stream_consumer = ChangeStreamConsumer(change_events)
@@ -0,0 +1,140 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+from typing import Optional
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is used when it is missing
+    brotli = None
+
+# Responses that are already compressed or must reach the client unbuffered
+_SKIPPED_CONTENT_TYPES = ("text/event-stream", "audio/", "image/", "video/", "application/zip", "application/gzip")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported encoding from an Accept-Encoding header"""
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.strip()] = quality
+    wildcard = accepted.get("*", 0.0)
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+class _Encoder:
+    """Incremental gzip or brotli encoder"""
+
+    def __init__(self, coding: str):
+        self.coding = coding
+        if coding == "br":
+            self._compressor = brotli.Compressor(quality=settings.compression_brotli_quality)
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._compressor = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        """Compress a chunk; flush makes everything so far decodable by the client"""
+        if self.coding == "br":
+            return self._compressor.process(data) + (self._compressor.flush() if flush else b"")
+        return self._compressor.compress(data) + (self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else b"")
+
+    def finish(self, data: bytes) -> bytes:
+        if self.coding == "br":
+            return self._compressor.process(data) + self._compressor.finish()
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """Compresses responses with brotli or gzip, negotiated per request.
+
+    Small bodies are sent as-is. Streaming bodies are compressed chunk by
+    chunk and flushed, so clients still see each chunk as it is produced.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        if any(path.startswith(prefix) for prefix in settings.compression_excluded_paths):
+            await self.app(scope, receive, send)
+            return
+        coding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = (
+                    "content-encoding" in headers
+                    or content_type.startswith(_SKIPPED_CONTENT_TYPES)
+                    or message["status"] in (204, 304)
+                )
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                initial, start_message = start_message, None
+                headers = MutableHeaders(raw=initial["headers"])
+                if not passthrough:
+                    headers.add_vary_header("Accept-Encoding")
+                if passthrough or (len(body) < self.minimum_size and not more_body):
+                    passthrough = True
+                    await send(initial)
+                    await send(message)
+                    return
+                encoder = _Encoder(coding)
+                headers["Content-Encoding"] = coding
+                # The encoded bytes differ from the identity ones, so the validator becomes weak
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+                if more_body:
+                    del headers["Content-Length"]
+                    body = encoder.compress(body, flush=True)
+                else:
+                    body = encoder.finish(body)
+                    headers["Content-Length"] = str(len(body))
+                await send(initial)
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            if passthrough:
+                await send(message)
+                return
+            body = encoder.compress(body, flush=True) if more_body else encoder.finish(body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,17 +1,31 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 import os
 
 
 class Settings(BaseSettings):
     # MongoDB Configuration
     mongodb_uri: str = "mongodb://localhost:27017"
+    mongodb_max_pool_size: int = 100
+    mongodb_min_pool_size: int = 0
+    mongodb_max_idle_time_ms: int = 0  # 0 keeps idle connections open
+    mongodb_wait_queue_timeout_ms: int = 2000
+    mongodb_server_selection_timeout_ms: int = 5000
+    mongodb_connect_timeout_ms: int = 5000
+    mongodb_socket_timeout_ms: int = 20000
+    mongodb_compressors: str = ""  # e.g. "zstd,snappy,zlib"
+    # Read preference for feed, search and recommendation reads; writes always go to the primary
+    mongodb_read_routing: str = "primary"
+    mongodb_max_staleness_seconds: int = -1  # -1 means no limit, otherwise at least 90
     
     # AWS S3 Configuration
     aws_access_key_id: str = ""
     aws_secret_access_key: str = ""
     aws_region: str = "us-east-1"
     bucket_name: str = "quran-recitations-bucket"
+    s3_multipart_threshold_mb: int = 16
+    s3_multipart_chunk_mb: int = 8
+    s3_multipart_concurrency: int = 4
     
     # Firebase Configuration
     firebase_project_id: str = ""
@@ -27,6 +41,150 @@ class Settings(BaseSettings):
     # App Configuration
     app_env: str = "development"
     cors_origins: List[str] = ["http://localhost:3000", "http://localhost:3001"]
+    admin_user_ids: List[str] = []
+    
+    # Rate Limiting Configuration
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"  # "memory" (per worker) or "redis" (shared)
+    rate_limit_redis_url: str = "redis://localhost:6379/0"
+    rate_limit_trust_forwarded: bool = False
+    rate_limit_default_ip: str = "300/minute"
+    rate_limit_default_user: str = "120/minute"
+    rate_limit_routes: Dict[str, str] = {
+        "/api/v1/search": "30/minute",
+        "/api/v1/likes": "30/minute",
+    }
+    max_inflight_requests: int = 64
+    
+    # HTTP Caching Configuration
+    cache_control_feed: str = "private, no-cache"
+    cache_control_recitation: str = "private, max-age=30, must-revalidate"
+    cache_control_search: str = "private, max-age=15"
+    cache_control_recommendations: str = "private, max-age=60"
+    cache_control_autocomplete: str = "public, max-age=60"
+    cache_control_nearby: str = "private, max-age=60"
+    cache_control_tags: str = "public, max-age=60"
+    cache_control_reciter: str = "public, max-age=60"
+    
+    # Response Compression Configuration
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024  # bytes; smaller bodies are sent uncompressed
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4  # used when the brotli package is installed
+    compression_excluded_paths: List[str] = []
+    
+    # Autocomplete Configuration
+    autocomplete_enabled: bool = True
+    autocomplete_cache_seconds: float = 5.0  # how long popularity ranking of short prefixes may lag
+    
+    # Nearby Search Configuration
+    gazetteer_path: str = ""  # JSON masjid registry; defaults to the bundled app/data/masjids.json
+    nearby_default_radius_km: float = 25.0
+    nearby_max_radius_km: float = 200.0
+    nearby_max_candidates: int = 500  # nearest approved recitations ranked per request
+    nearby_recency_half_life_days: float = 30.0
+    nearby_recency_weight: float = 0.5  # 0 ranks by distance only, 1 by recency only
+    
+    # Catalog Snapshot Configuration (in-memory copy of approved recitations for feed, search and recommendations)
+    catalog_snapshot_enabled: bool = False
+    catalog_snapshot_rebuild_seconds: float = 300.0  # picks up writes the change event bus did not see
+    
+    # Play Event Configuration
+    play_events_enabled: bool = True
+    play_flush_interval_seconds: float = 2.0  # plays buffered since the last flush are lost on a crash
+    play_buffer_max_recitations: int = 100000  # distinct recitations buffered before an early flush
+    play_batch_max_events: int = 1000
+    recommendation_play_weight: float = 0.1  # a play counts as this many likes when ranking recommendations
+    recommendation_candidate_factor: int = 5  # candidates read per sort order, as a multiple of the limit
+    
+    # Live Updates Configuration (Server-Sent Events)
+    live_updates_enabled: bool = True
+    live_updates_window_ms: int = 1000  # like changes are coalesced and sent once per window
+    live_updates_heartbeat_seconds: float = 15.0
+    live_updates_retry_ms: int = 3000  # client reconnect delay sent in the stream
+    live_updates_max_ids: int = 200
+    live_updates_max_connections: int = 20000  # per worker
+    
+    # Tag Statistics Configuration
+    tag_stats_enabled: bool = True
+    tag_stats_reconcile_interval_seconds: float = 3600.0  # 0 leaves reconciling to scripts/reconcile_tag_stats.py
+    tag_cooccurrence_max_tags: int = 20  # tags per recitation that form related-tag pairs
+    
+    # Reciter Profile Configuration
+    reciter_profiles_enabled: bool = True
+    reciter_latest_uploads: int = 10
+    
+    # Playlist Configuration
+    playlist_max_items: int = 5000
+    
+    # Delta Sync Configuration
+    sync_tombstone_retention_days: int = 30  # older sync tokens get 410 and must sync from scratch
+    sync_settle_seconds: float = 5.0  # how far behind now a sync window ends
+    
+    # Change Stream Configuration (requires a replica set)
+    change_streams_enabled: bool = False
+    change_stream_consumer_name: str = ""  # prefix for the per-worker slots (<prefix>-<n>); defaults to the hostname
+    change_stream_max_await_ms: int = 1000
+    change_stream_token_save_interval: float = 5.0
+    change_stream_slot_lease_seconds: float = 60.0  # renewed on every token save; a crashed worker's slot frees after this
+    
+    # Sharded Like Counter Configuration
+    like_shards_enabled: bool = True
+    like_shard_count: int = 16
+    like_shard_promote_likes: int = 50  # likes within the window that promote a recitation
+    like_shard_promote_window_seconds: float = 10.0
+    like_shard_rollup_interval_seconds: float = 5.0
+    like_shard_lease_seconds: float = 30.0  # one worker rolls up; others take over once its lease lapses
+    like_shard_reconcile_interval_seconds: float = 300.0  # 0 disables reconciling against the likes collection
+    
+    # Resilience Configuration (circuit breakers and deadlines for Mongo, S3 and Firebase)
+    circuit_breaker_enabled: bool = True
+    circuit_breaker_window: int = 20  # recent calls whose outcomes are considered
+    circuit_breaker_min_calls: int = 10  # calls in the window before the breaker can open
+    circuit_breaker_failure_ratio: float = 0.5
+    circuit_breaker_reset_seconds: float = 10.0  # time open before probing again
+    mongodb_request_deadline_ms: int = 3000  # total Mongo time per API request; 0 disables
+    s3_connect_timeout_seconds: float = 3.0
+    s3_read_timeout_seconds: float = 30.0
+    s3_max_attempts: int = 2  # including the first attempt
+    firebase_verify_timeout_seconds: float = 3.0
+    feed_fallback_pages: int = 100  # last good public feed pages kept for when Mongo is down
+    feed_fallback_max_age_seconds: float = 600.0
+    
+    # Logging Configuration
+    log_level: str = "INFO"
+    log_format: str = "json"  # "json" (one object per line) or "text"
+    log_async: bool = True  # format and write records on a background thread
+    log_queue_size: int = 10000  # records beyond this are dropped rather than blocking requests
+    log_flush_interval_ms: int = 50
+    log_sample_rates: Dict[str, float] = {"app.auth": 0.01}  # logger -> fraction of INFO/DEBUG records kept
+    log_error_burst: int = 10  # warnings/errors per call site per window; 0 disables the limit
+    log_error_window_seconds: float = 60.0
+    
+    # Request Tracing Configuration
+    tracing_enabled: bool = True
+    slow_request_threshold_ms: float = 500.0
+    slow_request_max_commands: int = 50
+    
+    # Debug Profiling Configuration (admin-only endpoints, not mounted unless enabled)
+    debug_endpoints_enabled: bool = False
+    profiler_sample_interval_ms: float = 10.0
+    profiler_max_seconds: int = 120
+    tracemalloc_frames: int = 10
+    
+    # Audio Fingerprint Configuration (needs ffmpeg on the PATH)
+    fingerprint_enabled: bool = True
+    fingerprint_workers: int = 2
+    fingerprint_ffmpeg_path: str = "ffmpeg"
+    fingerprint_max_seconds: int = 900  # only the start of long recordings is fingerprinted
+    fingerprint_decode_timeout_seconds: int = 300
+    fingerprint_query_hashes: int = 2000
+    fingerprint_min_score: float = 0.1  # share (0-1) of the shorter recording's hashes aligned at one offset
+    fingerprint_max_candidates: int = 5
+    
+    # Export Configuration
+    export_batch_size: int = 2000
+    export_settle_seconds: float = 60.0  # how far behind now an export window ends; must exceed replication lag
     
     class Config:
         env_file = ".env"
@@ -1,19 +1,178 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, monitoring
+from pymongo.collection import Collection
 from pymongo.database import Database
+from pymongo.read_preferences import (
+    Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+)
 from app.config import settings
+from app.metrics import metrics
+from app.resilience import MONGO_FAILURE_CODES, MONGO_FAILURE_TYPES, mongo_breaker
+from app.tracing import mongo_tracer
+from typing import Any, Dict
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+_READ_PREFERENCES = {
+    "primary": Primary,
+    "primarypreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondarypreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Tracks connection pool utilization from pymongo's pool events.
+
+    pymongo keeps one pool per server, each capped at maxPoolSize, so
+    utilization is reported per server rather than summed across them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checked_out_by_server: Dict[str, int] = {}
+        self.checkouts = 0
+        self.checkout_failures: Dict[str, int] = {}
+        self.pool_clears = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self.checked_out_by_server.pop(self._server(event), None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+
+    def connection_checked_out(self, event):
+        server = self._server(event)
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.checked_out_by_server[server] = self.checked_out_by_server.get(server, 0) + 1
+
+    def connection_checked_in(self, event):
+        server = self._server(event)
+        with self._lock:
+            self.checked_out -= 1
+            if server in self.checked_out_by_server:
+                self.checked_out_by_server[server] -= 1
+
+    @staticmethod
+    def _server(event) -> str:
+        host, port = event.address
+        return f"{host}:{port}"
+
+    @staticmethod
+    def _utilization(checked_out: int):
+        # maxPoolSize=0 means unbounded pools, which have no utilization
+        if not settings.mongodb_max_pool_size:
+            return None
+        return round(checked_out / settings.mongodb_max_pool_size, 4)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool utilization snapshot"""
+        with self._lock:
+            busiest = max(self.checked_out_by_server.values(), default=0)
+            return {
+                "max_pool_size": settings.mongodb_max_pool_size,
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                # The busiest server's pool; that is the one requests queue on
+                "utilization": self._utilization(busiest),
+                "servers": {
+                    server: {"checked_out": checked_out, "utilization": self._utilization(checked_out)}
+                    for server, checked_out in self.checked_out_by_server.items()
+                },
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "pool_clears": self.pool_clears
+            }
+
+
+class BreakerListener(monitoring.CommandListener, monitoring.ServerHeartbeatListener):
+    """Feeds command outcomes and the primary's heartbeats into the Mongo circuit breaker.
+
+    Listening to pymongo's events covers every collection call in the app
+    without wrapping each one. Heartbeats count only for the server that last
+    reported itself writable, so a dead secondary cannot open the breaker
+    while the primary is healthy.
+    """
+
+    def __init__(self):
+        self.primary = None
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        if isinstance(event, monitoring.ServerHeartbeatSucceededEvent):
+            if event.reply.is_writable:
+                self.primary = event.connection_id
+            elif event.connection_id == self.primary:
+                # Stepped down; the next writable server's heartbeat takes over
+                self.primary = None
+                return
+            if event.connection_id == self.primary:
+                mongo_breaker.record_success()
+            return
+        mongo_breaker.record_success()
+
+    def failed(self, event):
+        if isinstance(event, monitoring.ServerHeartbeatFailedEvent):
+            if event.connection_id == self.primary:
+                mongo_breaker.record_failure()
+            return
+        failure = event.failure or {}
+        if failure.get("errtype") in MONGO_FAILURE_TYPES or failure.get("code") in MONGO_FAILURE_CODES:
+            mongo_breaker.record_failure()
+        else:
+            mongo_breaker.record_success()
+
+
 class DatabaseManager:
     def __init__(self):
         self.client: MongoClient = None
         self.db: Database = None
-    
+        self.pool_stats = PoolStatsListener()
+        self.breaker = mongo_breaker
+        self.read_preference = self._build_read_preference()
+        metrics.register("mongodb_pool", self.pool_stats.stats)
+
     def connect(self):
         """Connect to MongoDB"""
         try:
-            self.client = MongoClient(settings.mongodb_uri)
+            self.client = MongoClient(settings.mongodb_uri, **self._client_options())
             self.db = self.client.quranApp
             # Test the connection
             self.client.admin.command('ping')
@@ -21,18 +180,53 @@ class DatabaseManager:
         except Exception as e:
             logger.error(f"Failed to connect to MongoDB: {e}")
             raise
-    
+
     def disconnect(self):
         """Disconnect from MongoDB"""
         if self.client:
             self.client.close()
             logger.info("Disconnected from MongoDB")
-    
+
     def get_db(self) -> Database:
         """Get the database instance"""
-        if not self.db:
+        if self.db is None:
             self.connect()
         return self.db
 
+    def read_collection(self, name: str) -> Collection:
+        """Get a collection for read-heavy routes, using the configured read routing.
+
+        Writes and read-your-own-write paths should keep using the primary collection.
+        """
+        return self.get_db().get_collection(name, read_preference=self.read_preference)
+
+    def _client_options(self) -> Dict[str, Any]:
+        """Build MongoClient options from settings"""
+        options = {
+            "maxPoolSize": settings.mongodb_max_pool_size,
+            "minPoolSize": settings.mongodb_min_pool_size,
+            "waitQueueTimeoutMS": settings.mongodb_wait_queue_timeout_ms,
+            "serverSelectionTimeoutMS": settings.mongodb_server_selection_timeout_ms,
+            "connectTimeoutMS": settings.mongodb_connect_timeout_ms,
+            "socketTimeoutMS": settings.mongodb_socket_timeout_ms,
+            "event_listeners": [self.pool_stats, BreakerListener()],
+        }
+        if settings.tracing_enabled:
+            options["event_listeners"].append(mongo_tracer)
+        if settings.mongodb_max_idle_time_ms:
+            options["maxIdleTimeMS"] = settings.mongodb_max_idle_time_ms
+        if settings.mongodb_compressors:
+            options["compressors"] = settings.mongodb_compressors
+        return options
+
+    def _build_read_preference(self):
+        """Read preference for routes that tolerate bounded staleness"""
+        mode = _READ_PREFERENCES.get(settings.mongodb_read_routing.lower())
+        if mode is None:
+            raise ValueError(f"Unknown read preference '{settings.mongodb_read_routing}'")
+        if mode is Primary:
+            return Primary()
+        return mode(max_staleness=settings.mongodb_max_staleness_seconds)
+
 # Global database manager instance
-db_manager = DatabaseManager() 
\ No newline at end of file
+db_manager = DatabaseManager()
@@ -0,0 +1,161 @@
+from app.config import settings
+from app.database import db_manager
+from bson import ObjectId
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+import json
+import logging
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed for Parquet exports
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# Exportable collections and the timestamp used for incremental exports
+EXPORT_COLLECTIONS = {
+    "recitations": "updated_at",
+    "likes": "created_at",
+}
+
+# NDJSON lines are grouped into chunks of about this many bytes
+NDJSON_CHUNK_SIZE = 64 * 1024
+
+
+def _serialize(value: Any) -> Any:
+    """Convert BSON values into JSON-friendly ones"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: _serialize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_serialize(item) for item in value]
+    return value
+
+
+def export_window_end() -> datetime:
+    """Where an export started now ends, and the next incremental one starts.
+
+    export_settle_seconds behind now, so writes stamped just before the end
+    but committed (or replicated to the secondary being read) just after it
+    are not skipped. Millisecond precision, like the stored timestamps.
+    """
+    end = datetime.utcnow() - timedelta(seconds=settings.export_settle_seconds)
+    return end.replace(microsecond=end.microsecond // 1000 * 1000)
+
+
+def iter_documents(collection: str, since: Optional[datetime] = None,
+                   batch_size: Optional[int] = None, after_id: Optional[ObjectId] = None,
+                   until: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+    """Stream a collection from a server-side cursor in (timestamp, _id) order.
+
+    Exports the documents after (since, after_id) and up to until (default
+    export_window_end()). The window end is the since for the next
+    incremental export; an interrupted export resumes from the timestamp
+    and _id of the last document it wrote. Only one cursor batch is held in
+    memory at a time.
+    """
+    if collection not in EXPORT_COLLECTIONS:
+        raise ValueError(f"Unknown export collection '{collection}'")
+    field = EXPORT_COLLECTIONS[collection]
+    query: Dict[str, Any] = {field: {"$lte": until or export_window_end()}}
+    if since and after_id:
+        # Documents sharing the resume timestamp continue after the last _id
+        query[field]["$gte"] = since
+        query["$or"] = [{field: {"$gt": since}}, {"_id": {"$gt": after_id}}]
+    elif since:
+        query[field]["$gt"] = since
+    cursor = db_manager.read_collection(collection).find(
+        query,
+        sort=[(field, 1), ("_id", 1)],
+        batch_size=batch_size or settings.export_batch_size
+    )
+    try:
+        for doc in cursor:
+            yield doc
+    finally:
+        cursor.close()
+
+
+def iter_ndjson(collection: str, since: Optional[datetime] = None, batch_size: Optional[int] = None,
+                documents: Optional[Iterator[Dict[str, Any]]] = None, after_id: Optional[ObjectId] = None,
+                until: Optional[datetime] = None) -> Iterator[bytes]:
+    """Stream a collection (or an already open document stream) as NDJSON chunks"""
+    if documents is None:
+        documents = iter_documents(collection, since, batch_size, after_id, until)
+    buffer: List[str] = []
+    size = 0
+    for doc in documents:
+        line = json.dumps(_serialize(doc), ensure_ascii=False) + "\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= NDJSON_CHUNK_SIZE:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def _parquet_schema(collection: str):
+    if collection == "recitations":
+        return pa.schema([
+            ("id", pa.string()),
+            ("title", pa.string()),
+            ("reciter_name", pa.string()),
+            ("masjid_name", pa.string()),
+            ("masjid_location", pa.string()),
+            ("surah_name", pa.string()),
+            ("surah_number", pa.int32()),
+            ("ayah_start", pa.int32()),
+            ("ayah_end", pa.int32()),
+            ("description", pa.string()),
+            ("tags", pa.list_(pa.string())),
+            ("uploader_id", pa.string()),
+            ("audio_url", pa.string()),
+            ("status", pa.string()),
+            ("likes_count", pa.int64()),
+            ("created_at", pa.timestamp("ms")),
+            ("updated_at", pa.timestamp("ms")),
+        ])
+    return pa.schema([
+        ("id", pa.string()),
+        ("user_id", pa.string()),
+        ("recitation_id", pa.string()),
+        ("created_at", pa.timestamp("ms")),
+    ])
+
+
+def write_parquet(collection: str, path: str, since: Optional[datetime] = None,
+                  batch_size: Optional[int] = None, row_group_size: int = 50000,
+                  after_id: Optional[ObjectId] = None) -> Dict[str, Any]:
+    """Write a collection to a Parquet file one row group at a time; the watermark is the window end"""
+    if pa is None:
+        raise RuntimeError("The pyarrow package is required for Parquet exports: pip install pyarrow")
+    schema = _parquet_schema(collection)
+    columns = {name: [] for name in schema.names}
+    rows = 0
+    watermark = export_window_end()
+
+    def flush(writer):
+        writer.write_table(pa.table(columns, schema=schema))
+        for values in columns.values():
+            values.clear()
+
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for doc in iter_documents(collection, since, batch_size, after_id, watermark):
+            doc["id"] = str(doc["_id"])
+            for name, values in columns.items():
+                values.append(doc.get(name))
+            rows += 1
+            if len(columns["id"]) >= row_group_size:
+                flush(writer)
+        if columns["id"]:
+            flush(writer)
+
+    logger.info(f"Exported {rows} {collection} documents to {path}")
+    return {"rows": rows, "watermark": watermark}
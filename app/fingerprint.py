@@ -0,0 +1,344 @@
+import numpy as np
+from bson import Binary, ObjectId
+from pymongo.errors import PyMongoError
+from app.config import settings
+from app.database import db_manager
+from app.metrics import metrics
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Any, Dict, List, Optional, Union
+import logging
+import multiprocessing
+import queue
+import shutil
+import subprocess
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Changing any of these changes every hash, so the index has to be rebuilt
+SAMPLE_RATE = 8000
+FRAME_SIZE = 512  # 64 ms frames
+HOP_SIZE = 256
+PEAK_TIME_FRAMES = 15  # neighbourhood a peak must dominate
+PEAK_FREQ_BINS = 15
+PEAK_BLOCK_FRAMES = 32  # about one second
+PEAKS_PER_BLOCK = 10  # the strongest peaks survive noise and re-encoding
+FAN_OUT = 6  # pairs per anchor peak
+MAX_DELTA_FRAMES = 63  # about two seconds
+# Frequency and time delta are quantized so one-bin or one-frame jitter still matches
+FREQ_QUANT = 2
+DELTA_QUANT = 2
+OFFSET_TOLERANCE = 2  # frames
+# One in INDEX_MODULUS hashes goes into the multikey index; scoring uses all of them
+INDEX_MODULUS = 4
+# Hashes repeated more often than this in one recording are too common to align on
+MAX_HASH_REPEATS = 32
+
+_WINDOW = np.hanning(FRAME_SIZE).astype(np.float32)
+
+
+def decode_audio(source: Union[str, bytes], max_seconds: float, ffmpeg_path: str = "ffmpeg",
+                 timeout: Optional[float] = None) -> np.ndarray:
+    """Decode a URL, path or in-memory file to mono float32 samples at SAMPLE_RATE"""
+    command = [
+        ffmpeg_path, "-nostdin", "-v", "error",
+        "-i", "pipe:0" if isinstance(source, bytes) else source,
+        "-t", str(max_seconds), "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "pipe:1"
+    ]
+    result = subprocess.run(
+        command,
+        input=source if isinstance(source, bytes) else None,
+        capture_output=True,
+        timeout=timeout
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='replace').strip()[:300]}")
+    return np.frombuffer(result.stdout, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def spectrogram(samples: np.ndarray) -> np.ndarray:
+    """Log-magnitude spectrogram, shape (frames, FRAME_SIZE // 2 + 1)"""
+    if len(samples) < FRAME_SIZE:
+        return np.zeros((0, FRAME_SIZE // 2 + 1), dtype=np.float32)
+    frames = sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE] * _WINDOW
+    return 20 * np.log10(np.abs(np.fft.rfft(frames, axis=1)) + 1e-6)
+
+
+def find_peaks(spec: np.ndarray):
+    """Time and frequency indices of the strongest local spectral maxima, in time order"""
+    if spec.size == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    half_t, half_f = PEAK_TIME_FRAMES // 2, PEAK_FREQ_BINS // 2
+    # A 2-D maximum filter done as two 1-D passes
+    padded = np.pad(spec, ((half_t, half_t), (0, 0)), constant_values=-np.inf)
+    neighbourhood = sliding_window_view(padded, PEAK_TIME_FRAMES, axis=0).max(axis=-1)
+    padded = np.pad(neighbourhood, ((0, 0), (half_f, half_f)), constant_values=-np.inf)
+    neighbourhood = sliding_window_view(padded, PEAK_FREQ_BINS, axis=1).max(axis=-1)
+    times, freqs = np.nonzero(spec == neighbourhood)
+
+    # Keep the loudest PEAKS_PER_BLOCK peaks of each block, dropping noise-floor maxima
+    magnitudes = spec[times, freqs]
+    blocks = times // PEAK_BLOCK_FRAMES
+    order = np.lexsort((-magnitudes, blocks))
+    times, freqs, blocks = times[order], freqs[order], blocks[order]
+    rank = np.arange(len(blocks)) - np.searchsorted(blocks, blocks, side="left")
+    times, freqs = times[rank < PEAKS_PER_BLOCK], freqs[rank < PEAKS_PER_BLOCK]
+    order = np.lexsort((freqs, times))
+    return times[order], freqs[order]
+
+
+def hash_peaks(times: np.ndarray, freqs: np.ndarray) -> np.ndarray:
+    """Pair each peak with the next FAN_OUT peaks; returns (hash, anchor frame) rows"""
+    hashes, offsets = [], []
+    for k in range(1, FAN_OUT + 1):
+        if len(times) <= k:
+            break
+        delta = times[k:] - times[:-k]
+        valid = (delta > 0) & (delta <= MAX_DELTA_FRAMES)
+        # 8 bits anchor frequency, 8 bits target frequency, 5 bits time delta
+        hashes.append(
+            ((freqs[:-k][valid] // FREQ_QUANT) << 13)
+            | ((freqs[k:][valid] // FREQ_QUANT) << 5)
+            | (delta[valid] // DELTA_QUANT)
+        )
+        offsets.append(times[:-k][valid])
+    if not hashes:
+        return np.zeros((0, 2), dtype=np.int32)
+    return np.stack([np.concatenate(hashes), np.concatenate(offsets)], axis=1).astype(np.int32)
+
+
+def fingerprint_samples(samples: np.ndarray) -> np.ndarray:
+    """Spectral-peak pair hashes of decoded samples"""
+    return hash_peaks(*find_peaks(spectrogram(samples)))
+
+
+def fingerprint_source(source: Union[str, bytes], max_seconds: float, ffmpeg_path: str,
+                       timeout: Optional[float] = None) -> np.ndarray:
+    """Decode and fingerprint one recording; runs in a worker process"""
+    return fingerprint_samples(decode_audio(source, max_seconds, ffmpeg_path, timeout))
+
+
+def index_hashes(pairs: np.ndarray) -> List[int]:
+    """The sampled, distinct hashes stored in the inverted index"""
+    hashes = np.unique(pairs[:, 0])
+    # Select on a mixed value so the sample does not follow the time delta bits
+    mixed = (hashes.astype(np.uint64) * np.uint64(2654435761)) >> np.uint64(16)
+    return hashes[mixed % np.uint64(INDEX_MODULUS) == 0].tolist()
+
+
+def match_score(query: np.ndarray, candidate: np.ndarray) -> float:
+    """Share of hashes that line up at one consistent time offset, in [0, 1].
+
+    A trimmed or re-encoded copy keeps most of its peaks at a constant shift
+    from the original, so its offset histogram has one tall bin; unrelated
+    recordings only share hashes by chance, at scattered offsets. Each hash
+    of either recording votes at most once per bin, and the tallest bin is
+    divided by the shorter recording's hash count, so a recording contained
+    in the other scores 1.
+    """
+    if len(query) == 0 or len(candidate) == 0:
+        return 0.0
+    order = np.argsort(candidate[:, 0], kind="stable")
+    candidate_hashes = candidate[order, 0]
+    candidate_offsets = candidate[order, 1]
+    left = np.searchsorted(candidate_hashes, query[:, 0], side="left")
+    counts = np.searchsorted(candidate_hashes, query[:, 0], side="right") - left
+    counts[counts > MAX_HASH_REPEATS] = 0
+    total = int(counts.sum())
+    if total == 0:
+        return 0.0
+    # Expand every query row into its run of matching candidate rows
+    query_rows = np.repeat(np.arange(len(query)), counts)
+    run_starts = np.repeat(np.cumsum(counts) - counts, counts)
+    candidate_rows = np.repeat(left, counts) + (np.arange(total) - run_starts)
+    deltas = (candidate_offsets[candidate_rows] - query[query_rows, 1]).astype(np.int64) // OFFSET_TOLERANCE
+    # Repeated hashes within the tolerance would otherwise vote several times in one bin
+    query_bins, query_votes = np.unique(
+        np.unique(deltas * len(query) + query_rows) // len(query), return_counts=True
+    )
+    candidate_rows = order[candidate_rows]
+    candidate_bins, candidate_votes = np.unique(
+        np.unique(deltas * len(candidate) + candidate_rows) // len(candidate), return_counts=True
+    )
+    # Every bin holds at least one row of each recording, so the two are aligned
+    best = np.minimum(query_votes, candidate_votes).max()
+    return float(best) / min(len(query), len(candidate))
+
+
+def pack_pairs(pairs: np.ndarray) -> Binary:
+    return Binary(pairs.astype("<i4").tobytes())
+
+
+def unpack_pairs(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<i4").reshape(-1, 2)
+
+
+class FingerprintIndexer:
+    """Fingerprints new uploads off the request path and flags likely duplicates.
+
+    Uploads are queued; worker threads hand the decoding and hashing to a
+    process pool and store the result in audio_fingerprints, whose multikey
+    index on hashes is the inverted index. Matches above the minimum score
+    are written to the recitation's duplicate_candidates for moderators.
+    """
+
+    def __init__(self):
+        # Collections are looked up lazily: pool workers import this module too
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=1000)
+        self._threads: List[threading.Thread] = []
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.indexed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.duplicates_found = 0
+        metrics.register("fingerprints", self.stats)
+
+    @property
+    def fingerprints_collection(self):
+        return db_manager.get_db().audio_fingerprints
+
+    @property
+    def recitations_collection(self):
+        return db_manager.get_db().recitations
+
+    def start(self):
+        """Start the process pool and the queue workers, unless ffmpeg is missing"""
+        if not settings.fingerprint_enabled or self._threads:
+            return
+        if shutil.which(settings.fingerprint_ffmpeg_path) is None:
+            # Every job would fail; uploads go unfingerprinted until ffmpeg is installed
+            logger.warning(f"Fingerprinting disabled: '{settings.fingerprint_ffmpeg_path}' not found, "
+                           f"install ffmpeg or set FINGERPRINT_FFMPEG_PATH")
+            return
+        # spawn: forking a process that holds MongoClient threads is unsafe
+        self._pool = ProcessPoolExecutor(
+            max_workers=settings.fingerprint_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        for number in range(settings.fingerprint_workers):
+            thread = threading.Thread(target=self._run, name=f"fingerprint-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Stop the workers; queued uploads are left for the backfill script"""
+        if not self._threads:
+            return
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+
+    def submit(self, recitation_id: str, audio_url: str) -> bool:
+        """Queue an upload for fingerprinting; never blocks the caller"""
+        if not self._threads:
+            return False
+        try:
+            self._queue.put_nowait((recitation_id, audio_url))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Fingerprint queue full, skipping {recitation_id}")
+            return False
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            recitation_id, audio_url = item
+            try:
+                pairs = self._pool.submit(
+                    fingerprint_source, audio_url, settings.fingerprint_max_seconds,
+                    settings.fingerprint_ffmpeg_path, settings.fingerprint_decode_timeout_seconds
+                ).result()
+                self.index_recitation(recitation_id, pairs)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Failed to fingerprint recitation {recitation_id}: {e}")
+
+    def index_recitation(self, recitation_id: str, pairs: np.ndarray) -> List[Dict[str, Any]]:
+        """Store a recitation's fingerprint and record its likely duplicates"""
+        candidates = self.find_duplicates(pairs, exclude_id=recitation_id)
+        self.fingerprints_collection.replace_one(
+            {"_id": recitation_id},
+            {
+                "hashes": index_hashes(pairs),
+                "pairs": pack_pairs(pairs),
+                "pair_count": len(pairs),
+                "created_at": datetime.utcnow()
+            },
+            upsert=True
+        )
+        self.recitations_collection.update_one(
+            {"_id": ObjectId(recitation_id)},
+            {"$set": {"duplicate_candidates": candidates}}
+        )
+        self.indexed += 1
+        if candidates:
+            self.duplicates_found += 1
+            logger.info(f"Recitation {recitation_id} looks like a duplicate of {candidates[0]['recitation_id']}")
+        return candidates
+
+    def find_duplicates(self, pairs: np.ndarray, exclude_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Indexed recitations that match a fingerprint, best first"""
+        query_hashes = index_hashes(pairs)
+        if not query_hashes:
+            return []
+        if len(query_hashes) > settings.fingerprint_query_hashes:
+            # An evenly spaced subset keeps the $in bounded for long recordings
+            step = len(query_hashes) / settings.fingerprint_query_hashes
+            query_hashes = [query_hashes[int(i * step)] for i in range(settings.fingerprint_query_hashes)]
+
+        # Coarse pass in the index: rank by shared hashes
+        match: Dict[str, Any] = {"hashes": {"$in": query_hashes}}
+        if exclude_id:
+            match["_id"] = {"$ne": exclude_id}
+        shortlist = [doc["_id"] for doc in self.fingerprints_collection.aggregate([
+            {"$match": match},
+            {"$project": {"common": {"$size": {"$setIntersection": ["$hashes", query_hashes]}}}},
+            {"$sort": {"common": -1}},
+            {"$limit": settings.fingerprint_max_candidates * 4}
+        ])]
+        if not shortlist:
+            return []
+
+        # Fine pass: time-consistent alignment over every hash
+        candidates = []
+        for doc in self.fingerprints_collection.find({"_id": {"$in": shortlist}}, {"pairs": 1}):
+            score = match_score(pairs, unpack_pairs(doc["pairs"]))
+            if score >= settings.fingerprint_min_score:
+                candidates.append({"recitation_id": doc["_id"], "score": round(score, 3)})
+        candidates.sort(key=lambda candidate: candidate["score"], reverse=True)
+        return candidates[:settings.fingerprint_max_candidates]
+
+    def delete(self, recitation_id: str):
+        """Remove a deleted recitation's fingerprint"""
+        try:
+            self.fingerprints_collection.delete_one({"_id": recitation_id})
+        except PyMongoError as e:
+            logger.error(f"Failed to delete fingerprint for {recitation_id}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Indexing counters"""
+        return {
+            "enabled": settings.fingerprint_enabled,
+            "running": bool(self._threads),
+            "queued": self._queue.qsize(),
+            "indexed": self.indexed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "duplicates_found": self.duplicates_found
+        }
+
+
+# Global fingerprint indexer instance
+fingerprint_indexer = FingerprintIndexer()
@@ -0,0 +1,152 @@
+"""Fractional ordering keys: strings that sort in list order, with room between any two.
+
+Inserting or moving one item computes a key between its new neighbours, so
+nothing else in the list is rewritten. A key is an integer part, whose
+first character encodes its length ("a0".."az", then "b00".. going up, "Zz"
+and below going down), followed by an optional base-62 fraction. Appending
+to either end only steps the integer, so keys stay short however a list
+grows; repeated inserts at one spot lengthen the fraction by about one
+character per six inserts. Keys compare correctly as plain byte strings,
+which is how MongoDB sorts them.
+"""
+
+from typing import List, Optional
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+SMALLEST_INTEGER = "A" + DIGITS[0] * 26
+
+
+def _midpoint(a: str, b: Optional[str]) -> str:
+    """A fraction strictly between fractions a and b (None = 1)"""
+    if b is not None and a >= b:
+        raise ValueError(f"{a!r} is not before {b!r}")
+    if a.endswith(DIGITS[0]) or (b and b.endswith(DIGITS[0])):
+        raise ValueError("Fractions must not end in zero")
+    if b:
+        # Keep the common prefix and split the rest
+        n = 0
+        while (a[n] if n < len(a) else DIGITS[0]) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else len(DIGITS)
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    if b and len(b) > 1:
+        return b[0]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"Invalid key head {head!r}")
+
+
+def _split(key: str):
+    """Split a key into its integer part and fraction"""
+    integer = key[:_integer_length(key[0])]
+    if len(integer) != _integer_length(key[0]) or key == SMALLEST_INTEGER:
+        raise ValueError(f"Invalid key {key!r}")
+    fraction = key[len(integer):]
+    if fraction.endswith(DIGITS[0]):
+        raise ValueError(f"Invalid key {key!r}")
+    return integer, fraction
+
+
+def _increment(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        d = DIGITS.index(digits[i]) + 1
+        if d < len(DIGITS):
+            digits[i] = DIGITS[d]
+            return head + "".join(digits)
+        digits[i] = DIGITS[0]
+    # Carried out of the top digit: move to the next length
+    if head == "Z":
+        return "a" + DIGITS[0]
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append(DIGITS[0])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _decrement(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        d = DIGITS.index(digits[i]) - 1
+        if d >= 0:
+            digits[i] = DIGITS[d]
+            return head + "".join(digits)
+        digits[i] = DIGITS[-1]
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def key_between(a: Optional[str], b: Optional[str]) -> str:
+    """A key sorting strictly after a and before b; None means the start or end of the list"""
+    if a is None and b is None:
+        return "a" + DIGITS[0]
+    if a is None:
+        integer_b, fraction_b = _split(b)
+        if integer_b == SMALLEST_INTEGER:
+            return integer_b + _midpoint("", fraction_b)
+        if integer_b < b:
+            return integer_b
+        decremented = _decrement(integer_b)
+        if decremented is None:
+            raise ValueError("Cannot decrement any more")
+        return decremented
+    if b is None:
+        integer_a, fraction_a = _split(a)
+        incremented = _increment(integer_a)
+        return integer_a + _midpoint(fraction_a, None) if incremented is None else incremented
+
+    integer_a, fraction_a = _split(a)
+    integer_b, fraction_b = _split(b)
+    if a >= b:
+        raise ValueError(f"{a!r} is not before {b!r}")
+    if integer_a == integer_b:
+        return integer_a + _midpoint(fraction_a, fraction_b)
+    incremented = _increment(integer_a)
+    if incremented is None:
+        raise ValueError("Cannot increment any more")
+    if incremented < b:
+        return incremented
+    return integer_a + _midpoint(fraction_a, None)
+
+
+def keys_between(a: Optional[str], b: Optional[str], n: int) -> List[str]:
+    """n ascending keys between a and b, spread out so later inserts between them stay short"""
+    if n <= 0:
+        return []
+    if n == 1:
+        return [key_between(a, b)]
+    if b is None:
+        keys = [key_between(a, None)]
+        for _ in range(n - 1):
+            keys.append(key_between(keys[-1], None))
+        return keys
+    if a is None:
+        keys = [key_between(None, b)]
+        for _ in range(n - 1):
+            keys.append(key_between(None, keys[-1]))
+        return list(reversed(keys))
+    middle = key_between(a, b)
+    half = n // 2
+    return keys_between(a, middle, half) + [middle] + keys_between(middle, b, n - half - 1)
@@ -0,0 +1,112 @@
+from app.text import normalize_name
+from app.config import settings
+from typing import Any, Dict, List, Optional
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+BUNDLED_GAZETTEER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "masjids.json")
+
+# Longest run of location words looked up as one place name ("kuala lumpur", "new york city")
+_MAX_PLACE_WORDS = 4
+
+
+def geo_point(lat: float, lng: float) -> Dict[str, Any]:
+    """GeoJSON point; GeoJSON puts longitude first"""
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+class Gazetteer:
+    """Offline lookup of masjid and city coordinates.
+
+    Reads a JSON registry of known masjids and cities (the bundled
+    app/data/masjids.json, or GAZETTEER_PATH) once, on first use. Names and
+    aliases are matched after normalize_name, so spelling, case and
+    diacritics differences still resolve. No network geocoding is done.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._masjids: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._cities: Optional[Dict[str, List[Dict[str, Any]]]] = None
+
+    def resolve(self, masjid_name: Optional[str], masjid_location: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Coordinates for a recitation's masjid as {"point", "precision"}, or None.
+
+        A known masjid gives a "masjid" precision point; otherwise the first
+        known city in the location gives a "city" precision point.
+        """
+        self._load()
+        location = normalize_name(masjid_location or "")
+        location_words = location.split(" ") if location else []
+
+        city = self._find_city(location_words)
+        candidates = self._masjids.get(normalize_name(masjid_name or ""), [])
+        if city or len(candidates) > 1:
+            # Common names ("Masjid Al-Noor") only count when the location names the masjid's city
+            candidates = [entry for entry in candidates if city and entry["city"] == city["name"]]
+        if len(candidates) == 1:
+            return {"point": geo_point(candidates[0]["lat"], candidates[0]["lng"]), "precision": "masjid"}
+
+        if city:
+            return {"point": geo_point(city["lat"], city["lng"]), "precision": "city"}
+        return None
+
+    def geo_fields(self, masjid_name: Optional[str], masjid_location: Optional[str]) -> Dict[str, Any]:
+        """The masjid_geo fields to store on a recitation; empty when unresolved"""
+        resolved = self.resolve(masjid_name, masjid_location)
+        if not resolved:
+            return {}
+        return {"masjid_geo": resolved["point"], "masjid_geo_precision": resolved["precision"]}
+
+    def _find_city(self, words: List[str]) -> Optional[Dict[str, Any]]:
+        """The leftmost, longest run of words naming a known city"""
+        for start in range(len(words)):
+            for length in range(min(_MAX_PLACE_WORDS, len(words) - start), 0, -1):
+                entries = self._cities.get(" ".join(words[start:start + length]))
+                if entries:
+                    # Prefer the city in the country the location mentions ("Birmingham, United Kingdom")
+                    for entry in entries:
+                        if self._mentions(words, entry["country"]):
+                            return entry
+                    return entries[0]
+        return None
+
+    def _mentions(self, words: List[str], place: str) -> bool:
+        place_words = normalize_name(place).split(" ")
+        return any(
+            words[i:i + len(place_words)] == place_words
+            for i in range(len(words) - len(place_words) + 1)
+        )
+
+    def _load(self):
+        if self._masjids is not None:
+            return
+        with self._lock:
+            if self._masjids is not None:
+                return
+            path = self.path or settings.gazetteer_path or BUNDLED_GAZETTEER
+            masjids: Dict[str, List[Dict[str, Any]]] = {}
+            cities: Dict[str, List[Dict[str, Any]]] = {}
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                for index, entries in ((masjids, data.get("masjids", [])), (cities, data.get("cities", []))):
+                    for entry in entries:
+                        for name in [entry["name"]] + entry.get("aliases", []):
+                            key = normalize_name(name)
+                            if key and entry not in index.setdefault(key, []):
+                                index[key].append(entry)
+                logger.info(f"Gazetteer loaded from {path}: {len(masjids)} masjid names, {len(cities)} city names")
+            except Exception as e:
+                logger.error(f"Failed to load gazetteer {path}: {e}")
+            self._cities = cities
+            self._masjids = masjids
+
+
+# Global gazetteer instance
+gazetteer = Gazetteer()
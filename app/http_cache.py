@@ -0,0 +1,33 @@
+from fastapi import Request, Response
+from typing import Optional
+import hashlib
+
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag from the parts that determine a response body"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """Check an ETag against the request's If-None-Match header"""
+    header = request.headers.get("if-none-match")
+    if not header or not etag:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    candidates = [value.strip() for value in header.split(",")]
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    """Build a 304 response carrying the validator headers"""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def set_cache_headers(response: Response, cache_control: str, etag: Optional[str] = None):
+    """Set Cache-Control (and ETag when given) on a response"""
+    response.headers["Cache-Control"] = cache_control
+    if etag:
+        response.headers["ETag"] = etag
@@ -0,0 +1,290 @@
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from app.config import settings
+from app.database import db_manager
+from app.metrics import metrics
+from app.change_streams import ChangeEvent, change_events
+from bson import ObjectId
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, Deque, List, Optional
+import logging
+import os
+import random
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Lease document naming the one worker that rolls up and reconciles
+ROLLUP_LEASE = "like_counter_rollup"
+
+# Sharded recitations compared against the likes collection per query
+RECONCILE_BATCH = 500
+
+
+class ShardedLikeCounter:
+    """Spreads like increments for hot recitations over N shard documents.
+
+    A recitation is promoted once its like rate crosses the configured
+    threshold; from then on likes $inc a random shard in like_counter_shards
+    instead of the recitation document. A rollup thread periodically folds
+    shard counts back into likes_count, and single-recitation reads add the
+    pending shard sum so they stay exact. Only the worker holding the rollup
+    lease rolls up, and it also reconciles sharded recitations against the
+    likes collection now and then.
+    """
+
+    def __init__(self):
+        self.db = db_manager.get_db()
+        self.recitations_collection = self.db.recitations
+        self.likes_collection = self.db.likes
+        self.shards_collection = self.db.like_counter_shards
+        self.leases_collection = self.db.leases
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self._recent_likes: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.promotions = 0
+        self.sharded_increments = 0
+        self.rollups = 0
+        self.reconciles = 0
+        self.reconciled = 0
+        self.holds_lease = False
+        metrics.register("like_counters", self.stats)
+
+    def is_sharded(self, recitation: Dict[str, Any]) -> bool:
+        """Whether a recitation document uses sharded counters"""
+        return bool(recitation.get("like_shards"))
+
+    def increment(self, recitation: Dict[str, Any], delta: int):
+        """Apply a like delta to a random shard of a sharded recitation"""
+        recitation_id = str(recitation["_id"])
+        shard = random.randrange(recitation["like_shards"])
+        self.shards_collection.update_one(
+            {"_id": f"{recitation_id}:{shard}"},
+            {"$inc": {"count": delta}, "$setOnInsert": {"recitation_id": recitation_id}},
+            upsert=True
+        )
+        self.sharded_increments += 1
+
+    def record_like(self, recitation_id: str):
+        """Track the like rate of an unsharded recitation and promote it when it runs hot"""
+        if not settings.like_shards_enabled:
+            return
+        now = time.monotonic()
+        window_start = now - settings.like_shard_promote_window_seconds
+        with self._lock:
+            recent = self._recent_likes.setdefault(recitation_id, deque())
+            recent.append(now)
+            while recent and recent[0] < window_start:
+                recent.popleft()
+            hot = len(recent) >= settings.like_shard_promote_likes
+            if hot:
+                del self._recent_likes[recitation_id]
+        if hot:
+            self.promote(recitation_id)
+
+    def promote(self, recitation_id: str):
+        """Switch a recitation to sharded counters"""
+        result = self.recitations_collection.update_one(
+            {"_id": ObjectId(recitation_id), "like_shards": {"$exists": False}},
+            {"$set": {"like_shards": settings.like_shard_count}}
+        )
+        if result.modified_count:
+            self.promotions += 1
+            logger.info(f"Recitation {recitation_id} promoted to {settings.like_shard_count} like counter shards")
+
+    def pending(self, recitation_id: str) -> int:
+        """Likes recorded in shards that have not been rolled up yet"""
+        shards = self.shards_collection.find({"recitation_id": recitation_id}, {"count": 1})
+        return sum(shard["count"] for shard in shards)
+
+    def pending_many(self, recitation_ids: List[str]) -> Dict[str, int]:
+        """pending() for several recitations in one query"""
+        totals: Dict[str, int] = {}
+        shards = self.shards_collection.find(
+            {"recitation_id": {"$in": recitation_ids}}, {"recitation_id": 1, "count": 1}
+        )
+        for shard in shards:
+            totals[shard["recitation_id"]] = totals.get(shard["recitation_id"], 0) + shard["count"]
+        return totals
+
+    def delete(self, recitation_id: str):
+        """Remove the shards of a deleted recitation"""
+        self.shards_collection.delete_many({"recitation_id": recitation_id})
+
+    def rollup(self):
+        """Fold non-zero shard counts into likes_count.
+
+        Each shard is claimed by swapping its count for zero in one atomic
+        update, so a shard's likes are folded in once even when rollups
+        overlap. Increments racing with the claim land on the zeroed shard
+        and wait for the next rollup. A crash between claiming and adding
+        under-counts until the next reconcile.
+        """
+        totals: Dict[str, int] = {}
+        for shard in self.shards_collection.find({"count": {"$ne": 0}}, {"_id": 1}):
+            claimed = self.shards_collection.find_one_and_update(
+                {"_id": shard["_id"], "count": {"$ne": 0}},
+                {"$set": {"count": 0}},
+                projection={"recitation_id": 1, "count": 1}
+            )
+            if claimed:
+                totals[claimed["recitation_id"]] = totals.get(claimed["recitation_id"], 0) + claimed["count"]
+
+        for recitation_id, delta in totals.items():
+            self._add_likes(recitation_id, delta)
+        if totals:
+            self.rollups += 1
+
+    def reconcile(self) -> int:
+        """Correct sharded recitations whose likes_count plus pending shards differs from their likes.
+
+        Likes landing between the counts and the correction can leave a
+        small error behind, which the following reconcile picks up. Returns
+        the number of recitations corrected.
+        """
+        fixed = 0
+        cursor = self.recitations_collection.find({"like_shards": {"$exists": True}}, {"likes_count": 1})
+        batch: Dict[str, int] = {}
+        for doc in cursor:
+            batch[str(doc["_id"])] = doc.get("likes_count", 0)
+            if len(batch) >= RECONCILE_BATCH:
+                fixed += self._reconcile_batch(batch)
+                batch = {}
+        if batch:
+            fixed += self._reconcile_batch(batch)
+        self.reconciles += 1
+        self.reconciled += fixed
+        return fixed
+
+    def _reconcile_batch(self, stored: Dict[str, int]) -> int:
+        recitation_ids = list(stored)
+        pending = self.pending_many(recitation_ids)
+        actual = {
+            row["_id"]: row["count"] for row in self.likes_collection.aggregate([
+                {"$match": {"recitation_id": {"$in": recitation_ids}}},
+                {"$group": {"_id": "$recitation_id", "count": {"$sum": 1}}}
+            ])
+        }
+        fixed = 0
+        for recitation_id, likes_count in stored.items():
+            drift = actual.get(recitation_id, 0) - likes_count - pending.get(recitation_id, 0)
+            if drift:
+                logger.warning(f"Recitation {recitation_id} likes_count off by {drift}, correcting")
+                self._add_likes(recitation_id, drift)
+                fixed += 1
+        return fixed
+
+    def _add_likes(self, recitation_id: str, delta: int):
+        """$inc likes_count and tell subscribers the new total"""
+        doc = self.recitations_collection.find_one_and_update(
+            {"_id": ObjectId(recitation_id)},
+            # changed_at lets delta sync pick up the new count
+            {"$inc": {"likes_count": delta}, "$set": {"changed_at": datetime.utcnow()}},
+            projection={"likes_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if doc:
+            change_events.publish_local(ChangeEvent(
+                collection="recitations",
+                operation="update",
+                document_id=doc["_id"],
+                updated_fields={"likes_count": doc["likes_count"]}
+            ))
+
+    def acquire_lease(self) -> bool:
+        """Take or renew the rollup lease; False while another worker holds it"""
+        now = datetime.utcnow()
+        try:
+            self.leases_collection.update_one(
+                {"_id": ROLLUP_LEASE, "$or": [{"owner": self.worker_id}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.worker_id,
+                          "expires_at": now + timedelta(seconds=settings.like_shard_lease_seconds)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Held by a live worker: the upsert tried to insert a second lease
+            self.holds_lease = False
+            return False
+        if not self.holds_lease:
+            logger.info(f"Worker {self.worker_id} took the like counter rollup lease")
+        self.holds_lease = True
+        return True
+
+    def release_lease(self):
+        """Let another worker take the lease without waiting for it to expire"""
+        if not self.holds_lease:
+            return
+        self.holds_lease = False
+        try:
+            self.leases_collection.delete_one({"_id": ROLLUP_LEASE, "owner": self.worker_id})
+        except PyMongoError as e:
+            logger.error(f"Failed to release like counter rollup lease: {e}")
+
+    def _forget_quiet(self):
+        """Forget rate windows that have gone quiet"""
+        window_start = time.monotonic() - settings.like_shard_promote_window_seconds
+        with self._lock:
+            for recitation_id in [rid for rid, recent in self._recent_likes.items() if recent[-1] < window_start]:
+                del self._recent_likes[recitation_id]
+
+    def start(self):
+        """Start the periodic rollup in a daemon thread"""
+        if not settings.like_shards_enabled or self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="like-counter-rollup", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the rollup thread, rolling up one last time if this worker holds the lease"""
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+        if not self.holds_lease:
+            return
+        try:
+            self.rollup()
+        except PyMongoError as e:
+            logger.error(f"Final like counter rollup failed: {e}")
+        self.release_lease()
+
+    def _run(self):
+        last_reconcile = time.monotonic()
+        while not self._stop.wait(settings.like_shard_rollup_interval_seconds):
+            self._forget_quiet()
+            try:
+                if not self.acquire_lease():
+                    continue
+                self.rollup()
+                interval = settings.like_shard_reconcile_interval_seconds
+                if interval > 0 and time.monotonic() - last_reconcile >= interval:
+                    last_reconcile = time.monotonic()
+                    fixed = self.reconcile()
+                    if fixed:
+                        logger.info(f"Like counts reconciled: {fixed} recitations corrected")
+            except PyMongoError as e:
+                logger.error(f"Like counter rollup failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Promotion and rollup counters"""
+        return {
+            "enabled": settings.like_shards_enabled,
+            "promotions": self.promotions,
+            "sharded_increments": self.sharded_increments,
+            "rollups": self.rollups,
+            "reconciles": self.reconciles,
+            "reconciled": self.reconciled,
+            "holds_lease": self.holds_lease,
+            "tracked_recitations": len(self._recent_likes)
+        }
+
+
+# Global sharded like counter instance
+like_counter = ShardedLikeCounter()
@@ -0,0 +1,176 @@
+from app.change_streams import ChangeEvent, change_events
+from app.config import settings
+from app.metrics import metrics
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Set
+import asyncio
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LiveSubscriber:
+    """One open stream: the IDs it follows and the counts not yet sent to it"""
+
+    __slots__ = ("ids", "pending", "wakeup", "heartbeat", "closed")
+
+    def __init__(self, ids: Set[str]):
+        self.ids = ids
+        self.pending: Dict[str, int] = {}
+        self.wakeup = asyncio.Event()
+        self.heartbeat = False
+        self.closed = False
+
+
+class LiveLikeBroadcaster:
+    """Pushes like counts to Server-Sent Event streams.
+
+    Like count changes from the change event bus are coalesced per
+    recitation, and once per window one loop hands each changed count to
+    the subscribers following that ID and wakes them. A subscriber's stream
+    then writes everything pending as one frame, so slow clients get fewer,
+    larger frames instead of a backlog. Nothing is scheduled per subscriber
+    per update: each stream only waits on its own event.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirty: Dict[str, int] = {}
+        self._by_id: Dict[str, Set[LiveSubscriber]] = {}
+        self._connections: Set[LiveSubscriber] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._subscribed = False
+        self.changes = 0
+        self.coalesced = 0
+        self.broadcasts = 0
+        self.frames = 0
+        self.refused = 0
+        metrics.register("live_updates", self.stats)
+
+    def start(self):
+        """Start the broadcast loop on the running event loop"""
+        if not settings.live_updates_enabled or self._task:
+            return
+        if not self._subscribed:
+            change_events.subscribe(self._on_change, ["recitations"])
+            self._subscribed = True
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop broadcasting and end every open stream"""
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        for subscriber in self._connections:
+            subscriber.closed = True
+            subscriber.wakeup.set()
+
+    def subscribe(self, recitation_ids: Iterable[str]) -> Optional[LiveSubscriber]:
+        """Register a stream, or return None when the worker is at its connection limit"""
+        if len(self._connections) >= settings.live_updates_max_connections:
+            self.refused += 1
+            return None
+        subscriber = LiveSubscriber(set(recitation_ids))
+        self._connections.add(subscriber)
+        for recitation_id in subscriber.ids:
+            self._by_id.setdefault(recitation_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: LiveSubscriber):
+        self._connections.discard(subscriber)
+        for recitation_id in subscriber.ids:
+            followers = self._by_id.get(recitation_id)
+            if followers is not None:
+                followers.discard(subscriber)
+                if not followers:
+                    del self._by_id[recitation_id]
+
+    async def stream(self, subscriber: LiveSubscriber, initial: Dict[str, int]) -> AsyncIterator[str]:
+        """SSE frames for one subscriber: the current counts, then changes as they happen"""
+        try:
+            yield f"retry: {settings.live_updates_retry_ms}\n" + self._frame(initial)
+            while not subscriber.closed:
+                await subscriber.wakeup.wait()
+                subscriber.wakeup.clear()
+                if subscriber.pending:
+                    changes, subscriber.pending = subscriber.pending, {}
+                    self.frames += 1
+                    yield self._frame(changes)
+                elif subscriber.heartbeat:
+                    # A comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                subscriber.heartbeat = False
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _frame(self, counts: Dict[str, int]) -> str:
+        return f"event: likes\ndata: {json.dumps(counts, separators=(',', ':'))}\n\n"
+
+    def _on_change(self, event: ChangeEvent):
+        # May run on the change stream thread, so only touch the locked buffer here
+        if "likes_count" in event.updated_fields:
+            likes_count = event.updated_fields["likes_count"]
+        elif event.full_document is not None and "likes_count" in event.full_document:
+            likes_count = event.full_document["likes_count"]
+        else:
+            return
+        recitation_id = str(event.document_id)
+        with self._lock:
+            self.changes += 1
+            if recitation_id in self._dirty:
+                self.coalesced += 1
+            self._dirty[recitation_id] = likes_count
+
+    def _broadcast(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        woken = set()
+        for recitation_id, likes_count in dirty.items():
+            for subscriber in self._by_id.get(recitation_id, ()):
+                subscriber.pending[recitation_id] = likes_count
+                woken.add(subscriber)
+        for subscriber in woken:
+            subscriber.wakeup.set()
+        if woken:
+            self.broadcasts += 1
+
+    def _heartbeat(self):
+        for subscriber in self._connections:
+            subscriber.heartbeat = True
+            subscriber.wakeup.set()
+
+    async def _run(self):
+        next_heartbeat = time.monotonic() + settings.live_updates_heartbeat_seconds
+        while True:
+            await asyncio.sleep(settings.live_updates_window_ms / 1000)
+            try:
+                self._broadcast()
+                if time.monotonic() >= next_heartbeat:
+                    next_heartbeat = time.monotonic() + settings.live_updates_heartbeat_seconds
+                    self._heartbeat()
+            except Exception as e:
+                logger.error(f"Live like broadcast failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Open streams and broadcast counters"""
+        return {
+            "enabled": settings.live_updates_enabled,
+            "connections": len(self._connections),
+            "followed_recitations": len(self._by_id),
+            "changes": self.changes,
+            "coalesced": self.coalesced,
+            "broadcasts": self.broadcasts,
+            "frames": self.frames,
+            "refused": self.refused
+        }
+
+
+# Global live like broadcaster instance
+live_likes = LiveLikeBroadcaster()
@@ -0,0 +1,281 @@
+from app.config import settings
+from app.metrics import metrics
+from app.tracing import current_request_id
+from datetime import datetime, timezone
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+import atexit
+import json
+import logging
+import random
+import threading
+import time
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps records with the current request ID while still on the request's thread"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the INFO and DEBUG records of configured loggers.
+
+    Rates are per logger name and apply to child loggers too ("app" covers
+    "app.auth" unless it has its own rate). Warnings and errors are never
+    sampled; ErrorRateLimitFilter bounds those instead.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._by_logger: Dict[str, Optional[float]] = {}
+        self.sampled_out = 0
+
+    def _rate(self, name: str) -> Optional[float]:
+        if name not in self._by_logger:
+            prefix = name
+            rate = None
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._by_logger[name] = rate
+        return self._by_logger[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate is None or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class ErrorRateLimitFilter(logging.Filter):
+    """Lets at most `burst` warnings or errors per call site through per window.
+
+    Records are keyed by where they were logged rather than by their text,
+    so an f-string that embeds a different exception message each time
+    still counts as one source. The first record let through after a
+    suppressed run carries the number it replaced.
+    """
+
+    def __init__(self, burst: int, window_seconds: float):
+        super().__init__()
+        self.burst = burst
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._sites: Dict[Tuple[str, int], list] = {}
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or self.burst <= 0:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            # [window start, records let through, records suppressed]
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window_seconds:
+                suppressed = site[2] if site else 0
+                self._sites[key] = [now, 1, 0]
+                if len(self._sites) > 10000:
+                    self._sites = {k: v for k, v in self._sites.items() if now - v[0] < self.window_seconds}
+            elif site[1] < self.burst:
+                site[1] += 1
+                suppressed = 0
+            else:
+                site[2] += 1
+                self.suppressed += 1
+                return False
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """The classic line format, with the request ID and suppression count appended when present"""
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            line += f" [request_id={request_id}]"
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            line += f" [{suppressed} similar suppressed]"
+        return line
+
+
+class BufferedHandler(logging.Handler):
+    """Appends records to an in-memory buffer that a LogWriter thread drains.
+
+    Appending does not wake the writer, so a request pays for the filters
+    and one deque append per record; records beyond the buffer size are
+    dropped and counted rather than blocking the request.
+    """
+
+    def __init__(self, max_records: int):
+        super().__init__()
+        self.records: Deque[logging.LogRecord] = deque()
+        self.max_records = max_records
+        self.queued = 0
+        self.dropped = 0
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # deque.append is thread-safe, so skip the handler lock that emit() would take
+        if not self.filter(record):
+            return False
+        if len(self.records) >= self.max_records:
+            self.dropped += 1
+            return True
+        # Merge the arguments and render any traceback now, while they are
+        # still valid; formatting is left to the writer thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        self.records.append(record)
+        self.queued += 1
+        return True
+
+    def emit(self, record: logging.LogRecord):
+        self.handle(record)
+
+
+class LogWriter:
+    """Formats and writes buffered records in batches on a daemon thread"""
+
+    def __init__(self, buffer: BufferedHandler, output: logging.StreamHandler, interval: float):
+        self.buffer = buffer
+        self.output = output
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Write everything still buffered and stop the thread"""
+        self._stop.set()
+        self._thread.join(timeout=10)
+        self.flush()
+
+    def flush(self):
+        records = self.buffer.records
+        while records:
+            lines = []
+            while records and len(lines) < 1000:
+                record = records.popleft()
+                try:
+                    lines.append(self.output.format(record) + "\n")
+                except Exception:
+                    self.output.handleError(record)
+            try:
+                self.output.stream.write("".join(lines))
+                self.output.flush()
+            except Exception:
+                self.output.handleError(record)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+
+class LoggingSetup:
+    """Root logging: filters on the caller's thread, formatting and I/O on a writer thread"""
+
+    def __init__(self):
+        self.handler: Optional[logging.Handler] = None
+        self.writer: Optional[LogWriter] = None
+        self.sampling: Optional[SamplingFilter] = None
+        self.rate_limit: Optional[ErrorRateLimitFilter] = None
+        metrics.register("logging", self.stats)
+
+    def configure(self, stream=None):
+        """Replace the root handlers according to the logging settings (stream defaults to stderr)"""
+        root = logging.getLogger()
+        self.stop()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.setLevel(settings.log_level.upper())
+
+        output = logging.StreamHandler(stream)
+        output.setFormatter(JsonFormatter() if settings.log_format == "json" else TextFormatter())
+
+        if settings.log_async:
+            self.handler = BufferedHandler(settings.log_queue_size)
+            self.writer = LogWriter(self.handler, output, settings.log_flush_interval_ms / 1000)
+            self.writer.start()
+        else:
+            self.handler = output
+
+        self.sampling = SamplingFilter(settings.log_sample_rates)
+        self.rate_limit = ErrorRateLimitFilter(settings.log_error_burst, settings.log_error_window_seconds)
+        self.handler.addFilter(self.sampling)
+        self.handler.addFilter(self.rate_limit)
+        self.handler.addFilter(RequestContextFilter())
+        root.addHandler(self.handler)
+
+    def stop(self):
+        """Write buffered records and stop the writer thread"""
+        if self.writer:
+            self.writer.stop()
+            self.writer = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue, sampling and rate limit counters"""
+        return {
+            "format": settings.log_format,
+            "async": settings.log_async,
+            "queued": getattr(self.handler, "queued", 0),
+            "dropped": getattr(self.handler, "dropped", 0),
+            "queue_depth": len(self.handler.records) if isinstance(self.handler, BufferedHandler) else 0,
+            "sampled_out": self.sampling.sampled_out if self.sampling else 0,
+            "suppressed": self.rate_limit.suppressed if self.rate_limit else 0
+        }
+
+
+# Global logging setup instance
+logging_setup = LoggingSetup()
+
+
+def configure_logging():
+    """Install the configured handlers and flush the queue at interpreter exit"""
+    logging_setup.configure()
+    atexit.register(logging_setup.stop)
@@ -0,0 +1,30 @@
+from typing import Any, Callable, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsRegistry:
+    """Collects point-in-time stats from the components that register here"""
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def register(self, name: str, source: Callable[[], Dict[str, Any]]):
+        """Register a callable returning a dict of stats under a name"""
+        self._sources[name] = source
+
+    def collect(self) -> Dict[str, Any]:
+        """Snapshot every registered source"""
+        snapshot = {}
+        for name, source in self._sources.items():
+            try:
+                snapshot[name] = source()
+            except Exception as e:
+                logger.error(f"Failed to collect metrics for {name}: {e}")
+                snapshot[name] = {"error": str(e)}
+        return snapshot
+
+
+# Global metrics registry instance
+metrics = MetricsRegistry()
@@ -36,6 +36,19 @@ class RecitationResponse(RecitationBase):
     class Config:
         from_attributes = True
 
+class LikedRecitationResponse(RecitationResponse):
+    is_liked: bool = False
+
+class NearbyRecitationResponse(LikedRecitationResponse):
+    distance_km: float
+
+class RecitationBatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=300)
+
+class RecitationBatchResponse(BaseModel):
+    recitations: List[LikedRecitationResponse]
+    missing: List[str]
+
 class RecitationUpdate(BaseModel):
     title: Optional[str] = Field(None, min_length=1, max_length=200)
     reciter_name: Optional[str] = Field(None, min_length=1, max_length=100)
@@ -48,6 +61,92 @@ class RecitationUpdate(BaseModel):
     description: Optional[str] = Field(None, max_length=500)
     tags: Optional[List[str]] = None
 
+class PlayEvent(BaseModel):
+    recitation_id: str
+    played_at: Optional[datetime] = None
+
+class PlayEventBatch(BaseModel):
+    events: List[PlayEvent] = Field(..., min_length=1)
+
+class TagStatResponse(BaseModel):
+    tag: str
+    recitations: int
+    likes: int
+
+class RelatedTag(BaseModel):
+    tag: str
+    count: int
+
+class RelatedTagsResponse(BaseModel):
+    tag: str
+    related: List[RelatedTag]
+
+class ReciterSurah(BaseModel):
+    name: str
+    count: int
+
+class ReciterUpload(BaseModel):
+    id: str
+    title: str
+    surah_name: str
+    created_at: datetime
+
+class ReciterProfileResponse(BaseModel):
+    name: str
+    recitations: int
+    likes: int
+    surahs: List[ReciterSurah]
+    latest: List[ReciterUpload]
+    updated_at: Optional[datetime] = None
+
+class PlaylistCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    description: Optional[str] = Field(None, max_length=500)
+    is_public: bool = False
+
+class PlaylistUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    description: Optional[str] = Field(None, max_length=500)
+    is_public: Optional[bool] = None
+
+class PlaylistResponse(BaseModel):
+    id: str
+    owner_id: str
+    name: str
+    description: Optional[str] = None
+    is_public: bool
+    item_count: int
+    created_at: datetime
+    updated_at: datetime
+
+class PlaylistItemsAdd(BaseModel):
+    recitation_ids: List[str] = Field(..., min_length=1, max_length=300)
+    before_item_id: Optional[str] = None  # None appends at the end
+
+class PlaylistItemMove(BaseModel):
+    before_item_id: Optional[str] = None  # None moves to the end
+
+class PlaylistItemResponse(BaseModel):
+    item_id: str
+    recitation_id: str
+    position: str
+    added_at: datetime
+
+class PlaylistPageItem(PlaylistItemResponse):
+    recitation: LikedRecitationResponse
+
+class PlaylistPageResponse(PlaylistResponse):
+    items: List[PlaylistPageItem]
+    next_cursor: Optional[str] = None
+
+class SyncResponse(BaseModel):
+    removed: List[str]  # recitation IDs to drop, applied before the upserts
+    recitations: List[LikedRecitationResponse]  # created or updated, to upsert
+    unliked: List[str]  # applied before liked
+    liked: List[str]
+    next_token: str
+    has_more: bool
+
 class LikeCreate(BaseModel):
     recitation_id: str
 
@@ -0,0 +1,142 @@
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from app.config import settings
+from app.database import db_manager
+from app.metrics import metrics
+from app.change_streams import ChangeEvent, change_events
+from bson import ObjectId
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PlayCounter:
+    """Buffers play events in memory and folds them into plays_count in batches.
+
+    record() only bumps an in-process counter per recitation, so requests
+    are acknowledged without touching Mongo. A flush thread periodically
+    swaps the buffer out and writes one $inc per recitation with a single
+    unordered bulk_write. A crash loses at most the plays since the last
+    flush, plus any held back by failed flushes (bounded by
+    play_buffer_max_recitations).
+    """
+
+    def __init__(self):
+        self.db = db_manager.get_db()
+        self.recitations_collection = self.db.recitations
+        self._pending: Counter = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._flush_now = threading.Event()
+        self.accepted = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        metrics.register("play_counters", self.stats)
+
+    def record(self, recitation_ids: Iterable[str]) -> int:
+        """Buffer one play per ID (repeats count again); returns how many were buffered"""
+        counts = Counter(recitation_ids)
+        plays = sum(counts.values())
+        with self._lock:
+            self._pending.update(counts)
+            self.accepted += plays
+            full = len(self._pending) >= settings.play_buffer_max_recitations
+        if full:
+            self._flush_now.set()
+        return plays
+
+    def flush(self):
+        """Write the buffered plays with one $inc per recitation"""
+        # One flush at a time, so failed batches are merged back before the next swap
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, Counter()
+            if not batch:
+                return
+            try:
+                self.recitations_collection.bulk_write(
+                    [UpdateOne({"_id": ObjectId(rid)}, {"$inc": {"plays_count": plays}}) for rid, plays in batch.items()],
+                    ordered=False
+                )
+            except PyMongoError as e:
+                self.failed_flushes += 1
+                logger.error(f"Play count flush of {len(batch)} recitations failed: {e}")
+                self._restore(batch)
+                return
+            self.flushes += 1
+            self.flushed += sum(batch.values())
+            self._publish(list(batch))
+
+    def start(self):
+        """Start the periodic flush in a daemon thread"""
+        if not settings.play_events_enabled or self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="play-counter-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread after a final flush"""
+        if not self._thread:
+            return
+        self._stop.set()
+        self._flush_now.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+        self.flush()
+
+    def _restore(self, batch: Counter):
+        """Put a failed batch back, dropping it if the buffer would grow past its bound"""
+        with self._lock:
+            if len(self._pending) + len(batch) > settings.play_buffer_max_recitations:
+                self.dropped += sum(batch.values())
+                logger.error(f"Play buffer full, dropped {sum(batch.values())} plays")
+                return
+            self._pending.update(batch)
+
+    def _publish(self, recitation_ids: list):
+        """Tell subscribers the new totals (the change stream does it when running)"""
+        if change_events.stream_active:
+            return
+        try:
+            docs = self.recitations_collection.find(
+                {"_id": {"$in": [ObjectId(rid) for rid in recitation_ids]}}, {"plays_count": 1}
+            )
+            for doc in docs:
+                change_events.publish_local(ChangeEvent(
+                    collection="recitations",
+                    operation="update",
+                    document_id=doc["_id"],
+                    updated_fields={"plays_count": doc["plays_count"]}
+                ))
+        except PyMongoError as e:
+            logger.error(f"Failed to read back play counts: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._flush_now.wait(settings.play_flush_interval_seconds)
+            self._flush_now.clear()
+            self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Buffer size and flush counters"""
+        return {
+            "enabled": settings.play_events_enabled,
+            "accepted": self.accepted,
+            "flushed": self.flushed,
+            "pending_recitations": len(self._pending),
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped
+        }
+
+
+# Global play counter instance
+play_counter = PlayCounter()
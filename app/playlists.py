@@ -0,0 +1,289 @@
+from app.database import db_manager
+from app.services import recitation_service
+from app.fractional_index import key_between, keys_between
+from app.models import PlaylistCreate, PlaylistUpdate, RecitationStatus
+from app.config import settings
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Attempts at placing items when a concurrent write took the same ordering key
+PLACEMENT_ATTEMPTS = 3
+
+
+class PlaylistService:
+    """User playlists of ordered recitation references.
+
+    Items live in their own collection, one small document each, ordered by
+    a fractional key (app/fractional_index.py) that is unique per playlist.
+    Adding or moving an item writes only that item, and pages are read by
+    key range, so long playlists cost the same to page and reorder as short
+    ones. A page is hydrated with one $in query for its recitations and one
+    for the viewer's likes.
+    """
+
+    def __init__(self):
+        self.db = db_manager.get_db()
+        self.playlists_collection = self.db.playlists
+        self.items_collection = self.db.playlist_items
+
+    async def create_playlist(self, data: PlaylistCreate, owner_id: str) -> Dict[str, Any]:
+        """Create an empty playlist"""
+        now = datetime.utcnow()
+        playlist_doc = {
+            "owner_id": owner_id,
+            "name": data.name,
+            "description": data.description,
+            "is_public": data.is_public,
+            "item_count": 0,
+            "created_at": now,
+            "updated_at": now
+        }
+        result = self.playlists_collection.insert_one(playlist_doc)
+        playlist_doc["_id"] = result.inserted_id
+        return self._format_playlist(playlist_doc)
+
+    async def list_playlists(self, owner_id: str, page: int = 1, limit: int = 20) -> List[Dict[str, Any]]:
+        """The owner's playlists, most recently changed first"""
+        docs = self.playlists_collection.find({"owner_id": owner_id}) \
+            .sort([("updated_at", DESCENDING), ("_id", DESCENDING)]).skip((page - 1) * limit).limit(limit)
+        return [self._format_playlist(doc) for doc in docs]
+
+    async def update_playlist(self, playlist_id: str, data: PlaylistUpdate, owner_id: str) -> Optional[Dict[str, Any]]:
+        """Change a playlist's details; None if it is not found or not owned by the user"""
+        if not ObjectId.is_valid(playlist_id):
+            return None
+        update_fields = data.model_dump(exclude_unset=True)
+        update_fields["updated_at"] = datetime.utcnow()
+        doc = self.playlists_collection.find_one_and_update(
+            {"_id": ObjectId(playlist_id), "owner_id": owner_id},
+            {"$set": update_fields},
+            return_document=ReturnDocument.AFTER
+        )
+        return self._format_playlist(doc) if doc else None
+
+    async def delete_playlist(self, playlist_id: str, owner_id: str) -> bool:
+        """Delete a playlist and its items"""
+        if not ObjectId.is_valid(playlist_id):
+            return False
+        result = self.playlists_collection.delete_one({"_id": ObjectId(playlist_id), "owner_id": owner_id})
+        if result.deleted_count == 0:
+            return False
+        self.items_collection.delete_many({"playlist_id": ObjectId(playlist_id)})
+        return True
+
+    async def add_items(self, playlist_id: str, owner_id: str, recitation_ids: List[str],
+                        before_item_id: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """Insert recitations, in the given order, before an item or at the end.
+
+        Returns the new items, or None if the playlist is not found or not
+        owned by the user. Raises ValueError for recitations that are not
+        approved, an unknown before_item_id, or a playlist that would grow
+        past playlist_max_items.
+        """
+        playlist = self._owned_playlist(playlist_id, owner_id)
+        if playlist is None:
+            return None
+        before = self._item(playlist["_id"], before_item_id) if before_item_id else None
+        if before_item_id and before is None:
+            raise ValueError("before_item_id is not an item of this playlist")
+
+        object_ids = [ObjectId(rid) for rid in set(recitation_ids) if ObjectId.is_valid(rid)]
+        approved = {
+            str(doc["_id"]) for doc in self.db.recitations.find(
+                {"_id": {"$in": object_ids}, "status": RecitationStatus.APPROVED.value}, {"_id": 1}
+            )
+        }
+        unknown = [rid for rid in recitation_ids if rid not in approved]
+        if unknown:
+            raise ValueError(f"Recitations not found: {', '.join(unknown)}")
+
+        # Reserve room first, so concurrent adds cannot overfill the playlist together
+        count = len(recitation_ids)
+        reserved = self.playlists_collection.find_one_and_update(
+            {"_id": playlist["_id"], "item_count": {"$lte": settings.playlist_max_items - count}},
+            {"$inc": {"item_count": count}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+        if reserved is None:
+            raise ValueError(f"Playlists hold at most {settings.playlist_max_items} items")
+
+        now = datetime.utcnow()
+        item_docs = [
+            {"playlist_id": playlist["_id"], "recitation_id": rid, "added_at": now}
+            for rid in recitation_ids
+        ]
+        inserted = 0
+        try:
+            for _ in range(PLACEMENT_ATTEMPTS):
+                remaining = item_docs[inserted:]
+                previous, following = self._neighbours(playlist["_id"], before)
+                for item_doc, position in zip(remaining, keys_between(previous, following, len(remaining))):
+                    item_doc["position"] = position
+                try:
+                    self.items_collection.insert_many(remaining, ordered=True)
+                    inserted = len(item_docs)
+                    break
+                except BulkWriteError as e:
+                    # Ordered inserts stop at the first taken key; place the rest again
+                    if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+                        raise
+                    inserted += e.details["nInserted"]
+        finally:
+            if inserted < len(item_docs):
+                self.playlists_collection.update_one(
+                    {"_id": playlist["_id"]}, {"$inc": {"item_count": inserted - len(item_docs)}}
+                )
+        if inserted < len(item_docs):
+            raise RuntimeError("Could not place items after concurrent changes to the playlist")
+        return [self._format_item(item_doc) for item_doc in item_docs]
+
+    async def move_item(self, playlist_id: str, owner_id: str, item_id: str,
+                        before_item_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Move one item before another item, or to the end; only the moved item is written"""
+        playlist = self._owned_playlist(playlist_id, owner_id)
+        if playlist is None:
+            return None
+        item = self._item(playlist["_id"], item_id)
+        if item is None:
+            return None
+        if before_item_id == item_id:
+            raise ValueError("An item cannot be moved before itself")
+        before = self._item(playlist["_id"], before_item_id) if before_item_id else None
+        if before_item_id and before is None:
+            raise ValueError("before_item_id is not an item of this playlist")
+
+        for _ in range(PLACEMENT_ATTEMPTS):
+            previous, following = self._neighbours(playlist["_id"], before, exclude=item["_id"])
+            position = key_between(previous, following)
+            try:
+                self.items_collection.update_one({"_id": item["_id"]}, {"$set": {"position": position}})
+                break
+            except DuplicateKeyError:
+                continue
+        else:
+            raise RuntimeError("Could not place item after concurrent changes to the playlist")
+        self.playlists_collection.update_one({"_id": playlist["_id"]}, {"$set": {"updated_at": datetime.utcnow()}})
+        item["position"] = position
+        return self._format_item(item)
+
+    async def remove_item(self, playlist_id: str, owner_id: str, item_id: str) -> bool:
+        """Remove one item from a playlist"""
+        playlist = self._owned_playlist(playlist_id, owner_id)
+        if playlist is None or not ObjectId.is_valid(item_id):
+            return False
+        result = self.items_collection.delete_one({"_id": ObjectId(item_id), "playlist_id": playlist["_id"]})
+        if result.deleted_count == 0:
+            return False
+        self.playlists_collection.update_one(
+            {"_id": playlist["_id"]},
+            {"$inc": {"item_count": -1}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+        return True
+
+    async def get_playlist_page(self, playlist_id: str, user_id: Optional[str], after: Optional[str] = None,
+                                limit: int = 50) -> Optional[Dict[str, Any]]:
+        """A playlist with one page of hydrated items, starting after the `after` cursor.
+
+        Visible to its owner, and to everyone once public. Items whose
+        recitation was deleted are dropped from the playlist as they are
+        found; items whose recitation is no longer approved are hidden from
+        everyone but its uploader.
+        """
+        if not ObjectId.is_valid(playlist_id):
+            return None
+        playlist = self.playlists_collection.find_one({"_id": ObjectId(playlist_id)})
+        if playlist is None or (not playlist.get("is_public") and playlist["owner_id"] != user_id):
+            return None
+
+        query: Dict[str, Any] = {"playlist_id": playlist["_id"]}
+        if after:
+            query["position"] = {"$gt": after}
+        item_docs = list(self.items_collection.find(query).sort("position", ASCENDING).limit(limit + 1))
+        has_more = len(item_docs) > limit
+        item_docs = item_docs[:limit]
+
+        recitations, missing = await recitation_service.get_recitations_by_ids(
+            [item_doc["recitation_id"] for item_doc in item_docs], user_id
+        )
+        if missing:
+            playlist["item_count"] = playlist.get("item_count", 0) - self._prune(playlist, missing)
+        by_id = {
+            recitation["id"]: recitation for recitation in recitations
+            if recitation["status"] == RecitationStatus.APPROVED.value or recitation["uploader_id"] == user_id
+        }
+
+        formatted = self._format_playlist(playlist)
+        formatted["items"] = [
+            {**self._format_item(item_doc), "recitation": by_id[item_doc["recitation_id"]]}
+            for item_doc in item_docs if item_doc["recitation_id"] in by_id
+        ]
+        formatted["next_cursor"] = item_docs[-1]["position"] if has_more else None
+        return formatted
+
+    def _neighbours(self, playlist_id: ObjectId, before: Optional[Dict[str, Any]],
+                    exclude: Optional[ObjectId] = None):
+        """Positions to place items between: in front of `before`, or at the end when it is None"""
+        query: Dict[str, Any] = {"playlist_id": playlist_id}
+        if exclude is not None:
+            query["_id"] = {"$ne": exclude}
+        following = None
+        if before is not None:
+            # Re-read: the item may have moved or been removed since it was looked up
+            current = self.items_collection.find_one({"_id": before["_id"]}, {"position": 1})
+            if current is None:
+                raise ValueError("before_item_id is not an item of this playlist")
+            following = current["position"]
+            query["position"] = {"$lt": following}
+        previous = self.items_collection.find_one(query, {"position": 1}, sort=[("position", DESCENDING)])
+        return (previous["position"] if previous else None), following
+
+    def _owned_playlist(self, playlist_id: str, owner_id: str) -> Optional[Dict[str, Any]]:
+        if not ObjectId.is_valid(playlist_id):
+            return None
+        return self.playlists_collection.find_one({"_id": ObjectId(playlist_id), "owner_id": owner_id})
+
+    def _item(self, playlist_id: ObjectId, item_id: str) -> Optional[Dict[str, Any]]:
+        if not ObjectId.is_valid(item_id):
+            return None
+        return self.items_collection.find_one({"_id": ObjectId(item_id), "playlist_id": playlist_id})
+
+    def _prune(self, playlist: Dict[str, Any], recitation_ids: List[str]) -> int:
+        """Drop items whose recitations no longer exist; returns how many were dropped"""
+        result = self.items_collection.delete_many(
+            {"playlist_id": playlist["_id"], "recitation_id": {"$in": recitation_ids}}
+        )
+        if result.deleted_count:
+            self.playlists_collection.update_one(
+                {"_id": playlist["_id"]}, {"$inc": {"item_count": -result.deleted_count}}
+            )
+            logger.info("Removed %s deleted recitations from playlist %s", result.deleted_count, playlist["_id"])
+        return result.deleted_count
+
+    def _format_playlist(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": str(doc["_id"]),
+            "owner_id": doc["owner_id"],
+            "name": doc["name"],
+            "description": doc.get("description"),
+            "is_public": doc.get("is_public", False),
+            "item_count": doc.get("item_count", 0),
+            "created_at": doc["created_at"],
+            "updated_at": doc["updated_at"]
+        }
+
+    def _format_item(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "item_id": str(doc["_id"]),
+            "recitation_id": doc["recitation_id"],
+            "position": doc["position"],
+            "added_at": doc["added_at"]
+        }
+
+
+# Global playlist service instance
+playlist_service = PlaylistService()
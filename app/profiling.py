@@ -0,0 +1,367 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from app.auth import verify_admin
+from app.config import settings
+from collections import Counter
+from typing import Any, Dict, Optional
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+# Leaf frames of threads that are parked rather than doing work
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    parts = code.co_filename.replace("\\", "/").split("/")
+    # The last two path components are enough to tell app/services.py from pymongo/cursor.py
+    return f"{'/'.join(parts[-2:])}:{code.co_name}"
+
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_FRAMES
+
+
+class SamplingProfiler:
+    """Samples every thread's stack from a background thread into collapsed-stack counts.
+
+    Nothing runs until a session is started; a session either covers a fixed
+    window or the next N requests whose path starts with a route prefix.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stacks: Counter = Counter()
+        self.samples = 0
+        self.mode: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Request mode
+        self.route: Optional[str] = None
+        self.requests_wanted = 0
+        self.requests_done = 0
+        self._active_requests = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def armed(self) -> bool:
+        """True while waiting for matching requests"""
+        return self.mode == "requests" and self.running
+
+    def start(self, mode: str, interval: float, max_seconds: float, include_idle: bool = False,
+              route: Optional[str] = None, requests: int = 0):
+        """Start a session, discarding the previous result"""
+        with self._lock:
+            if self.running:
+                raise RuntimeError("A profiling session is already running")
+            self._stacks = Counter()
+            self.samples = 0
+            self.mode = mode
+            self.route = route
+            self.requests_wanted = requests
+            self.requests_done = 0
+            self._active_requests = 0
+            self.started_at = time.time()
+            self.finished_at = None
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(interval, max_seconds, include_idle),
+                name="sampling-profiler",
+                daemon=True
+            )
+            self._thread.start()
+        logger.info(f"Sampling profiler started ({mode}, every {interval * 1000:.1f} ms)")
+
+    def stop(self):
+        """Stop the running session, keeping what was sampled so far"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self, interval: float, max_seconds: float, include_idle: bool):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + max_seconds
+        names = {}
+        while not self._stop.wait(interval) and time.monotonic() < deadline:
+            if self.mode == "requests" and self._active_requests == 0:
+                continue
+            frames = sys._current_frames()
+            if len(names) != len(frames):
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            with self._lock:
+                self.samples += 1
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id or (not include_idle and _is_idle(frame)):
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_label(frame))
+                        frame = frame.f_back
+                    stack.append(names.get(thread_id, str(thread_id)))
+                    self._stacks[";".join(reversed(stack))] += 1
+        self.finished_at = time.time()
+        logger.info(f"Sampling profiler stopped after {self.samples} samples")
+
+    def request_started(self):
+        with self._lock:
+            self._active_requests += 1
+
+    def request_finished(self):
+        with self._lock:
+            self._active_requests -= 1
+            self.requests_done += 1
+            done = self.requests_done >= self.requests_wanted
+        if done:
+            self._stop.set()
+
+    def collapsed(self) -> str:
+        """Result in collapsed-stack format (one "frame;frame;... count" line per stack)"""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            status = {
+                "mode": self.mode,
+                "running": self.running,
+                "samples": self.samples,
+                "stacks": len(self._stacks),
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+            if self.mode == "requests":
+                status.update(route=self.route, requests_wanted=self.requests_wanted,
+                              requests_done=self.requests_done)
+            return status
+
+
+class MemoryProfiler:
+    """tracemalloc snapshots and diffs against a baseline snapshot"""
+
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ]
+
+    def start(self, frames: int):
+        if tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is already tracing")
+        tracemalloc.start(frames)
+        self._baseline = None
+        logger.info(f"tracemalloc started with {frames} frames per traceback")
+
+    def stop(self):
+        tracemalloc.stop()
+        self._baseline = None
+        logger.info("tracemalloc stopped")
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing; start it first")
+        return tracemalloc.take_snapshot().filter_traces(self._filters)
+
+    def snapshot(self, key_type: str, limit: int) -> Dict[str, Any]:
+        """Take a snapshot, keep it as the new baseline and return its top allocations"""
+        snapshot = self._take_snapshot()
+        self._baseline = snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "top": [self._stat(stat) for stat in snapshot.statistics(key_type)[:limit]],
+        }
+
+    def diff(self, key_type: str, limit: int) -> Dict[str, Any]:
+        """Compare a fresh snapshot with the baseline, largest growth first"""
+        if self._baseline is None:
+            raise RuntimeError("No baseline snapshot; take one first")
+        snapshot = self._take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "top": [self._stat(stat) for stat in snapshot.compare_to(self._baseline, key_type)[:limit]],
+        }
+
+    def status(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {
+            "tracing": tracing,
+            "frames": tracemalloc.get_traceback_limit() if tracing else 0,
+            "has_baseline": self._baseline is not None,
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+        }
+
+    @staticmethod
+    def _stat(stat) -> Dict[str, Any]:
+        entry = {
+            "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count,
+        }
+        if hasattr(stat, "size_diff"):
+            entry["size_diff_kb"] = round(stat.size_diff / 1024, 1)
+            entry["count_diff"] = stat.count_diff
+        return entry
+
+
+class ProfilingMiddleware(BaseHTTPMiddleware):
+    """Marks requests matching an armed request-mode profile; only installed when debug endpoints are enabled"""
+
+    async def dispatch(self, request: Request, call_next):
+        if not (sampling_profiler.armed and request.url.path.startswith(sampling_profiler.route)):
+            return await call_next(request)
+        sampling_profiler.request_started()
+        try:
+            return await call_next(request)
+        finally:
+            sampling_profiler.request_finished()
+
+
+# Global profiler instances
+sampling_profiler = SamplingProfiler()
+memory_profiler = MemoryProfiler()
+
+router = APIRouter(prefix="/admin/debug")
+
+
+def _interval(interval_ms: Optional[float]) -> float:
+    return (interval_ms or settings.profiler_sample_interval_ms) / 1000
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile_window(
+    seconds: float = Query(10, gt=0, description="Length of the sampling window"),
+    interval_ms: Optional[float] = Query(None, ge=1, le=1000, description="Sampling interval"),
+    include_idle: bool = Query(False, description="Keep samples of threads parked in waits"),
+    user_id: str = Depends(verify_admin)
+):
+    """Admin endpoint to sample all threads for a window and return collapsed stacks"""
+    if seconds > settings.profiler_max_seconds:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {settings.profiler_max_seconds}")
+    try:
+        sampling_profiler.start("window", _interval(interval_ms), seconds, include_idle)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    try:
+        while sampling_profiler.running:
+            await asyncio.sleep(0.2)
+    finally:
+        sampling_profiler.stop()
+    return sampling_profiler.collapsed()
+
+
+@router.post("/profile/requests", status_code=202)
+async def profile_requests(
+    route: str = Query(..., description="Path prefix of the requests to profile, e.g. /api/v1/search"),
+    count: int = Query(20, ge=1, le=10000, description="Number of matching requests to profile"),
+    interval_ms: Optional[float] = Query(None, ge=1, le=1000, description="Sampling interval"),
+    include_idle: bool = Query(False, description="Keep samples of threads parked in waits"),
+    user_id: str = Depends(verify_admin)
+):
+    """Admin endpoint to sample while the next N matching requests are in flight"""
+    try:
+        sampling_profiler.start("requests", _interval(interval_ms), settings.profiler_max_seconds,
+                                include_idle, route=route, requests=count)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return sampling_profiler.status()
+
+
+@router.get("/profile/status")
+async def profile_status(user_id: str = Depends(verify_admin)):
+    """Admin endpoint for the state of the current or last profiling session"""
+    return sampling_profiler.status()
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile_result(user_id: str = Depends(verify_admin)):
+    """Admin endpoint for the collapsed stacks of the last finished session"""
+    if sampling_profiler.mode is None:
+        raise HTTPException(status_code=404, detail="No profiling session has run")
+    if sampling_profiler.running:
+        raise HTTPException(status_code=409, detail="Profiling session still running")
+    return sampling_profiler.collapsed()
+
+
+@router.delete("/profile")
+async def cancel_profile(user_id: str = Depends(verify_admin)):
+    """Admin endpoint to stop the running session early"""
+    sampling_profiler.stop()
+    return sampling_profiler.status()
+
+
+@router.post("/memory/start")
+async def start_memory_tracing(
+    frames: int = Query(None, ge=1, le=100, description="Frames stored per allocation traceback"),
+    user_id: str = Depends(verify_admin)
+):
+    """Admin endpoint to start tracemalloc"""
+    try:
+        memory_profiler.start(frames or settings.tracemalloc_frames)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return memory_profiler.status()
+
+
+@router.post("/memory/snapshot")
+async def memory_snapshot(
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=500),
+    user_id: str = Depends(verify_admin)
+):
+    """Admin endpoint to take a baseline snapshot and list the largest allocations"""
+    try:
+        # Snapshots of a large heap take a while; keep them off the event loop
+        return await asyncio.to_thread(memory_profiler.snapshot, group_by, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/memory/diff")
+async def memory_diff(
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=500),
+    user_id: str = Depends(verify_admin)
+):
+    """Admin endpoint to list allocation growth since the baseline snapshot"""
+    try:
+        return await asyncio.to_thread(memory_profiler.diff, group_by, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/memory/status")
+async def memory_status(user_id: str = Depends(verify_admin)):
+    """Admin endpoint for tracemalloc state"""
+    return memory_profiler.status()
+
+
+@router.post("/memory/stop")
+async def stop_memory_tracing(user_id: str = Depends(verify_admin)):
+    """Admin endpoint to stop tracemalloc and free its traces"""
+    memory_profiler.stop()
+    return memory_profiler.status()
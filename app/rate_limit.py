@@ -0,0 +1,241 @@
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from app.config import settings
+from app.metrics import metrics
+from collections import OrderedDict
+from typing import Tuple
+import logging
+import math
+import time
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # redis is only needed for the shared backend
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = "/api/v1"
+
+_PERIODS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+}
+
+
+def parse_limit(limit: str) -> Tuple[float, float]:
+    """Parse a limit like "30/minute" into (capacity, refill tokens per second)"""
+    try:
+        count, period = limit.strip().split("/")
+        capacity = float(count)
+        seconds = _PERIODS[period.strip().lower().rstrip("s")]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate limit '{limit}', expected e.g. '30/minute'")
+    if capacity <= 0:
+        raise ValueError(f"Invalid rate limit '{limit}', count must be positive")
+    return capacity, capacity / seconds
+
+
+class MemoryBucketStore:
+    """In-process token buckets, one entry per key, least recently used first"""
+
+    def __init__(self, idle_seconds: float, max_keys: int = 100000):
+        self.idle_seconds = idle_seconds
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, capacity: float, rate: float) -> Tuple[bool, float]:
+        """Take one token; return (allowed, seconds until a token is available)"""
+        now = time.monotonic()
+        tokens, last = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - last) * rate)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            allowed, retry_after = True, 0.0
+        else:
+            self._buckets[key] = (tokens, now)
+            allowed, retry_after = False, (1 - tokens) / rate
+        self._buckets.move_to_end(key)
+
+        if len(self._buckets) > self.max_keys:
+            self._evict(now)
+        return allowed, retry_after
+
+    def _evict(self, now: float):
+        """Drop least recently used buckets: idle ones first, then the oldest to stay under max_keys.
+
+        Buckets are kept in use order, so this only looks at the front and
+        costs O(1) per take however many keys are live.
+        """
+        while self._buckets:
+            key, (_, last) = next(iter(self._buckets.items()))
+            if now - last < self.idle_seconds and len(self._buckets) <= self.max_keys:
+                break
+            del self._buckets[key]
+
+
+class RedisBucketStore:
+    """Token buckets shared by all workers through Redis"""
+
+    # Refill and take atomically; returns {allowed, milliseconds to wait}
+    _SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local allowed = 0
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    else
+        wait = math.ceil((1 - tokens) / rate * 1000)
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+    return {allowed, wait}
+    """
+
+    def __init__(self, url: str):
+        if redis_asyncio is None:
+            raise RuntimeError("The redis package is required for rate_limit_backend='redis'")
+        self.client = redis_asyncio.from_url(url)
+        self._script = self.client.register_script(self._SCRIPT)
+
+    async def take(self, key: str, capacity: float, rate: float) -> Tuple[bool, float]:
+        """Take one token; return (allowed, seconds until a token is available)"""
+        allowed, wait_ms = await self._script(
+            keys=[f"ratelimit:{key}"], args=[capacity, rate, time.time()]
+        )
+        return bool(allowed), wait_ms / 1000
+
+
+class RateLimiter:
+    def __init__(self):
+        self.store = None
+        self.default_ip_limit = parse_limit(settings.rate_limit_default_ip)
+        self.default_user_limit = parse_limit(settings.rate_limit_default_user)
+        # Longest prefix first so "/api/v1/search" wins over "/api/v1"
+        self.route_limits = sorted(
+            ((prefix, parse_limit(limit)) for prefix, limit in settings.rate_limit_routes.items()),
+            key=lambda item: len(item[0]),
+            reverse=True
+        )
+        self.max_inflight = settings.max_inflight_requests
+        self.inflight = 0
+        self.rejected = 0
+        self.shed = 0
+        metrics.register("rate_limit", self.stats)
+
+    def initialize(self):
+        """Create the bucket store for the configured backend"""
+        if settings.rate_limit_backend == "redis":
+            self.store = RedisBucketStore(settings.rate_limit_redis_url)
+        else:
+            limits = [self.default_ip_limit, self.default_user_limit]
+            limits += [limit for _, limit in self.route_limits]
+            self.store = MemoryBucketStore(max(capacity / rate for capacity, rate in limits))
+        logger.info(f"Rate limiter initialized with {settings.rate_limit_backend} backend")
+
+    def _route_limit(self, path: str, default: Tuple[float, float]) -> Tuple[str, Tuple[float, float]]:
+        """Find the limit that applies to a path, and the bucket scope it belongs to"""
+        for prefix, limit in self.route_limits:
+            if path.startswith(prefix):
+                return prefix, limit
+        return "*", default
+
+    def client_ip(self, request: Request) -> str:
+        """Get the client IP, honouring X-Forwarded-For behind a trusted proxy"""
+        if settings.rate_limit_trust_forwarded:
+            forwarded = request.headers.get("x-forwarded-for")
+            if forwarded:
+                return forwarded.split(",")[0].strip()
+        return request.client.host if request.client else "unknown"
+
+    async def _take(self, key: str, path: str, default: Tuple[float, float]) -> Tuple[bool, float]:
+        if self.store is None:
+            self.initialize()
+        scope, (capacity, rate) = self._route_limit(path, default)
+        try:
+            return await self.store.take(f"{key}:{scope}", capacity, rate)
+        except Exception as e:
+            # A broken shared backend must not take the API down with it
+            logger.error(f"Rate limit backend error: {e}")
+            return True, 0.0
+
+    async def check_ip(self, request: Request) -> Tuple[bool, float]:
+        """Check the per-IP bucket for a request"""
+        return await self._take(f"ip:{self.client_ip(request)}", request.url.path, self.default_ip_limit)
+
+    async def check_user(self, request: Request, user_id: str):
+        """Check the per-user bucket, raising 429 when it is empty"""
+        if not settings.rate_limit_enabled:
+            return
+        allowed, retry_after = await self._take(f"user:{user_id}", request.url.path, self.default_user_limit)
+        if not allowed:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+
+    def acquire_slot(self) -> bool:
+        """Reserve an in-flight slot, or return False when the API is saturated"""
+        if self.inflight >= self.max_inflight:
+            self.shed += 1
+            return False
+        self.inflight += 1
+        return True
+
+    def release_slot(self):
+        """Release an in-flight slot"""
+        self.inflight -= 1
+
+    def stats(self):
+        """In-flight requests and rejection counters"""
+        return {
+            "backend": settings.rate_limit_backend,
+            "in_flight": self.inflight,
+            "max_in_flight": self.max_inflight,
+            "rejected": self.rejected,
+            "shed": self.shed
+        }
+
+
+class RateLimitMiddleware(BaseHTTPMiddleware):
+    """Per-IP token buckets and in-flight load shedding for API routes"""
+
+    async def dispatch(self, request: Request, call_next):
+        if not request.url.path.startswith(API_PREFIX):
+            return await call_next(request)
+
+        allowed, retry_after = await rate_limiter.check_ip(request)
+        if not allowed:
+            rate_limiter.rejected += 1
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests"},
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+
+        if not rate_limiter.acquire_slot():
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "Server is busy, please retry"},
+                headers={"Retry-After": "1"}
+            )
+        try:
+            return await call_next(request)
+        finally:
+            rate_limiter.release_slot()
+
+
+# Global rate limiter instance
+rate_limiter = RateLimiter()
@@ -0,0 +1,186 @@
+from pymongo import DESCENDING
+from pymongo.errors import PyMongoError
+from app.config import settings
+from app.database import db_manager
+from app.metrics import metrics
+from app.models import RecitationStatus
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def rebuild_pipeline(rebuilt_at: datetime) -> List[Dict[str, Any]]:
+    """Aggregate every reciter profile from the catalog and $merge it into reciters (MongoDB 4.2+)"""
+    latest = settings.reciter_latest_uploads
+    return [
+        {"$match": {"status": RecitationStatus.APPROVED.value}},
+        {"$sort": {"created_at": -1}},
+        # Per reciter and surah, keeping only that surah's newest uploads
+        {"$group": {
+            "_id": {"reciter": "$reciter_name", "surah": "$surah_name"},
+            "count": {"$sum": 1},
+            "likes": {"$sum": {"$ifNull": ["$likes_count", 0]}},
+            "latest": {"$push": {"id": {"$toString": "$_id"}, "title": "$title",
+                                 "surah_name": "$surah_name", "created_at": "$created_at"}}
+        }},
+        {"$project": {"count": 1, "likes": 1, "latest": {"$slice": ["$latest", latest]}}},
+        {"$group": {
+            "_id": "$_id.reciter",
+            "recitations": {"$sum": "$count"},
+            "likes": {"$sum": "$likes"},
+            "surahs": {"$push": {"name": "$_id.surah", "count": "$count"}},
+            "latest": {"$push": "$latest"}
+        }},
+        # Merge the per-surah lists into the reciter's newest uploads overall
+        {"$unwind": "$latest"},
+        {"$unwind": "$latest"},
+        {"$sort": {"_id": 1, "latest.created_at": -1}},
+        {"$group": {
+            "_id": "$_id",
+            "recitations": {"$first": "$recitations"},
+            "likes": {"$first": "$likes"},
+            "surahs": {"$first": "$surahs"},
+            "latest": {"$push": "$latest"}
+        }},
+        {"$project": {
+            "recitations": 1,
+            "likes": 1,
+            "surahs": 1,
+            "latest": {"$slice": ["$latest", latest]},
+            "updated_at": {"$literal": rebuilt_at}
+        }},
+        {"$merge": {"into": "reciters", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+
+
+class ReciterProfiles:
+    """Materialized reciter pages: recitation and like totals, surahs covered, latest uploads.
+
+    One document per reciter name in the reciters collection, counting
+    approved recitations only. RecitationService applies each write's
+    before and after state: totals and per-surah counts move with $inc, and
+    the latest-uploads list is refreshed with one indexed query whenever the
+    reciter's set of approved recitations changes. The rebuild script
+    recomputes everything with rebuild_pipeline().
+    """
+
+    def __init__(self):
+        self.db = db_manager.get_db()
+        self.recitations_collection = self.db.recitations
+        self.reciters_collection = self.db.reciters
+        self.updates = 0
+        self.failures = 0
+        metrics.register("reciter_profiles", self.stats)
+
+    def _entry(self, doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """What a recitation contributes to its reciter's profile, if anything"""
+        if not doc or doc.get("status") != RecitationStatus.APPROVED.value or not doc.get("reciter_name"):
+            return None
+        return {
+            "reciter": doc["reciter_name"],
+            "surah": doc.get("surah_name"),
+            "likes": doc.get("likes_count", 0),
+            "title": doc.get("title"),
+            "created_at": doc.get("created_at")
+        }
+
+    def apply(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        """Apply the change between two states of a recitation (None for created or deleted)"""
+        if not settings.reciter_profiles_enabled:
+            return
+        old = self._entry(before)
+        new = self._entry(after)
+        if old == new:
+            return
+        try:
+            if old:
+                self._add(old, -1)
+            if new:
+                self._add(new, 1)
+            for reciter in {entry["reciter"] for entry in (old, new) if entry}:
+                self._refresh_latest(reciter)
+            self.updates += 1
+        except PyMongoError as e:
+            self.failures += 1
+            logger.error(f"Failed to update reciter profile: {e}")
+
+    def add_likes(self, recitation: Dict[str, Any], delta: int):
+        """Add a like delta to the reciter of an approved recitation"""
+        entry = self._entry(recitation) if settings.reciter_profiles_enabled else None
+        if not entry:
+            return
+        try:
+            self.reciters_collection.update_one({"_id": entry["reciter"]}, {"$inc": {"likes": delta}})
+        except PyMongoError as e:
+            self.failures += 1
+            logger.error(f"Failed to update reciter likes: {e}")
+
+    def _add(self, entry: Dict[str, Any], sign: int):
+        reciter = entry["reciter"]
+        self.reciters_collection.update_one(
+            {"_id": reciter},
+            {"$inc": {"recitations": sign, "likes": sign * entry["likes"]}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        # Bump the surah's count in place, or append it the first time the reciter covers it
+        result = self.reciters_collection.update_one(
+            {"_id": reciter, "surahs.name": entry["surah"]},
+            {"$inc": {"surahs.$.count": sign}}
+        )
+        if not result.matched_count and sign > 0:
+            self.reciters_collection.update_one(
+                {"_id": reciter, "surahs.name": {"$ne": entry["surah"]}},
+                {"$push": {"surahs": {"name": entry["surah"], "count": sign}}}
+            )
+        if sign < 0:
+            self.reciters_collection.update_one({"_id": reciter}, {"$pull": {"surahs": {"count": {"$lte": 0}}}})
+            self.reciters_collection.delete_one({"_id": reciter, "recitations": {"$lte": 0}})
+
+    def _refresh_latest(self, reciter: str):
+        cursor = self.recitations_collection.find(
+            {"reciter_name": reciter, "status": RecitationStatus.APPROVED.value},
+            {"title": 1, "surah_name": 1, "created_at": 1}
+        ).sort("created_at", DESCENDING).limit(settings.reciter_latest_uploads)
+        latest = [
+            {"id": str(doc["_id"]), "title": doc.get("title"), "surah_name": doc.get("surah_name"),
+             "created_at": doc.get("created_at")}
+            for doc in cursor
+        ]
+        self.reciters_collection.update_one({"_id": reciter}, {"$set": {"latest": latest}})
+
+    def get_profile(self, name: str) -> Optional[Dict[str, Any]]:
+        """One reciter page, read by _id"""
+        doc = db_manager.read_collection("reciters").find_one({"_id": name})
+        if not doc or doc.get("recitations", 0) <= 0:
+            return None
+        return {
+            "name": doc["_id"],
+            "recitations": doc["recitations"],
+            "likes": doc.get("likes", 0),
+            "surahs": sorted(doc.get("surahs", []), key=lambda surah: (-surah["count"], surah["name"] or "")),
+            "latest": doc.get("latest", []),
+            "updated_at": doc.get("updated_at")
+        }
+
+    def rebuild(self) -> int:
+        """Recompute every profile with $merge and drop reciters with no approved recitations left"""
+        # BSON dates keep milliseconds, so compare at that precision
+        now = datetime.utcnow()
+        started = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        self.recitations_collection.aggregate(rebuild_pipeline(started), allowDiskUse=True)
+        # Profiles the pipeline did not rewrite belong to reciters that no longer have recitations
+        result = self.reciters_collection.delete_many({"updated_at": {"$lt": started}})
+        return result.deleted_count
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.reciter_profiles_enabled,
+            "updates": self.updates,
+            "failures": self.failures
+        }
+
+
+# Global reciter profiles instance
+reciter_profiles = ReciterProfiles()
@@ -0,0 +1,231 @@
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from app.config import settings
+from app.metrics import metrics
+from pymongo.errors import ConnectionFailure, PyMongoError
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict
+import logging
+import math
+import pymongo
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = "/api/v1"
+
+# Routes that still answer while Mongo is unavailable: served from memory,
+# buffered for later, or degraded (the feed falls back to cached pages)
+MONGO_OPTIONAL_ROUTES = {
+    ("GET", "/api/v1/health"),
+    ("GET", "/api/v1/metrics"),
+    ("GET", "/api/v1/autocomplete"),
+    ("POST", "/api/v1/events/plays"),
+    ("GET", "/api/v1/recitations"),
+}
+
+# Long-running responses keep their Mongo work outside the request deadline
+DEADLINE_EXEMPT_PREFIXES = ("/api/v1/admin/export/", "/api/v1/live/")
+
+# Failures that mean the deployment is unreachable or overloaded, as opposed to
+# a bad query: network errors by exception name, and server error codes for
+# exceeded time limits (50), shutdowns (91, 11600, 11602) and elections
+# (189, 10107, 13435)
+MONGO_FAILURE_TYPES = {"AutoReconnect", "ConnectionFailure", "NetworkTimeout", "ExecutionTimeout"}
+MONGO_FAILURE_CODES = {50, 91, 189, 10107, 11600, 11602, 13435}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class DependencyUnavailableError(HTTPException):
+    """A dependency failed or timed out; answered as 503 with Retry-After"""
+
+    def __init__(self, dependency: str, retry_after: float = 1.0):
+        super().__init__(
+            status_code=503,
+            detail=f"{dependency} is temporarily unavailable, please retry",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+        self.dependency = dependency
+
+
+class CircuitOpenError(DependencyUnavailableError):
+    """Raised instead of calling a dependency whose breaker is open"""
+
+
+def raise_if_unavailable(error: BaseException):
+    """Raise DependencyUnavailableError if error means a dependency is down; return otherwise.
+
+    Catch-all handlers in services and routes call this first, so a Mongo
+    timeout, lost connection or open breaker reaches the client as 503 with
+    Retry-After rather than as "not found", an empty list or a 500.
+    """
+    if isinstance(error, DependencyUnavailableError):
+        raise error
+    if isinstance(error, PyMongoError) and (
+        isinstance(error, ConnectionFailure) or error.timeout
+        or getattr(error, "code", None) in MONGO_FAILURE_CODES
+    ):
+        raise DependencyUnavailableError("mongo", mongo_breaker.retry_after()) from error
+
+
+class CircuitBreaker:
+    """Stops calling a dependency that keeps failing, and probes it again later.
+
+    Closed, it remembers the outcome of the last circuit_breaker_window
+    calls and opens once at least circuit_breaker_min_calls of them are in
+    and the failure ratio reaches circuit_breaker_failure_ratio. Open, calls
+    are rejected without being made. After circuit_breaker_reset_seconds it
+    goes half-open and lets calls through; the next outcome closes it or
+    opens it again. Outcomes may be recorded from any thread.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=settings.circuit_breaker_window)
+        self._failures_in_window = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.trips = 0
+        metrics.register(f"circuit_breaker.{name}", self.stats)
+
+    def allow(self) -> bool:
+        """Whether a call may be made now"""
+        if not settings.circuit_breaker_enabled or self.state == CLOSED:
+            return True
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= settings.circuit_breaker_reset_seconds:
+                self.state = HALF_OPEN
+                logger.info("Circuit breaker for %s is half-open, probing", self.name)
+            if self.state == OPEN:
+                self.rejected += 1
+                return False
+            return True
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may be made now"""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    def retry_after(self) -> float:
+        if self.state != OPEN:
+            return 1.0
+        return max(1.0, settings.circuit_breaker_reset_seconds - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        if not settings.circuit_breaker_enabled:
+            return
+        with self._lock:
+            self.successes += 1
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self._reset_window()
+                logger.warning("Circuit breaker for %s closed", self.name)
+            elif self.state == CLOSED:
+                self._add_outcome(False)
+
+    def record_failure(self):
+        if not settings.circuit_breaker_enabled:
+            return
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self._open()
+            elif self.state == CLOSED:
+                self._add_outcome(True)
+                if (len(self._outcomes) >= settings.circuit_breaker_min_calls
+                        and self._failures_in_window / len(self._outcomes) >= settings.circuit_breaker_failure_ratio):
+                    self._open()
+
+    @contextmanager
+    def guard(self, is_failure: Callable[[BaseException], bool]):
+        """Check the breaker, then record the outcome of the block.
+
+        Exceptions is_failure does not recognise (a missing S3 key, an
+        invalid token) mean the dependency answered, so they count as
+        successes.
+        """
+        self.check()
+        try:
+            yield
+        except BaseException as e:
+            if is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+
+    def _add_outcome(self, failed: bool):
+        if len(self._outcomes) == self._outcomes.maxlen and self._outcomes[0]:
+            self._failures_in_window -= 1
+        self._outcomes.append(failed)
+        if failed:
+            self._failures_in_window += 1
+
+    def _reset_window(self):
+        self._outcomes.clear()
+        self._failures_in_window = 0
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._reset_window()
+        self.trips += 1
+        logger.error("Circuit breaker for %s opened; failing fast for %ss", self.name,
+                     settings.circuit_breaker_reset_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """State and call counters"""
+        return {
+            "state": self.state,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "trips": self.trips
+        }
+
+
+class CircuitBreakerMiddleware(BaseHTTPMiddleware):
+    """Fails API requests fast while Mongo's breaker is open and bounds the rest with a deadline.
+
+    The deadline is pymongo.timeout(): every Mongo operation the request
+    makes, in this task or in worker threads it starts, shares it, so a
+    slow database costs a request at most mongodb_request_deadline_ms.
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        path = request.url.path
+        if not path.startswith(API_PREFIX):
+            return await call_next(request)
+
+        if (request.method, path) not in MONGO_OPTIONAL_ROUTES and not mongo_breaker.allow():
+            error = CircuitOpenError(mongo_breaker.name, mongo_breaker.retry_after())
+            return JSONResponse(status_code=error.status_code, content={"detail": error.detail},
+                                headers=error.headers)
+
+        if settings.mongodb_request_deadline_ms <= 0 or path.startswith(DEADLINE_EXEMPT_PREFIXES):
+            return await call_next(request)
+        with pymongo.timeout(settings.mongodb_request_deadline_ms / 1000):
+            return await call_next(request)
+
+
+def dependency_states() -> Dict[str, str]:
+    """Breaker state per dependency, for the health endpoint"""
+    return {name: breaker.state for name, breaker in breakers.items()}
+
+
+# Global circuit breaker instances
+mongo_breaker = CircuitBreaker("mongo")
+s3_breaker = CircuitBreaker("s3")
+firebase_breaker = CircuitBreaker("firebase")
+breakers = {breaker.name: breaker for breaker in (mongo_breaker, s3_breaker, firebase_breaker)}
@@ -1,19 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
-from fastapi.responses import JSONResponse
-from typing import List, Optional
-from app.auth import verify_token
-from app.services import recitation_service
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from typing import List, Optional, Union
+from app.auth import verify_token, verify_admin
+from app.services import recitation_service, parse_fields
 from app.s3_client import s3_manager
+from app.metrics import metrics
+from app.resilience import dependency_states, raise_if_unavailable
+from app.config import settings
+from app.http_cache import etag_matches, not_modified, set_cache_headers
+from app.export import EXPORT_COLLECTIONS, export_window_end, iter_ndjson
+from app.autocomplete import KINDS, autocomplete_index
+from app.play_counters import play_counter
+from app.live_updates import live_likes
+from app.tag_stats import SORTS as TAG_SORTS, tag_stats
+from app.reciter_profiles import reciter_profiles
+from app.playlists import playlist_service
+from app.sync import SyncTokenError, SyncTokenExpiredError
+from bson import ObjectId
+from datetime import datetime
 from app.models import (
     RecitationCreate, RecitationUpdate, RecitationResponse, 
-    LikeCreate, LikeResponse, SearchFilters, PaginationParams, RecitationStatus
+    RecitationBatchRequest, RecitationBatchResponse, NearbyRecitationResponse, TagStatResponse, RelatedTagsResponse, ReciterProfileResponse, PlaylistCreate, PlaylistUpdate, PlaylistResponse, PlaylistItemsAdd, PlaylistItemMove, PlaylistItemResponse, PlaylistPageResponse, SyncResponse, PlayEvent, PlayEventBatch, LikeCreate, LikeResponse, SearchFilters, PaginationParams, RecitationStatus
 )
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+FIELDS_DESCRIPTION = "Comma-separated fields to return (id is always included), e.g. id,title,reciter_name"
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _sparse_response(recitations: List[dict], fields: List[str], headers: dict) -> JSONResponse:
+    """Return only the requested fields, bypassing the full response model"""
+    content = [{field: recitation.get(field) for field in fields} for recitation in recitations]
+    return JSONResponse(content=jsonable_encoder(content), headers=headers)
+
+
 @router.post("/upload", response_model=RecitationResponse)
 async def upload_recitation(
     title: str = Form(...),
@@ -63,40 +95,86 @@ async def upload_recitation(
     except HTTPException:
         raise
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"Upload error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/recitations", response_model=List[RecitationResponse])
 async def get_recitations(
+    request: Request,
+    response: Response,
     mine: bool = Query(False, description="Get only user's recitations"),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(20, ge=1, le=100, description="Items per page"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     user_id: Optional[str] = Depends(verify_token)
 ):
     """Get recitations with optional filtering"""
+    field_list = _parse_fields(fields)
     try:
+        # Revalidation: compare against the page's validator fields before building the body
+        if request.headers.get("if-none-match"):
+            etag = await recitation_service.get_recitations_etag(
+                user_id=user_id, mine=mine, page=page, limit=limit, fields=field_list
+            )
+            if etag_matches(request, etag):
+                return not_modified(etag, settings.cache_control_feed)
+        
         recitations = await recitation_service.get_recitations(
-            user_id=user_id, mine=mine, page=page, limit=limit
+            user_id=user_id, mine=mine, page=page, limit=limit, fields=field_list
         )
+        etag = recitation_service.etag_for(recitations, field_list)
+        if field_list:
+            return _sparse_response(
+                recitations, field_list, {"Cache-Control": settings.cache_control_feed, "ETag": etag}
+            )
+        set_cache_headers(response, settings.cache_control_feed, etag)
         return recitations
+    except HTTPException:
+        raise
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"Get recitations error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.post("/recitations/batch", response_model=RecitationBatchResponse)
+async def get_recitations_batch(
+    batch: RecitationBatchRequest,
+    user_id: Optional[str] = Depends(verify_token)
+):
+    """Get up to 300 recitations by ID in one request, in the requested order"""
+    try:
+        recitations, missing = await recitation_service.get_recitations_by_ids(batch.ids, user_id)
+        return {"recitations": recitations, "missing": missing}
+    except Exception as e:
+        raise_if_unavailable(e)
+        logger.error(f"Get recitations batch error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @router.get("/recitations/{recitation_id}", response_model=RecitationResponse)
 async def get_recitation(
     recitation_id: str,
+    request: Request,
+    response: Response,
     user_id: Optional[str] = Depends(verify_token)
 ):
     """Get a specific recitation by ID"""
     try:
+        # Revalidation: compare against the validator fields before building the body
+        if request.headers.get("if-none-match"):
+            etag = await recitation_service.get_recitation_etag(recitation_id, user_id)
+            if etag_matches(request, etag):
+                return not_modified(etag, settings.cache_control_recitation)
+        
         recitation = await recitation_service.get_recitation_by_id(recitation_id, user_id)
         if not recitation:
             raise HTTPException(status_code=404, detail="Recitation not found")
+        set_cache_headers(response, settings.cache_control_recitation, recitation_service.etag_for([recitation]))
         return recitation
     except HTTPException:
         raise
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"Get recitation error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
@@ -115,6 +193,7 @@ async def update_recitation(
     except HTTPException:
         raise
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"Update recitation error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
@@ -132,6 +211,7 @@ async def delete_recitation(
     except HTTPException:
         raise
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"Delete recitation error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
@@ -149,33 +229,116 @@ async def like_recitation(
     except HTTPException:
         raise
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"Like recitation error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.get("/sync", response_model=SyncResponse)
+async def sync_changes(
+    since: Optional[str] = Query(None, description="next_token from the previous sync; omit for a full sync"),
+    limit: int = Query(200, ge=1, le=1000, description="Changes per page"),
+    user_id: str = Depends(verify_token)
+):
+    """Recitations and likes changed since a sync token, for clients that keep a local mirror.
+    
+    Follow next_token while has_more is true, then keep the last next_token for the next sync.
+    """
+    try:
+        return await recitation_service.get_changes(user_id, since, limit)
+    except SyncTokenExpiredError as e:
+        raise HTTPException(status_code=410, detail=f"{e}; sync again without a token")
+    except SyncTokenError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise_if_unavailable(e)
+        logger.error(f"Sync error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/events/plays", status_code=202)
+async def record_plays(
+    payload: Union[PlayEventBatch, PlayEvent],
+    user_id: Optional[str] = Depends(verify_token)
+):
+    """Record one play event or a batch of them; counts are written in the background"""
+    if not settings.play_events_enabled:
+        raise HTTPException(status_code=503, detail="Play events are disabled")
+    events = payload.events if isinstance(payload, PlayEventBatch) else [payload]
+    if len(events) > settings.play_batch_max_events:
+        raise HTTPException(status_code=413, detail=f"At most {settings.play_batch_max_events} events per batch")
+    # Malformed IDs are dropped here; well-formed unknown IDs simply match nothing when flushed
+    valid_ids = [event.recitation_id for event in events if ObjectId.is_valid(event.recitation_id)]
+    accepted = play_counter.record(valid_ids)
+    return {"accepted": accepted, "rejected": len(events) - accepted}
+
+@router.get("/live/likes")
+async def stream_like_counts(
+    ids: str = Query(..., description="Comma-separated recitation IDs to follow"),
+    user_id: Optional[str] = Depends(verify_token)
+):
+    """Stream like counts as Server-Sent Events: the current counts, then changed counts as they happen"""
+    if not settings.live_updates_enabled:
+        raise HTTPException(status_code=503, detail="Live updates are disabled")
+    recitation_ids = list(dict.fromkeys(rid.strip() for rid in ids.split(",") if rid.strip()))
+    if not recitation_ids or len(recitation_ids) > settings.live_updates_max_ids:
+        raise HTTPException(status_code=400, detail=f"Follow between 1 and {settings.live_updates_max_ids} recitations")
+    try:
+        initial = await recitation_service.get_like_counts(recitation_ids)
+    except Exception as e:
+        raise_if_unavailable(e)
+        logger.error(f"Live like counts error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    
+    if not initial:
+        raise HTTPException(status_code=404, detail="Recitations not found")
+    
+    subscriber = live_likes.subscribe(initial)
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many live connections, please retry", headers={"Retry-After": "5"})
+    return StreamingResponse(
+        live_likes.stream(subscriber, initial),
+        media_type="text/event-stream",
+        # Proxies must neither cache nor buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/recommendations", response_model=List[RecitationResponse])
 async def get_recommendations(
+    response: Response,
     limit: int = Query(10, ge=1, le=50, description="Number of recommendations"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     user_id: str = Depends(verify_token)
 ):
     """Get personalized recommendations"""
+    field_list = _parse_fields(fields)
     try:
-        recommendations = await recitation_service.get_recommendations(user_id, limit)
+        recommendations = await recitation_service.get_recommendations(user_id, limit, field_list)
+        if field_list:
+            return _sparse_response(
+                recommendations, field_list, {"Cache-Control": settings.cache_control_recommendations}
+            )
+        set_cache_headers(response, settings.cache_control_recommendations)
         return recommendations
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"Get recommendations error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/search", response_model=List[RecitationResponse])
 async def search_recitations(
+    response: Response,
     reciter_name: Optional[str] = Query(None, description="Search by reciter name"),
     masjid_location: Optional[str] = Query(None, description="Search by masjid location"),
     surah_name: Optional[str] = Query(None, description="Search by surah name"),
     tags: Optional[str] = Query(None, description="Search by tags (comma-separated)"),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(20, ge=1, le=100, description="Items per page"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     user_id: Optional[str] = Depends(verify_token)
 ):
     """Search recitations with filters"""
+    field_list = _parse_fields(fields)
     try:
         # Parse tags
         tag_list = None
@@ -194,13 +357,280 @@ async def search_recitations(
         search_filters = {k: v for k, v in search_filters.items() if v is not None}
         
         results = await recitation_service.search_recitations(
-            search_filters, page, limit
+            search_filters, page, limit, field_list
         )
+        if field_list:
+            return _sparse_response(results, field_list, {"Cache-Control": settings.cache_control_search})
+        set_cache_headers(response, settings.cache_control_search)
         return results
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"Search recitations error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.get("/nearby", response_model=List[NearbyRecitationResponse])
+async def get_nearby_recitations(
+    response: Response,
+    lat: float = Query(..., ge=-90, le=90, description="Latitude"),
+    lng: float = Query(..., ge=-180, le=180, description="Longitude"),
+    radius: Optional[float] = Query(None, gt=0, description="Search radius in km"),
+    page: int = Query(1, ge=1, description="Page number"),
+    limit: int = Query(20, ge=1, le=100, description="Items per page"),
+    user_id: Optional[str] = Depends(verify_token)
+):
+    """Get approved recitations from masjids near a point, ranked by distance and recency"""
+    radius_km = radius or settings.nearby_default_radius_km
+    if radius_km > settings.nearby_max_radius_km:
+        raise HTTPException(status_code=400, detail=f"radius must be at most {settings.nearby_max_radius_km:g} km")
+    # Only the nearest nearby_max_candidates are ranked, so later pages would always be empty
+    if (page - 1) * limit >= settings.nearby_max_candidates:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Only the nearest {settings.nearby_max_candidates} recitations are ranked; "
+                   f"this page starts after them"
+        )
+    try:
+        recitations = await recitation_service.get_nearby_recitations(lat, lng, radius_km, page, limit, user_id)
+        set_cache_headers(response, settings.cache_control_nearby)
+        return recitations
+    except Exception as e:
+        raise_if_unavailable(e)
+        logger.error(f"Get nearby recitations error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/autocomplete")
+async def autocomplete(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100, description="Prefix typed so far"),
+    kind: Optional[str] = Query(None, description="Only suggest this kind: reciter, masjid, surah or tag"),
+    limit: int = Query(10, ge=1, le=25, description="Number of suggestions"),
+    user_id: Optional[str] = Depends(verify_token)
+):
+    """Suggest reciter, masjid, surah and tag names for a prefix, most popular first"""
+    if kind is not None and kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of: {', '.join(KINDS)}")
+    try:
+        # Ranking a short prefix walks thousands of entries; keep it off the event loop
+        suggestions = await asyncio.to_thread(autocomplete_index.suggest, q, kind, limit)
+        set_cache_headers(response, settings.cache_control_autocomplete)
+        return {"suggestions": suggestions}
+    except Exception as e:
+        raise_if_unavailable(e)
+        logger.error(f"Autocomplete error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/tags", response_model=List[TagStatResponse])
+async def list_tags(
+    response: Response,
+    sort: str = Query("recitations", description="Order by recitations, likes or name"),
+    prefix: Optional[str] = Query(None, min_length=1, max_length=100, description="Only tags starting with this"),
+    page: int = Query(1, ge=1, description="Page number"),
+    limit: int = Query(50, ge=1, le=200, description="Items per page"),
+    user_id: Optional[str] = Depends(verify_token)
+):
+    """Browse tags with how many approved recitations use them and their total likes"""
+    if not settings.tag_stats_enabled:
+        raise HTTPException(status_code=503, detail="Tag statistics are disabled")
+    if sort not in TAG_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(TAG_SORTS)}")
+    try:
+        tags = tag_stats.list_tags(sort, prefix, page, limit)
+        set_cache_headers(response, settings.cache_control_tags)
+        return tags
+    except Exception as e:
+        raise_if_unavailable(e)
+        logger.error(f"List tags error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/tags/{tag}/related", response_model=RelatedTagsResponse)
+async def get_related_tags(
+    tag: str,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100, description="Number of related tags"),
+    user_id: Optional[str] = Depends(verify_token)
+):
+    """Tags most often used on the same recitations as a tag"""
+    if not settings.tag_stats_enabled:
+        raise HTTPException(status_code=503, detail="Tag statistics are disabled")
+    try:
+        if not tag_stats.get_tag(tag):
+            raise HTTPException(status_code=404, detail="Tag not found")
+        related = tag_stats.related(tag, limit)
+        set_cache_headers(response, settings.cache_control_tags)
+        return {"tag": tag, "related": related}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise_if_unavailable(e)
+        logger.error(f"Get related tags error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/reciters/{name}", response_model=ReciterProfileResponse)
+async def get_reciter_profile(
+    name: str,
+    response: Response,
+    user_id: Optional[str] = Depends(verify_token)
+):
+    """Reciter page: approved recitations, total likes, surahs covered and latest uploads"""
+    if not settings.reciter_profiles_enabled:
+        raise HTTPException(status_code=503, detail="Reciter profiles are disabled")
+    try:
+        profile = reciter_profiles.get_profile(name)
+        if not profile:
+            raise HTTPException(status_code=404, detail="Reciter not found")
+        set_cache_headers(response, settings.cache_control_reciter)
+        return profile
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise_if_unavailable(e)
+        logger.error(f"Get reciter profile error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/playlists", response_model=PlaylistResponse, status_code=201)
+async def create_playlist(
+    playlist_data: PlaylistCreate,
+    user_id: str = Depends(verify_token)
+):
+    """Create an empty playlist"""
+    try:
+        return await playlist_service.create_playlist(playlist_data, user_id)
+    except Exception as e:
+        raise_if_unavailable(e)
+        logger.error(f"Create playlist error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/playlists", response_model=List[PlaylistResponse])
+async def list_playlists(
+    page: int = Query(1, ge=1, description="Page number"),
+    limit: int = Query(20, ge=1, le=100, description="Items per page"),
+    user_id: str = Depends(verify_token)
+):
+    """The user's playlists, most recently changed first"""
+    try:
+        return await playlist_service.list_playlists(user_id, page=page, limit=limit)
+    except Exception as e:
+        raise_if_unavailable(e)
+        logger.error(f"List playlists error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/playlists/{playlist_id}", response_model=PlaylistPageResponse)
+async def get_playlist(
+    playlist_id: str,
+    after: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=100, description="Items per page"),
+    user_id: Optional[str] = Depends(verify_token)
+):
+    """A playlist with one page of its items, in order"""
+    try:
+        playlist = await playlist_service.get_playlist_page(playlist_id, user_id, after=after, limit=limit)
+        if not playlist:
+            raise HTTPException(status_code=404, detail="Playlist not found")
+        return playlist
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise_if_unavailable(e)
+        logger.error(f"Get playlist error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.put("/playlists/{playlist_id}", response_model=PlaylistResponse)
+async def update_playlist(
+    playlist_id: str,
+    update_data: PlaylistUpdate,
+    user_id: str = Depends(verify_token)
+):
+    """Rename a playlist or change its description or visibility"""
+    try:
+        playlist = await playlist_service.update_playlist(playlist_id, update_data, user_id)
+        if not playlist:
+            raise HTTPException(status_code=404, detail="Playlist not found or not owned by user")
+        return playlist
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise_if_unavailable(e)
+        logger.error(f"Update playlist error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.delete("/playlists/{playlist_id}")
+async def delete_playlist(
+    playlist_id: str,
+    user_id: str = Depends(verify_token)
+):
+    """Delete a playlist and its items"""
+    try:
+        if not await playlist_service.delete_playlist(playlist_id, user_id):
+            raise HTTPException(status_code=404, detail="Playlist not found or not owned by user")
+        return {"message": "Playlist deleted successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise_if_unavailable(e)
+        logger.error(f"Delete playlist error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/playlists/{playlist_id}/items", response_model=List[PlaylistItemResponse], status_code=201)
+async def add_playlist_items(
+    playlist_id: str,
+    items: PlaylistItemsAdd,
+    user_id: str = Depends(verify_token)
+):
+    """Add recitations, in order, before an item or at the end"""
+    try:
+        added = await playlist_service.add_items(playlist_id, user_id, items.recitation_ids, items.before_item_id)
+        if added is None:
+            raise HTTPException(status_code=404, detail="Playlist not found or not owned by user")
+        return added
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise_if_unavailable(e)
+        logger.error(f"Add playlist items error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/playlists/{playlist_id}/items/{item_id}/move", response_model=PlaylistItemResponse)
+async def move_playlist_item(
+    playlist_id: str,
+    item_id: str,
+    move: PlaylistItemMove,
+    user_id: str = Depends(verify_token)
+):
+    """Move an item before another item, or to the end"""
+    try:
+        item = await playlist_service.move_item(playlist_id, user_id, item_id, move.before_item_id)
+        if item is None:
+            raise HTTPException(status_code=404, detail="Playlist item not found or not owned by user")
+        return item
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise_if_unavailable(e)
+        logger.error(f"Move playlist item error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.delete("/playlists/{playlist_id}/items/{item_id}")
+async def remove_playlist_item(
+    playlist_id: str,
+    item_id: str,
+    user_id: str = Depends(verify_token)
+):
+    """Remove an item from a playlist"""
+    try:
+        if not await playlist_service.remove_item(playlist_id, user_id, item_id):
+            raise HTTPException(status_code=404, detail="Playlist item not found or not owned by user")
+        return {"message": "Playlist item removed successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise_if_unavailable(e)
+        logger.error(f"Remove playlist item error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @router.post("/s3/upload")
 async def upload_audio_to_s3(file: UploadFile = File(...)):
     """Upload audio file directly to S3"""
@@ -219,6 +649,7 @@ async def upload_audio_to_s3(file: UploadFile = File(...)):
     except HTTPException:
         raise
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"S3 upload error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
@@ -236,13 +667,25 @@ async def delete_audio_from_s3(filename: str):
     except HTTPException:
         raise
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"S3 delete error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "message": "Quran Platform API is running"}
+    """Health check endpoint; "degraded" while a dependency's circuit breaker is not closed"""
+    dependencies = dependency_states()
+    healthy = all(state == "closed" for state in dependencies.values())
+    return {
+        "status": "healthy" if healthy else "degraded",
+        "message": "Quran Platform API is running",
+        "dependencies": dependencies
+    }
+
+@router.get("/metrics")
+async def get_metrics():
+    """Runtime metrics (request coalescing, rate limiting, ...)"""
+    return metrics.collect()
 
 @router.put("/admin/recitations/{recitation_id}/status")
 async def update_recitation_status(
@@ -267,6 +710,7 @@ async def update_recitation_status(
     except HTTPException:
         raise
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"Update status error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
@@ -283,5 +727,32 @@ async def get_pending_recitations(
         )
         return recitations
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"Get pending recitations error: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal server error") 
+
+@router.get("/admin/export/{collection}")
+async def export_collection(
+    collection: str,
+    since: Optional[datetime] = Query(None, description="Only export documents changed after this time"),
+    after_id: Optional[str] = Query(None, description="Resume after this _id among documents stamped at since"),
+    user_id: str = Depends(verify_admin)
+):
+    """Admin endpoint to stream a collection as NDJSON.
+    
+    X-Export-Watermark is where this export's window ends: the since for the next incremental export.
+    """
+    if collection not in EXPORT_COLLECTIONS:
+        raise HTTPException(status_code=404, detail="Unknown export collection")
+    if after_id is not None and (since is None or not ObjectId.is_valid(after_id)):
+        raise HTTPException(status_code=400, detail="after_id must be a valid ID and needs since")
+    until = export_window_end()
+    # The sync generator runs in the threadpool and is sent with chunked transfer encoding
+    return StreamingResponse(
+        iter_ndjson(collection, since, after_id=ObjectId(after_id) if after_id else None, until=until),
+        media_type="application/x-ndjson",
+        headers={
+            "Content-Disposition": f'attachment; filename="{collection}.ndjson"',
+            "X-Export-Watermark": until.isoformat()
+        }
+    )
\ No newline at end of file
@@ -1,6 +1,10 @@
 import boto3
-from botocore.exceptions import ClientError, NoCredentialsError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionError, HTTPClientError, NoCredentialsError
 from app.config import settings
+from app.resilience import CircuitOpenError, s3_breaker
+from app.tracing import trace_span
 import logging
 from typing import Optional
 import uuid
@@ -9,10 +13,30 @@ import os
 
 logger = logging.getLogger(__name__)
 
+# Error codes S3 returns when it is overloaded or failing, as opposed to a bad request
+S3_UNAVAILABLE_CODES = {"SlowDown", "RequestTimeout", "ServiceUnavailable", "InternalError"}
+
+
+def is_s3_failure(error: BaseException) -> bool:
+    """Whether an error means S3 is unreachable or unhealthy, for the circuit breaker"""
+    if isinstance(error, (ConnectionError, HTTPClientError)):
+        return True
+    if isinstance(error, ClientError):
+        response = error.response
+        status = response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        return status >= 500 or response.get("Error", {}).get("Code") in S3_UNAVAILABLE_CODES
+    return False
+
+
 class S3Manager:
     def __init__(self):
         self.s3_client = None
         self.bucket_name = settings.bucket_name
+        self.transfer_config = TransferConfig(
+            multipart_threshold=settings.s3_multipart_threshold_mb * 1024 * 1024,
+            multipart_chunksize=settings.s3_multipart_chunk_mb * 1024 * 1024,
+            max_concurrency=settings.s3_multipart_concurrency
+        )
     
     def initialize(self):
         """Initialize S3 client"""
@@ -21,7 +45,12 @@ class S3Manager:
                 's3',
                 aws_access_key_id=settings.aws_access_key_id,
                 aws_secret_access_key=settings.aws_secret_access_key,
-                region_name=settings.aws_region
+                region_name=settings.aws_region,
+                config=Config(
+                    connect_timeout=settings.s3_connect_timeout_seconds,
+                    read_timeout=settings.s3_read_timeout_seconds,
+                    retries={"max_attempts": settings.s3_max_attempts, "mode": "standard"}
+                )
             )
             logger.info("S3 client initialized successfully")
         except NoCredentialsError:
@@ -43,19 +72,22 @@ class S3Manager:
             filename = f"recitations/{user_id}/{timestamp}_{unique_id}.{file_extension}"
             
             # Upload file
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=filename,
-                Body=file_data,
-                ContentType=f'audio/{file_extension}',
-                ACL='public-read'
-            )
+            with s3_breaker.guard(is_s3_failure), trace_span("s3"):
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=filename,
+                    Body=file_data,
+                    ContentType=f'audio/{file_extension}',
+                    ACL='public-read'
+                )
             
             # Generate public URL
             url = f"https://{self.bucket_name}.s3.{settings.aws_region}.amazonaws.com/{filename}"
-            logger.info(f"File uploaded successfully: {url}")
+            logger.info("File uploaded successfully: %s", url)
             return url
             
+        except CircuitOpenError:
+            raise
         except ClientError as e:
             logger.error(f"Failed to upload file to S3: {e}")
             return None
@@ -73,19 +105,22 @@ class S3Manager:
             s3_key = f"uploads/{filename}"
             
             # Upload to S3
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=s3_key,
-                Body=file_data,
-                ContentType='audio/mpeg',
-                ACL='public-read'
-            )
+            with s3_breaker.guard(is_s3_failure), trace_span("s3"):
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=s3_key,
+                    Body=file_data,
+                    ContentType='audio/mpeg',
+                    ACL='public-read'
+                )
             
             # Build the public URL
             public_url = f"https://{self.bucket_name}.s3.{settings.aws_region}.amazonaws.com/{s3_key}"
-            logger.info(f"Audio file uploaded successfully: {public_url}")
+            logger.info("Audio file uploaded successfully: %s", public_url)
             return public_url
             
+        except CircuitOpenError:
+            raise
         except ClientError as e:
             logger.error(f"Failed to upload audio file to S3: {e}")
             return None
@@ -93,6 +128,35 @@ class S3Manager:
             logger.error(f"Unexpected error uploading audio file: {e}")
             return None
     
+    def upload_local_file(self, path: str, s3_key: str, content_type: str = 'audio/mpeg') -> Optional[str]:
+        """Upload a file from disk to S3, using multipart uploads for large files"""
+        if not self.s3_client:
+            self.initialize()
+        
+        try:
+            with s3_breaker.guard(is_s3_failure), trace_span("s3"):
+                self.s3_client.upload_file(
+                    path,
+                    self.bucket_name,
+                    s3_key,
+                    ExtraArgs={'ContentType': content_type, 'ACL': 'public-read'},
+                    Config=self.transfer_config
+                )
+            
+            # Build the public URL
+            public_url = f"https://{self.bucket_name}.s3.{settings.aws_region}.amazonaws.com/{s3_key}"
+            logger.debug("Local file uploaded successfully: %s", public_url)
+            return public_url
+            
+        except CircuitOpenError:
+            raise
+        except ClientError as e:
+            logger.error(f"Failed to upload {path} to S3: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error uploading {path}: {e}")
+            return None
+    
     def delete_file(self, file_url: str) -> bool:
         """Delete file from S3"""
         if not self.s3_client:
@@ -102,13 +166,16 @@ class S3Manager:
             # Extract key from URL
             key = file_url.split(f"{self.bucket_name}.s3.{settings.aws_region}.amazonaws.com/")[1]
             
-            self.s3_client.delete_object(
-                Bucket=self.bucket_name,
-                Key=key
-            )
-            logger.info(f"File deleted successfully: {key}")
+            with s3_breaker.guard(is_s3_failure), trace_span("s3"):
+                self.s3_client.delete_object(
+                    Bucket=self.bucket_name,
+                    Key=key
+                )
+            logger.info("File deleted successfully: %s", key)
             return True
             
+        except CircuitOpenError:
+            raise
         except ClientError as e:
             logger.error(f"Failed to delete file from S3: {e}")
             return False
@@ -123,10 +190,13 @@ class S3Manager:
         
         try:
             s3_key = f"uploads/{filename}"
-            self.s3_client.delete_object(Bucket=self.bucket_name, Key=s3_key)
-            logger.info(f"Audio file deleted successfully: {s3_key}")
+            with s3_breaker.guard(is_s3_failure), trace_span("s3"):
+                self.s3_client.delete_object(Bucket=self.bucket_name, Key=s3_key)
+            logger.info("Audio file deleted successfully: %s", s3_key)
             return True
             
+        except CircuitOpenError:
+            raise
         except ClientError as e:
             logger.error(f"Failed to delete audio file from S3: {e}")
             return False
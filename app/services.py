@@ -1,18 +1,66 @@
 from app.database import db_manager
 from app.s3_client import s3_manager
-from app.models import RecitationCreate, RecitationUpdate, RecitationStatus, LikeCreate
+from app.models import RecitationCreate, RecitationUpdate, RecitationStatus, RecitationResponse, LikeCreate
+from app.singleflight import SingleFlight
+from app.http_cache import make_etag
+from app.change_streams import ChangeEvent, change_events
+from app.like_counters import like_counter
+from app.fingerprint import fingerprint_indexer
+from app.geo import gazetteer, geo_point
+from app.catalog_snapshot import catalog_snapshot
+from app.tag_stats import tag_stats
+from app.reciter_profiles import reciter_profiles
+from app.resilience import DependencyUnavailableError, mongo_breaker, raise_if_unavailable
+from app.sync import PHASES as SYNC_PHASES, SyncToken, SyncTokenExpiredError, truncate_ms
+from app.metrics import metrics
+from app.config import settings
 from bson import ObjectId
-from datetime import datetime
-from typing import List, Optional, Dict, Any
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, PyMongoError
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, Sequence, Tuple
+import asyncio
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Fields a client can ask for with fields=, in response order
+RECITATION_FIELDS = tuple(RecitationResponse.model_fields)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Parse a comma-separated fields= parameter; None means every field"""
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(RECITATION_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return ["id"] + [field for field in RECITATION_FIELDS if field in requested and field != "id"]
+
+
 class RecitationService:
     def __init__(self):
         self.db = db_manager.get_db()
         self.recitations_collection = self.db.recitations
         self.likes_collection = self.db.likes
+        self.tombstones_collection = self.db.tombstones
+        
+        # Feed, search and recommendation reads may be routed to secondaries
+        self.recitations_reads = db_manager.read_collection("recitations")
+        self.likes_reads = db_manager.read_collection("likes")
+        
+        # Identical concurrent reads share one in-flight Mongo query
+        self._by_id_flight = SingleFlight("recitation_by_id")
+        self._feed_flight = SingleFlight("feed_page")
+        self._search_flight = SingleFlight("search")
+        
+        # Last good public feed pages, served while Mongo is unavailable
+        self._fallback_pages: "OrderedDict[Tuple, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self.fallback_pages_served = 0
+        metrics.register("feed_fallback", self.fallback_stats)
     
     async def create_recitation(self, recitation_data: RecitationCreate, audio_file: bytes, 
                               file_extension: str, user_id: str) -> Optional[Dict[str, Any]]:
@@ -24,33 +72,21 @@ class RecitationService:
                 raise Exception("Failed to upload audio file")
             
             # Create recitation document
-            recitation_doc = {
-                "title": recitation_data.title,
-                "reciter_name": recitation_data.reciter_name,
-                "masjid_name": recitation_data.masjid_name,
-                "masjid_location": recitation_data.masjid_location,
-                "surah_name": recitation_data.surah_name,
-                "surah_number": recitation_data.surah_number,
-                "ayah_start": recitation_data.ayah_start,
-                "ayah_end": recitation_data.ayah_end,
-                "description": recitation_data.description,
-                "tags": recitation_data.tags or [],
-                "uploader_id": user_id,
-                "audio_url": audio_url,
-                "status": RecitationStatus.PENDING.value,
-                "likes_count": 0,
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            }
+            recitation_doc = self.build_recitation_doc(recitation_data, audio_url, user_id)
             
             # Insert into MongoDB
             result = self.recitations_collection.insert_one(recitation_doc)
             recitation_doc["_id"] = result.inserted_id
+            self._publish("insert", recitation_doc["_id"], full_document=recitation_doc)
+            tag_stats.apply(None, recitation_doc)
+            reciter_profiles.apply(None, recitation_doc)
+            fingerprint_indexer.submit(str(result.inserted_id), audio_url)
             
-            logger.info(f"Recitation created successfully: {result.inserted_id}")
+            logger.info("Recitation created successfully: %s", result.inserted_id)
             return self._format_recitation(recitation_doc)
             
         except Exception as e:
+            raise_if_unavailable(e)
             logger.error(f"Failed to create recitation: {e}")
             return None
     
@@ -59,82 +95,185 @@ class RecitationService:
         """Create a new recitation with existing S3 URL"""
         try:
             # Create recitation document
-            recitation_doc = {
-                "title": recitation_data.title,
-                "reciter_name": recitation_data.reciter_name,
-                "masjid_name": recitation_data.masjid_name,
-                "masjid_location": recitation_data.masjid_location,
-                "surah_name": recitation_data.surah_name,
-                "surah_number": recitation_data.surah_number,
-                "ayah_start": recitation_data.ayah_start,
-                "ayah_end": recitation_data.ayah_end,
-                "description": recitation_data.description,
-                "tags": recitation_data.tags or [],
-                "uploader_id": user_id,
-                "audio_url": audio_url,
-                "status": RecitationStatus.PENDING.value,
-                "likes_count": 0,
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            }
+            recitation_doc = self.build_recitation_doc(recitation_data, audio_url, user_id)
             
             # Insert into MongoDB
             result = self.recitations_collection.insert_one(recitation_doc)
             recitation_doc["_id"] = result.inserted_id
+            self._publish("insert", recitation_doc["_id"], full_document=recitation_doc)
+            tag_stats.apply(None, recitation_doc)
+            reciter_profiles.apply(None, recitation_doc)
+            fingerprint_indexer.submit(str(result.inserted_id), audio_url)
             
-            logger.info(f"Recitation created successfully: {result.inserted_id}")
+            logger.info("Recitation created successfully: %s", result.inserted_id)
             return self._format_recitation(recitation_doc)
             
         except Exception as e:
+            raise_if_unavailable(e)
             logger.error(f"Failed to create recitation: {e}")
             return None
     
+    async def create_recitations_bulk(self, items: List[Tuple[RecitationCreate, str]], user_id: str,
+                                      import_keys: Optional[List[str]] = None) -> List[Optional[str]]:
+        """Insert many recitations (data, audio URL) in one unordered batch.
+        
+        Returns the new ID for each item, or None for items that failed to insert.
+        With import_keys, each recitation is stored with its key, which is
+        unique: an item whose key is already in gets the existing ID back, so
+        re-running an interrupted import does not insert it twice.
+        """
+        recitation_docs = [self.build_recitation_doc(data, audio_url, user_id) for data, audio_url in items]
+        if not recitation_docs:
+            return []
+        if import_keys is not None:
+            for recitation_doc, import_key in zip(recitation_docs, import_keys):
+                recitation_doc["import_key"] = import_key
+        
+        failed = set()
+        existing: Dict[int, Optional[str]] = {}
+        try:
+            self.recitations_collection.insert_many(recitation_docs, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                if error["code"] == 11000 and "import_key" in recitation_docs[error["index"]]:
+                    existing[error["index"]] = None
+                else:
+                    failed.add(error["index"])
+        if existing:
+            # A duplicate key error is only "already imported" if the key is actually there
+            keys = {recitation_docs[index]["import_key"]: index for index in existing}
+            for doc in self.recitations_collection.find({"import_key": {"$in": list(keys)}}, {"import_key": 1}):
+                existing[keys[doc["import_key"]]] = str(doc["_id"])
+            failed.update(index for index, recitation_id in existing.items() if recitation_id is None)
+            existing = {index: recitation_id for index, recitation_id in existing.items() if recitation_id}
+            if existing:
+                logger.info(f"{len(existing)} of {len(recitation_docs)} recitations were already imported")
+        if failed:
+            logger.error(f"Bulk insert failed for {len(failed)} of {len(recitation_docs)} recitations")
+        
+        inserted_ids = []
+        for index, recitation_doc in enumerate(recitation_docs):
+            if index in failed:
+                inserted_ids.append(None)
+                continue
+            if index in existing:
+                inserted_ids.append(existing[index])
+                continue
+            self._publish("insert", recitation_doc["_id"], full_document=recitation_doc)
+            tag_stats.apply(None, recitation_doc)
+            reciter_profiles.apply(None, recitation_doc)
+            fingerprint_indexer.submit(str(recitation_doc["_id"]), recitation_doc["audio_url"])
+            inserted_ids.append(str(recitation_doc["_id"]))
+        return inserted_ids
+    
+    def build_recitation_doc(self, recitation_data: RecitationCreate, audio_url: str,
+                             user_id: str) -> Dict[str, Any]:
+        """Build a new pending recitation document"""
+        now = datetime.utcnow()
+        recitation_doc = {
+            "title": recitation_data.title,
+            "reciter_name": recitation_data.reciter_name,
+            "masjid_name": recitation_data.masjid_name,
+            "masjid_location": recitation_data.masjid_location,
+            "surah_name": recitation_data.surah_name,
+            "surah_number": recitation_data.surah_number,
+            "ayah_start": recitation_data.ayah_start,
+            "ayah_end": recitation_data.ayah_end,
+            "description": recitation_data.description,
+            "tags": recitation_data.tags or [],
+            "uploader_id": user_id,
+            "audio_url": audio_url,
+            "status": RecitationStatus.PENDING.value,
+            "likes_count": 0,
+            "created_at": now,
+            "updated_at": now,
+            "changed_at": now
+        }
+        # Coordinates for nearby search, from the bundled gazetteer
+        recitation_doc.update(gazetteer.geo_fields(recitation_data.masjid_name, recitation_data.masjid_location))
+        return recitation_doc
+    
     async def get_recitations(self, user_id: Optional[str] = None, 
-                            mine: bool = False, page: int = 1, limit: int = 20) -> List[Dict[str, Any]]:
-        """Get recitations with optional filtering"""
+                            mine: bool = False, page: int = 1, limit: int = 20,
+                            fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Get recitations with optional filtering.
+        
+        With fields, only those fields are read and returned, plus the ones etag_for needs.
+        """
         try:
             skip = (page - 1) * limit
             
             # Build query
-            query = {"status": RecitationStatus.APPROVED.value}
-            
-            if mine and user_id:
-                query["uploader_id"] = user_id
-            elif mine and not user_id:
+            query = self._feed_query(user_id, mine)
+            if query is None:
                 return []
             
-            # Get recitations
-            cursor = self.recitations_collection.find(query).sort("created_at", -1).skip(skip).limit(limit)
+            if fields is not None:
+                fields = sorted(set(fields) | self._ETAG_FIELDS)
+            projection = self._projection(fields)
+            
+            # Get recitations from the in-memory snapshot when it is built, else from Mongo;
+            # the public feed is the same for everyone, so share the query
+            docs = catalog_snapshot.feed(skip, limit, user_id if mine else None)
+            if docs is None and mine:
+                mongo_breaker.check()
+                docs = await asyncio.to_thread(self._find_page, query, skip, limit, projection)
+            elif docs is None:
+                docs = await self._public_feed_page(query, skip, limit, fields, projection)
+            
+            # Check which of these recitations the user liked
+            liked_ids = self._liked_ids(user_id, [str(doc["_id"]) for doc in docs])
             recitations = []
-            
-            for doc in cursor:
-                recitation = self._format_recitation(doc)
-                # Check if user liked this recitation
-                if user_id:
-                    like = self.likes_collection.find_one({
-                        "user_id": user_id,
-                        "recitation_id": str(doc["_id"])
-                    })
-                    recitation["is_liked"] = like is not None
-                else:
-                    recitation["is_liked"] = False
-                
+            for doc in docs:
+                recitation = self._format_recitation(doc, fields)
+                recitation["is_liked"] = recitation["id"] in liked_ids
                 recitations.append(recitation)
             
             return recitations
             
         except Exception as e:
+            raise_if_unavailable(e)
             logger.error(f"Failed to get recitations: {e}")
             return []
     
+    async def _public_feed_page(self, query: Dict[str, Any], skip: int, limit: int,
+                                fields: Optional[List[str]],
+                                projection: Optional[Dict[str, int]]) -> List[Dict[str, Any]]:
+        """Fetch a public feed page, falling back to the last good copy while Mongo is unavailable"""
+        key = (skip, limit, tuple(fields) if fields else None)
+        if mongo_breaker.allow():
+            try:
+                docs = await self._feed_flight.do(key, self._find_page, query, skip, limit, projection)
+                self._fallback_pages[key] = (time.monotonic(), docs)
+                self._fallback_pages.move_to_end(key)
+                if len(self._fallback_pages) > settings.feed_fallback_pages:
+                    self._fallback_pages.popitem(last=False)
+                return docs
+            except PyMongoError as e:
+                logger.error(f"Feed query failed, trying the fallback page: {e}")
+        
+        cached = self._fallback_pages.get(key)
+        if cached is None or time.monotonic() - cached[0] > settings.feed_fallback_max_age_seconds:
+            raise DependencyUnavailableError("mongo", mongo_breaker.retry_after())
+        self.fallback_pages_served += 1
+        return cached[1]
+    
+    def fallback_stats(self) -> Dict[str, Any]:
+        """Feed pages kept and served for when Mongo is unavailable"""
+        return {"pages": len(self._fallback_pages), "served": self.fallback_pages_served}
+    
     async def get_recitation_by_id(self, recitation_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """Get a specific recitation by ID"""
         try:
-            doc = self.recitations_collection.find_one({"_id": ObjectId(recitation_id)})
+            doc = await self._by_id_flight.do(
+                recitation_id, self.recitations_collection.find_one, {"_id": ObjectId(recitation_id)}
+            )
             if not doc:
                 return None
             
             recitation = self._format_recitation(doc)
+            if like_counter.is_sharded(doc):
+                recitation["likes_count"] += like_counter.pending(recitation_id)
             
             # Check if user liked this recitation
             if user_id:
@@ -149,9 +288,189 @@ class RecitationService:
             return recitation
             
         except Exception as e:
+            raise_if_unavailable(e)
             logger.error(f"Failed to get recitation: {e}")
             return None
     
+    async def get_recitations_by_ids(self, recitation_ids: List[str],
+                                     user_id: Optional[str] = None) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Get many recitations by ID with one query, in the requested order.
+        
+        Returns the recitations found and the requested IDs that were not found.
+        """
+        # Keep the first occurrence of each ID; malformed IDs can never be found
+        requested = list(dict.fromkeys(recitation_ids))
+        object_ids = [ObjectId(rid) for rid in requested if ObjectId.is_valid(rid)]
+        
+        docs = {}
+        if object_ids:
+            for doc in self.recitations_collection.find({"_id": {"$in": object_ids}}):
+                docs[str(doc["_id"])] = doc
+        
+        sharded_ids = [rid for rid, doc in docs.items() if like_counter.is_sharded(doc)]
+        pending_likes = like_counter.pending_many(sharded_ids) if sharded_ids else {}
+        liked_ids = self._liked_ids(user_id, list(docs))
+        
+        recitations = []
+        missing = []
+        for rid in requested:
+            doc = docs.get(rid)
+            if doc is None:
+                missing.append(rid)
+                continue
+            recitation = self._format_recitation(doc)
+            recitation["likes_count"] += pending_likes.get(rid, 0)
+            recitation["is_liked"] = rid in liked_ids
+            recitations.append(recitation)
+        return recitations, missing
+    
+    async def get_like_counts(self, recitation_ids: List[str]) -> Dict[str, int]:
+        """Current like counts for the given recitations, including unrolled shards; unknown IDs are left out"""
+        object_ids = [ObjectId(rid) for rid in recitation_ids if ObjectId.is_valid(rid)]
+        if not object_ids:
+            return {}
+        docs = list(self.recitations_reads.find(
+            {"_id": {"$in": object_ids}}, {"likes_count": 1, "like_shards": 1}
+        ))
+        sharded_ids = [str(doc["_id"]) for doc in docs if like_counter.is_sharded(doc)]
+        pending_likes = like_counter.pending_many(sharded_ids) if sharded_ids else {}
+        return {
+            str(doc["_id"]): doc.get("likes_count", 0) + pending_likes.get(str(doc["_id"]), 0)
+            for doc in docs
+        }
+    
+    async def get_recitation_etag(self, recitation_id: str, user_id: Optional[str] = None) -> Optional[str]:
+        """Compute a recitation's ETag from its validator fields, without building the body"""
+        try:
+            doc = self.recitations_collection.find_one({"_id": ObjectId(recitation_id)}, self._VALIDATOR_FIELDS)
+            if not doc:
+                return None
+            if like_counter.is_sharded(doc):
+                doc["likes_count"] = doc.get("likes_count", 0) + like_counter.pending(recitation_id)
+            return self._etag_from_docs([doc], self._liked_ids(user_id, [recitation_id]))
+            
+        except Exception as e:
+            logger.error(f"Failed to get recitation etag: {e}")
+            return None
+    
+    async def get_recitations_etag(self, user_id: Optional[str] = None, mine: bool = False,
+                                   page: int = 1, limit: int = 20,
+                                   fields: Optional[List[str]] = None) -> Optional[str]:
+        """Compute a feed page's ETag from its validator fields, without building the body"""
+        try:
+            skip = (page - 1) * limit
+            query = self._feed_query(user_id, mine)
+            if query is None:
+                return make_etag(*self._fields_part(fields))
+            
+            docs = catalog_snapshot.feed(skip, limit, user_id if mine else None)
+            if docs is None:
+                # Revalidating against a fallback page is not worth a doomed query
+                if not mongo_breaker.allow():
+                    return None
+                docs = list(
+                    self.recitations_reads.find(query, self._VALIDATOR_FIELDS)
+                    .sort("created_at", -1).skip(skip).limit(limit)
+                )
+            liked_ids = self._liked_ids(user_id, [str(doc["_id"]) for doc in docs])
+            return self._etag_from_docs(docs, liked_ids, fields)
+            
+        except Exception as e:
+            logger.error(f"Failed to get recitations etag: {e}")
+            return None
+    
+    def etag_for(self, recitations: List[Dict[str, Any]], fields: Optional[List[str]] = None) -> str:
+        """ETag for formatted recitations; matches the validator-only computation"""
+        return make_etag(*(
+            self._etag_part(r["id"], r["updated_at"], r["likes_count"], r["is_liked"])
+            for r in recitations
+        ), *self._fields_part(fields))
+    
+    async def get_changes(self, user_id: str, token: Optional[str] = None, limit: int = 200) -> Dict[str, Any]:
+        """One page of changes since a sync token (app/sync.py); no token starts a full sync.
+        
+        Raises SyncTokenError for a malformed token and SyncTokenExpiredError
+        when its window starts before the oldest tombstones still kept. The
+        window ends sync_settle_seconds in the past, so writes stamped just
+        before it but committed just after are not skipped, and it is read
+        from the primary for the same reason.
+        """
+        cursor = SyncToken.decode(token) if token else SyncToken()
+        now = datetime.utcnow()
+        retention = timedelta(days=settings.sync_tombstone_retention_days)
+        if cursor.since is not None and cursor.since < now - retention:
+            raise SyncTokenExpiredError(f"Sync tokens expire after {settings.sync_tombstone_retention_days} days")
+        if cursor.until is None:
+            cursor.until = max(truncate_ms(now - timedelta(seconds=settings.sync_settle_seconds)),
+                               cursor.since or datetime.min)
+        
+        changes: Dict[str, Any] = {"removed": [], "recitations": [], "unliked": [], "liked": []}
+        remaining = limit
+        while cursor.phase < len(SYNC_PHASES) and remaining > 0:
+            phase = SYNC_PHASES[cursor.phase]
+            # A first sync has nothing to remove
+            docs = [] if cursor.since is None and phase in ("removed", "unliked") else \
+                self._sync_phase(phase, user_id, cursor, remaining)
+            if phase == "recitations":
+                changes[phase].extend(docs)
+            else:
+                changes[phase].extend(doc["recitation_id"] for doc in docs)
+            if len(docs) < remaining:
+                cursor.phase += 1
+                cursor.after = None
+            else:
+                last = docs[-1]
+                cursor.after = (last[self._SYNC_TIME_FIELDS[phase]], last["_id"])
+            remaining -= len(docs)
+        
+        recitation_ids = [str(doc["_id"]) for doc in changes["recitations"]]
+        sharded_ids = [rid for rid, doc in zip(recitation_ids, changes["recitations"]) if like_counter.is_sharded(doc)]
+        pending_likes = like_counter.pending_many(sharded_ids) if sharded_ids else {}
+        # Not _liked_ids: a mirror must not store is_liked from a skipped lookup
+        liked_ids = {
+            like["recitation_id"] for like in self.likes_collection.find(
+                {"user_id": user_id, "recitation_id": {"$in": recitation_ids}}, {"recitation_id": 1, "_id": 0}
+            )
+        } if recitation_ids else set()
+        recitations = []
+        for doc in changes["recitations"]:
+            recitation = self._format_recitation(doc)
+            recitation["likes_count"] += pending_likes.get(recitation["id"], 0)
+            recitation["is_liked"] = recitation["id"] in liked_ids
+            recitations.append(recitation)
+        changes["recitations"] = recitations
+        
+        has_more = cursor.phase < len(SYNC_PHASES)
+        changes["has_more"] = has_more
+        changes["next_token"] = (cursor if has_more else cursor.next_round()).encode()
+        return changes
+    
+    # Timestamp each sync phase pages by, together with _id. changed_at also moves
+    # with likes_count, which updated_at (and so the ETags) deliberately does not
+    _SYNC_TIME_FIELDS = {"removed": "removed_at", "recitations": "changed_at", "unliked": "removed_at", "liked": "created_at"}
+    
+    def _sync_phase(self, phase: str, user_id: str, cursor: SyncToken, limit: int) -> List[Dict[str, Any]]:
+        """Next rows of one sync phase inside the token's window, in (timestamp, _id) order"""
+        if phase == "removed":
+            collection, query = self.tombstones_collection, {"collection": "recitations", "user_id": None}
+        elif phase == "recitations":
+            collection, query = self.recitations_collection, {"status": RecitationStatus.APPROVED.value}
+        elif phase == "unliked":
+            collection, query = self.tombstones_collection, {"collection": "likes", "user_id": user_id}
+        else:
+            collection, query = self.likes_collection, {"user_id": user_id}
+        
+        time_field = self._SYNC_TIME_FIELDS[phase]
+        window = {"$lte": cursor.until}
+        if cursor.after is not None:
+            # Resume at the last row returned; rows sharing its timestamp are told apart by _id
+            window["$gte"] = cursor.after[0]
+            query["$or"] = [{time_field: {"$gt": cursor.after[0]}}, {"_id": {"$gt": cursor.after[1]}}]
+        elif cursor.since is not None:
+            window["$gt"] = cursor.since
+        query[time_field] = window
+        return list(collection.find(query).sort([(time_field, 1), ("_id", 1)]).limit(limit))
+    
     async def update_recitation(self, recitation_id: str, update_data: RecitationUpdate, 
                               user_id: str) -> Optional[Dict[str, Any]]:
         """Update a recitation"""
@@ -175,21 +494,37 @@ class RecitationService:
                 return self._format_recitation(recitation)
             
             update_fields["updated_at"] = datetime.utcnow()
+            update_fields["changed_at"] = update_fields["updated_at"]
+            update = {"$set": update_fields}
+            
+            # Re-resolve coordinates when the masjid changes
+            if "masjid_name" in update_fields or "masjid_location" in update_fields:
+                geo_fields = gazetteer.geo_fields(
+                    update_fields.get("masjid_name", recitation.get("masjid_name")),
+                    update_fields.get("masjid_location", recitation.get("masjid_location"))
+                )
+                update_fields.update(geo_fields)
+                if not geo_fields:
+                    update["$unset"] = {"masjid_geo": "", "masjid_geo_precision": ""}
             
             # Update in MongoDB
             result = self.recitations_collection.update_one(
                 {"_id": ObjectId(recitation_id)},
-                {"$set": update_fields}
+                update
             )
             
             if result.modified_count > 0:
                 # Get updated document
                 updated_doc = self.recitations_collection.find_one({"_id": ObjectId(recitation_id)})
+                self._publish("update", updated_doc["_id"], full_document=updated_doc)
+                tag_stats.apply(recitation, updated_doc)
+                reciter_profiles.apply(recitation, updated_doc)
                 return self._format_recitation(updated_doc)
             
             return None
             
         except Exception as e:
+            raise_if_unavailable(e)
             logger.error(f"Failed to update recitation: {e}")
             return None
     
@@ -209,15 +544,27 @@ class RecitationService:
             if recitation.get("audio_url"):
                 s3_manager.delete_file(recitation["audio_url"])
             
-            # Delete likes
+            # Delete likes, remembering whose they were for synced clients
+            liked_by = self.likes_collection.distinct("user_id", {"recitation_id": recitation_id})
             self.likes_collection.delete_many({"recitation_id": recitation_id})
+            if like_counter.is_sharded(recitation):
+                like_counter.delete(recitation_id)
+            fingerprint_indexer.delete(recitation_id)
             
             # Delete recitation
             result = self.recitations_collection.delete_one({"_id": ObjectId(recitation_id)})
+            if result.deleted_count > 0:
+                self._publish("delete", recitation["_id"])
+                if recitation.get("status") == RecitationStatus.APPROVED.value:
+                    self._tombstone("recitations", recitation_id)
+                self._tombstone("likes", recitation_id, liked_by)
+                tag_stats.apply(recitation, None)
+                reciter_profiles.apply(recitation, None)
             
             return result.deleted_count > 0
             
         except Exception as e:
+            raise_if_unavailable(e)
             logger.error(f"Failed to delete recitation: {e}")
             return False
     
@@ -238,10 +585,9 @@ class RecitationService:
             if existing_like:
                 # Unlike
                 self.likes_collection.delete_one({"_id": existing_like["_id"]})
-                self.recitations_collection.update_one(
-                    {"_id": ObjectId(recitation_id)},
-                    {"$inc": {"likes_count": -1}}
-                )
+                self._publish("delete", existing_like["_id"], collection="likes")
+                self._tombstone("likes", recitation_id, [user_id])
+                self._increment_likes(recitation, -1)
                 return True
             else:
                 # Like
@@ -251,33 +597,36 @@ class RecitationService:
                     "created_at": datetime.utcnow()
                 }
                 self.likes_collection.insert_one(like_doc)
-                self.recitations_collection.update_one(
-                    {"_id": ObjectId(recitation_id)},
-                    {"$inc": {"likes_count": 1}}
-                )
+                self._publish("insert", like_doc["_id"], full_document=like_doc, collection="likes")
+                self._increment_likes(recitation, 1)
                 return True
                 
         except Exception as e:
+            raise_if_unavailable(e)
             logger.error(f"Failed to like/unlike recitation: {e}")
             return False
     
-    async def get_recommendations(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+    async def get_recommendations(self, user_id: str, limit: int = 10,
+                                  fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """Get personalized recommendations for a user"""
         try:
+            projection = self._projection(fields)
+            
             # Get user's liked recitations
-            user_likes = list(self.likes_collection.find({"user_id": user_id}))
+            user_likes = list(self.likes_reads.find({"user_id": user_id}))
             liked_recitation_ids = [like["recitation_id"] for like in user_likes]
             
             if not liked_recitation_ids:
                 # If no likes, return recent popular recitations
-                cursor = self.recitations_collection.find(
-                    {"status": RecitationStatus.APPROVED.value}
-                ).sort("likes_count", -1).limit(limit)
+                cursor = catalog_snapshot.recommend([], (), (), (), limit)
+                if cursor is None:
+                    cursor = self._most_engaged({"status": RecitationStatus.APPROVED.value}, projection, limit)
             else:
                 # Get liked recitations to analyze preferences
-                liked_recitations = list(self.recitations_collection.find({
-                    "_id": {"$in": [ObjectId(rid) for rid in liked_recitation_ids]}
-                }))
+                liked_recitations = list(self.recitations_reads.find(
+                    {"_id": {"$in": [ObjectId(rid) for rid in liked_recitation_ids]}},
+                    {"reciter_name": 1, "surah_name": 1, "tags": 1}
+                ))
                 
                 # Extract preferences
                 preferred_reciters = set()
@@ -290,71 +639,102 @@ class RecitationService:
                     preferred_tags.update(recitation.get("tags", []))
                 
                 # Find similar recitations
-                query = {
-                    "status": RecitationStatus.APPROVED.value,
-                    "_id": {"$nin": [ObjectId(rid) for rid in liked_recitation_ids]}
-                }
-                
-                # Build recommendation query
-                recommendation_conditions = []
-                if preferred_reciters:
-                    recommendation_conditions.append({"reciter_name": {"$in": list(preferred_reciters)}})
-                if preferred_surahs:
-                    recommendation_conditions.append({"surah_name": {"$in": list(preferred_surahs)}})
-                if preferred_tags:
-                    recommendation_conditions.append({"tags": {"$in": list(preferred_tags)}})
-                
-                if recommendation_conditions:
-                    query["$or"] = recommendation_conditions
-                
-                cursor = self.recitations_collection.find(query).sort("likes_count", -1).limit(limit)
+                cursor = catalog_snapshot.recommend(
+                    liked_recitation_ids, preferred_reciters, preferred_surahs, preferred_tags, limit
+                )
+                if cursor is None:
+                    query = self._recommendation_query(
+                        liked_recitation_ids, preferred_reciters, preferred_surahs, preferred_tags
+                    )
+                    cursor = self._most_engaged(query, projection, limit)
             
             recommendations = []
             for doc in cursor:
-                recitation = self._format_recitation(doc)
+                recitation = self._format_recitation(doc, fields)
                 recitation["is_liked"] = False
                 recommendations.append(recitation)
             
             return recommendations
             
         except Exception as e:
+            raise_if_unavailable(e)
             logger.error(f"Failed to get recommendations: {e}")
             return []
     
     async def search_recitations(self, search_filters: Dict[str, Any], 
-                               page: int = 1, limit: int = 20) -> List[Dict[str, Any]]:
+                               page: int = 1, limit: int = 20,
+                               fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """Search recitations with filters"""
         try:
             skip = (page - 1) * limit
             
-            # Build search query
-            query = {"status": RecitationStatus.APPROVED.value}
-            
-            if search_filters.get("reciter_name"):
-                query["reciter_name"] = {"$regex": search_filters["reciter_name"], "$options": "i"}
-            
-            if search_filters.get("masjid_location"):
-                query["masjid_location"] = {"$regex": search_filters["masjid_location"], "$options": "i"}
-            
-            if search_filters.get("surah_name"):
-                query["surah_name"] = {"$regex": search_filters["surah_name"], "$options": "i"}
-            
-            if search_filters.get("tags"):
-                query["tags"] = {"$in": search_filters["tags"]}
+            query = self._search_query(search_filters)
             
-            # Execute search
-            cursor = self.recitations_collection.find(query).sort("created_at", -1).skip(skip).limit(limit)
+            # Execute search; popular queries arrive in bursts, so share identical ones
+            flight_key = (
+                tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in search_filters.items())),
+                skip,
+                limit,
+                tuple(fields) if fields else None
+            )
+            docs = catalog_snapshot.search(search_filters, skip, limit)
+            if docs is None:
+                docs = await self._search_flight.do(
+                    flight_key, self._find_page, query, skip, limit, self._projection(fields)
+                )
             
             results = []
-            for doc in cursor:
-                results.append(self._format_recitation(doc))
+            for doc in docs:
+                results.append(self._format_recitation(doc, fields))
             
             return results
             
         except Exception as e:
+            raise_if_unavailable(e)
             logger.error(f"Failed to search recitations: {e}")
             return []
     
+    async def get_nearby_recitations(self, lat: float, lng: float, radius_km: float,
+                                     page: int = 1, limit: int = 20,
+                                     user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Approved recitations within radius_km of a point, ranked by distance and recency.
+        
+        The nearest nearby_max_candidates come from the 2dsphere index; they are
+        then ranked by a blend of closeness and age, and each carries distance_km.
+        """
+        try:
+            skip = (page - 1) * limit
+            docs = list(self.recitations_reads.aggregate([
+                {"$geoNear": {
+                    "near": geo_point(lat, lng),
+                    "key": "masjid_geo",
+                    "distanceField": "distance_m",
+                    "maxDistance": radius_km * 1000,
+                    "query": {"status": RecitationStatus.APPROVED.value},
+                    "spherical": True
+                }},
+                {"$limit": settings.nearby_max_candidates}
+            ]))
+            
+            now = datetime.utcnow()
+            docs.sort(key=lambda doc: self._nearby_score(doc, radius_km, now), reverse=True)
+            docs = docs[skip:skip + limit]
+            liked_ids = self._liked_ids(user_id, [str(doc["_id"]) for doc in docs])
+            
+            recitations = []
+            for doc in docs:
+                recitation = self._format_recitation(doc)
+                recitation["distance_km"] = round(doc["distance_m"] / 1000, 2)
+                recitation["is_liked"] = str(doc["_id"]) in liked_ids
+                recitations.append(recitation)
+            
+            return recitations
+            
+        except Exception as e:
+            raise_if_unavailable(e)
+            logger.error(f"Failed to get nearby recitations: {e}")
+            return []
+    
     async def update_recitation_status(self, recitation_id: str, status: RecitationStatus, 
                                      reason: Optional[str], user_id: str) -> Optional[Dict[str, Any]]:
         """Update recitation status (admin function)"""
@@ -365,9 +745,11 @@ class RecitationService:
                 return None
             
             # Update status
+            now = datetime.utcnow()
             update_fields = {
                 "status": status.value,
-                "updated_at": datetime.utcnow()
+                "updated_at": now,
+                "changed_at": now
             }
             
             if reason:
@@ -382,11 +764,19 @@ class RecitationService:
             if result.modified_count > 0:
                 # Get updated document
                 updated_doc = self.recitations_collection.find_one({"_id": ObjectId(recitation_id)})
+                self._publish("update", updated_doc["_id"], full_document=updated_doc)
+                tag_stats.apply(recitation, updated_doc)
+                reciter_profiles.apply(recitation, updated_doc)
+                # Synced clients have to drop recitations that leave the approved catalog
+                if (recitation.get("status") == RecitationStatus.APPROVED.value
+                        and status != RecitationStatus.APPROVED):
+                    self._tombstone("recitations", recitation_id)
                 return self._format_recitation(updated_doc)
             
             return None
             
         except Exception as e:
+            raise_if_unavailable(e)
             logger.error(f"Failed to update recitation status: {e}")
             return None
     
@@ -406,16 +796,201 @@ class RecitationService:
             for doc in cursor:
                 recitation = self._format_recitation(doc)
                 recitation["is_liked"] = False  # Admin view doesn't need like status
+                # Likely re-encoded or trimmed copies of other uploads, best match first
+                recitation["duplicates"] = doc.get("duplicate_candidates", [])
                 recitations.append(recitation)
             
             return recitations
             
         except Exception as e:
+            raise_if_unavailable(e)
             logger.error(f"Failed to get recitations by status: {e}")
             return []
     
-    def _format_recitation(self, doc: Dict[str, Any]) -> Dict[str, Any]:
-        """Format recitation document for response"""
+    # Fields that change whenever a recitation response body changes
+    _VALIDATOR_FIELDS = {"updated_at": 1, "likes_count": 1, "like_shards": 1}
+    # Formatted fields etag_for reads, kept on sparse feed pages
+    _ETAG_FIELDS = {"id", "updated_at", "likes_count"}
+    
+    def _projection(self, fields: Optional[List[str]]) -> Optional[Dict[str, int]]:
+        """Mongo projection for a fields= selection (_id is always returned)"""
+        if fields is None:
+            return None
+        return {field: 1 for field in fields if field != "id"}
+    
+    def _fields_part(self, fields: Optional[List[str]]) -> List[str]:
+        """ETag part telling sparse representations apart from the full one"""
+        return [f"fields={','.join(fields)}"] if fields else []
+    
+    def _feed_query(self, user_id: Optional[str], mine: bool) -> Optional[Dict[str, Any]]:
+        """Build the feed query, or None when "mine" is asked for without a user"""
+        query = {"status": RecitationStatus.APPROVED.value}
+        if mine:
+            if not user_id:
+                return None
+            query["uploader_id"] = user_id
+        return query
+    
+    def _search_query(self, search_filters: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the search query from the search filters"""
+        query = {"status": RecitationStatus.APPROVED.value}
+        
+        if search_filters.get("reciter_name"):
+            query["reciter_name"] = {"$regex": search_filters["reciter_name"], "$options": "i"}
+        
+        if search_filters.get("masjid_location"):
+            query["masjid_location"] = {"$regex": search_filters["masjid_location"], "$options": "i"}
+        
+        if search_filters.get("surah_name"):
+            query["surah_name"] = {"$regex": search_filters["surah_name"], "$options": "i"}
+        
+        if search_filters.get("tags"):
+            query["tags"] = {"$in": search_filters["tags"]}
+        
+        return query
+    
+    def _recommendation_query(self, liked_recitation_ids: List[str], preferred_reciters: set,
+                              preferred_surahs: set, preferred_tags: set) -> Dict[str, Any]:
+        """Build the query for unliked recitations sharing a reciter, surah or tag with the liked ones"""
+        query = {
+            "status": RecitationStatus.APPROVED.value,
+            "_id": {"$nin": [ObjectId(rid) for rid in liked_recitation_ids]}
+        }
+        
+        recommendation_conditions = []
+        if preferred_reciters:
+            recommendation_conditions.append({"reciter_name": {"$in": list(preferred_reciters)}})
+        if preferred_surahs:
+            recommendation_conditions.append({"surah_name": {"$in": list(preferred_surahs)}})
+        if preferred_tags:
+            recommendation_conditions.append({"tags": {"$in": list(preferred_tags)}})
+        
+        if recommendation_conditions:
+            query["$or"] = recommendation_conditions
+        return query
+    
+    def _liked_ids(self, user_id: Optional[str], recitation_ids: List[str]) -> set:
+        """Return which of the given recitations the user has liked, in one query.
+        
+        is_liked is an enrichment: while Mongo is unavailable the recitations
+        are returned as not liked rather than not at all.
+        """
+        if not user_id or not recitation_ids or not mongo_breaker.allow():
+            return set()
+        try:
+            likes = self.likes_collection.find(
+                {"user_id": user_id, "recitation_id": {"$in": recitation_ids}},
+                {"recitation_id": 1, "_id": 0}
+            )
+            return {like["recitation_id"] for like in likes}
+        except PyMongoError as e:
+            logger.error(f"Skipping is_liked hydration: {e}")
+            return set()
+    
+    def _etag_part(self, recitation_id: str, updated_at: datetime, likes_count: int, is_liked: bool) -> str:
+        return f"{recitation_id}:{updated_at.isoformat()}:{likes_count}:{int(is_liked)}"
+    
+    def _etag_from_docs(self, docs: List[Dict[str, Any]], liked_ids: set,
+                        fields: Optional[List[str]] = None) -> str:
+        return make_etag(*(
+            self._etag_part(str(doc["_id"]), doc["updated_at"], doc.get("likes_count", 0),
+                            str(doc["_id"]) in liked_ids)
+            for doc in docs
+        ), *self._fields_part(fields))
+    
+    def _most_engaged(self, query: Dict[str, Any], projection: Optional[Dict[str, int]],
+                      limit: int) -> List[Dict[str, Any]]:
+        """Recitations matching query with the highest likes plus weighted plays.
+        
+        Reads the top candidates by likes_count and by plays_count with two
+        index-ordered queries and ranks their union, which approximates the
+        exact ranking without scoring every match.
+        """
+        if projection is not None:
+            projection = dict(projection, likes_count=1, plays_count=1)
+        candidates = limit * settings.recommendation_candidate_factor
+        docs = {}
+        for sort_field in ("likes_count", "plays_count"):
+            for doc in self.recitations_reads.find(query, projection).sort(sort_field, -1).limit(candidates):
+                docs[doc["_id"]] = doc
+        return sorted(docs.values(), key=self._engagement, reverse=True)[:limit]
+    
+    def _engagement(self, doc: Dict[str, Any]) -> float:
+        return doc.get("likes_count", 0) + settings.recommendation_play_weight * doc.get("plays_count", 0)
+    
+    def _nearby_score(self, doc: Dict[str, Any], radius_km: float, now: datetime) -> float:
+        """Blend of closeness (1 at the point, 0 at the radius) and recency (halving every half-life)"""
+        closeness = max(0.0, 1 - doc["distance_m"] / (radius_km * 1000))
+        age_days = max(0.0, (now - doc["created_at"]).total_seconds() / 86400)
+        recency = 0.5 ** (age_days / settings.nearby_recency_half_life_days)
+        weight = settings.nearby_recency_weight
+        return (1 - weight) * closeness + weight * recency
+    
+    def _increment_likes(self, recitation: Dict[str, Any], delta: int):
+        """Apply a like delta and publish the new count"""
+        tag_stats.add_likes(recitation, delta)
+        reciter_profiles.add_likes(recitation, delta)
+        
+        # Hot recitations spread increments over counter shards instead of
+        # serializing on the document; the rollup publishes their counts
+        if like_counter.is_sharded(recitation):
+            like_counter.increment(recitation, delta)
+            return
+        
+        doc = self.recitations_collection.find_one_and_update(
+            {"_id": recitation["_id"]},
+            {"$inc": {"likes_count": delta}, "$set": {"changed_at": datetime.utcnow()}},
+            projection={"likes_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if doc:
+            self._publish("update", doc["_id"], updated_fields={"likes_count": doc["likes_count"]})
+        if delta > 0:
+            like_counter.record_like(str(recitation["_id"]))
+    
+    def _tombstone(self, collection: str, recitation_id: str, user_ids: Sequence[Optional[str]] = (None,)):
+        """Record a removal for delta sync, once per user for likes; the TTL index drops them after the retention period"""
+        if not user_ids:
+            return
+        now = datetime.utcnow()
+        try:
+            self.tombstones_collection.insert_many([
+                {"collection": collection, "user_id": user_id, "recitation_id": recitation_id, "removed_at": now}
+                for user_id in user_ids
+            ])
+        except PyMongoError as e:
+            logger.error(f"Failed to record {collection} tombstone for {recitation_id}: {e}")
+    
+    def _publish(self, operation: str, document_id: Any, full_document: Optional[Dict[str, Any]] = None,
+                 updated_fields: Optional[Dict[str, Any]] = None, collection: str = "recitations"):
+        """Tell in-process subscribers about a write (the change stream does it when running)"""
+        change_events.publish_local(ChangeEvent(
+            collection=collection,
+            operation=operation,
+            document_id=document_id,
+            full_document=full_document,
+            updated_fields=updated_fields
+        ))
+    
+    def _find_page(self, query: Dict[str, Any], skip: int, limit: int,
+                   projection: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+        """Fetch one newest-first page of recitation documents"""
+        return list(
+            self.recitations_reads.find(query, projection).sort("created_at", -1).skip(skip).limit(limit)
+        )
+    
+    def _format_recitation(self, doc: Dict[str, Any], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Format recitation document for response, optionally only the given fields"""
+        if fields is not None:
+            formatted = {"id": str(doc["_id"])}
+            for field in fields:
+                if field == "likes_count":
+                    formatted[field] = doc.get("likes_count", 0)
+                elif field == "tags":
+                    formatted[field] = doc.get("tags", [])
+                elif field != "id":
+                    formatted[field] = doc.get(field)
+            return formatted
         return {
             "id": str(doc["_id"]),
             "title": doc["title"],
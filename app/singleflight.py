@@ -0,0 +1,43 @@
+from app.metrics import metrics
+from typing import Any, Callable, Dict, Hashable
+import asyncio
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one execution with a shared result.
+
+    The wrapped function is blocking (a pymongo query), so it runs in a worker
+    thread; that keeps the event loop free for the requests that join it.
+    Callers share the returned object and must not mutate it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.executed = 0
+        self.collapsed = 0
+        metrics.register(f"singleflight.{name}", self.stats)
+
+    async def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) unless an identical call for key is already in flight"""
+        task = self._inflight.get(key)
+        if task is None:
+            # The query runs in its own task so one caller disconnecting
+            # does not cancel it for everyone else waiting on it
+            task = asyncio.ensure_future(asyncio.to_thread(fn, *args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self.executed += 1
+        else:
+            self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        """Executed vs collapsed call counts"""
+        total = self.executed + self.collapsed
+        return {
+            "executed": self.executed,
+            "collapsed": self.collapsed,
+            "in_flight": len(self._inflight),
+            "collapse_ratio": round(self.collapsed / total, 4) if total else 0.0
+        }
@@ -0,0 +1,88 @@
+"""Continuation tokens for the delta sync endpoint.
+
+A sync round covers the changes in a fixed window (since, until]. Its
+pages walk four phases in order, each by (timestamp, _id):
+
+  removed       recitation tombstones (deleted, or moved out of approved)
+  recitations   approved recitations by changed_at (edits and like counts)
+  unliked       the user's like tombstones
+  liked         the user's likes by created_at
+
+Removals come before upserts, and unlikes before likes, so a recitation
+removed and approved again inside one window ends up present, and a
+like toggled off and on ends up liked. The last page of a round returns
+a token whose window starts where this one ended.
+"""
+
+from bson import ObjectId
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+import base64
+import json
+
+PHASES = ("removed", "recitations", "unliked", "liked")
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class SyncTokenError(ValueError):
+    """A continuation token that cannot be decoded"""
+
+
+class SyncTokenExpiredError(Exception):
+    """A token older than the tombstone retention; the client has to sync from scratch"""
+
+
+def _to_ms(value: datetime) -> int:
+    return (value - _EPOCH) // timedelta(milliseconds=1)
+
+
+def _from_ms(value: int) -> datetime:
+    return _EPOCH + timedelta(milliseconds=value)
+
+
+def truncate_ms(value: datetime) -> datetime:
+    """Drop sub-millisecond precision, which BSON dates do not keep"""
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+class SyncToken:
+    """Where a client is in its sync: the window, the phase and the last row returned"""
+
+    def __init__(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 phase: int = 0, after: Optional[Tuple[datetime, ObjectId]] = None):
+        self.since = since  # None for the first sync
+        self.until = until  # fixed when the round starts
+        self.phase = phase
+        self.after = after
+
+    def encode(self) -> str:
+        payload = {
+            "s": _to_ms(self.since) if self.since else None,
+            "u": _to_ms(self.until) if self.until else None,
+            "p": self.phase,
+            "a": [_to_ms(self.after[0]), str(self.after[1])] if self.after else None
+        }
+        raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "SyncToken":
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            after = payload.get("a")
+            phase = int(payload.get("p", 0))
+            if not 0 <= phase <= len(PHASES):
+                raise ValueError(f"phase {phase}")
+            return cls(
+                since=_from_ms(payload["s"]) if payload.get("s") is not None else None,
+                until=_from_ms(payload["u"]) if payload.get("u") is not None else None,
+                phase=phase,
+                after=(_from_ms(after[0]), ObjectId(after[1])) if after else None
+            )
+        except Exception as e:
+            raise SyncTokenError(f"Invalid sync token: {e}")
+
+    def next_round(self) -> "SyncToken":
+        """The token for changes after this round's window"""
+        return SyncToken(since=self.until)
@@ -0,0 +1,272 @@
+from pymongo import ASCENDING, DESCENDING, DeleteOne, ReplaceOne, UpdateOne
+from pymongo.errors import PyMongoError
+from app.config import settings
+from app.database import db_manager
+from app.metrics import metrics
+from app.models import RecitationStatus
+from collections import Counter
+from datetime import datetime
+from itertools import permutations
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+SORTS = {
+    "recitations": [("recitations", DESCENDING), ("_id", ASCENDING)],
+    "likes": [("likes", DESCENDING), ("_id", ASCENDING)],
+    "name": [("_id", ASCENDING)]
+}
+
+
+def tag_contribution(doc: Optional[Dict[str, Any]]) -> Tuple[List[str], int]:
+    """The tags a recitation counts towards and the likes it adds to each.
+
+    Only approved recitations are counted. Repeated tags count once, and
+    only the first tag_cooccurrence_max_tags of them form related pairs.
+    """
+    if not doc or doc.get("status") != RecitationStatus.APPROVED.value:
+        return [], 0
+    tags = list(dict.fromkeys(tag for tag in doc.get("tags") or [] if tag))
+    return tags, doc.get("likes_count", 0)
+
+
+def tag_pairs(tags: List[str]):
+    """Ordered (tag, related) pairs, both directions, for the co-occurrence table"""
+    return permutations(tags[:settings.tag_cooccurrence_max_tags], 2)
+
+
+class TagStats:
+    """Per-tag recitation and like counters plus a tag co-occurrence table.
+
+    tag_stats holds one document per tag ({_id: tag, recitations, likes})
+    and tag_cooccurrence one per ordered pair ({tag, related, count}), so
+    tag browsing never reads the recitations collection. RecitationService
+    applies the difference between a recitation's old and new state on every
+    write; a periodic reconcile recomputes both tables from the catalog and
+    fixes any drift left by failed or racing updates.
+    """
+
+    def __init__(self):
+        self.db = db_manager.get_db()
+        self.recitations_collection = self.db.recitations
+        self.stats_collection = self.db.tag_stats
+        self.cooccurrence_collection = self.db.tag_cooccurrence
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.updates = 0
+        self.failures = 0
+        self.reconciles = 0
+        self.last_drift: Dict[str, int] = {}
+        metrics.register("tag_stats", self.stats)
+
+    def apply(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        """Apply the change between two states of a recitation (None for created or deleted)"""
+        if not settings.tag_stats_enabled:
+            return
+        old_tags, old_likes = tag_contribution(before)
+        new_tags, new_likes = tag_contribution(after)
+
+        counts = Counter()
+        likes = Counter()
+        for tag in old_tags:
+            counts[tag] -= 1
+            likes[tag] -= old_likes
+        for tag in new_tags:
+            counts[tag] += 1
+            likes[tag] += new_likes
+
+        pairs = Counter()
+        for pair in tag_pairs(old_tags):
+            pairs[pair] -= 1
+        for pair in tag_pairs(new_tags):
+            pairs[pair] += 1
+
+        self._write(counts, likes, pairs)
+
+    def add_likes(self, recitation: Dict[str, Any], delta: int):
+        """Add a like delta to every tag of a recitation"""
+        if not settings.tag_stats_enabled:
+            return
+        tags, _ = tag_contribution(recitation)
+        self._write(Counter(), Counter({tag: delta for tag in tags}), Counter())
+
+    def _write(self, counts: Counter, likes: Counter, pairs: Counter):
+        tags = set(counts) | set(likes)
+        tag_updates = [
+            UpdateOne(
+                {"_id": tag},
+                {"$inc": {"recitations": counts[tag], "likes": likes[tag]}, "$set": {"updated_at": datetime.utcnow()}},
+                upsert=True
+            )
+            for tag in tags if counts[tag] or likes[tag]
+        ]
+        pair_updates = [
+            UpdateOne({"tag": tag, "related": related}, {"$inc": {"count": count}}, upsert=True)
+            for (tag, related), count in pairs.items() if count
+        ]
+        if not tag_updates and not pair_updates:
+            return
+
+        # Counters are best effort here; a failed update is corrected by the next reconcile
+        try:
+            if tag_updates:
+                self.stats_collection.bulk_write(tag_updates, ordered=False)
+                removed = [tag for tag in tags if counts[tag] < 0]
+                if removed:
+                    self.stats_collection.delete_many({"_id": {"$in": removed}, "recitations": {"$lte": 0}})
+            if pair_updates:
+                self.cooccurrence_collection.bulk_write(pair_updates, ordered=False)
+                if any(count < 0 for count in pairs.values()):
+                    self.cooccurrence_collection.delete_many({
+                        "tag": {"$in": list({tag for tag, _ in pairs})},
+                        "count": {"$lte": 0}
+                    })
+            self.updates += 1
+        except PyMongoError as e:
+            self.failures += 1
+            logger.error(f"Failed to update tag statistics: {e}")
+
+    def list_tags(self, sort: str = "recitations", prefix: Optional[str] = None,
+                  page: int = 1, limit: int = 50) -> List[Dict[str, Any]]:
+        """One page of tags with their recitation and like counts"""
+        query = {"recitations": {"$gt": 0}}
+        if prefix:
+            query["_id"] = {"$regex": f"^{re.escape(prefix)}"}
+        cursor = (
+            db_manager.read_collection("tag_stats")
+            .find(query, {"recitations": 1, "likes": 1})
+            .sort(SORTS[sort])
+            .skip((page - 1) * limit)
+            .limit(limit)
+        )
+        return [
+            {"tag": doc["_id"], "recitations": doc["recitations"], "likes": doc.get("likes", 0)}
+            for doc in cursor
+        ]
+
+    def get_tag(self, tag: str) -> Optional[Dict[str, Any]]:
+        doc = db_manager.read_collection("tag_stats").find_one({"_id": tag, "recitations": {"$gt": 0}})
+        if not doc:
+            return None
+        return {"tag": doc["_id"], "recitations": doc["recitations"], "likes": doc.get("likes", 0)}
+
+    def related(self, tag: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Tags most often used together with a tag, with the number of shared recitations"""
+        cursor = (
+            db_manager.read_collection("tag_cooccurrence")
+            .find({"tag": tag, "count": {"$gt": 0}}, {"related": 1, "count": 1, "_id": 0})
+            .sort([("count", DESCENDING), ("related", ASCENDING)])
+            .limit(limit)
+        )
+        return [{"tag": doc["related"], "count": doc["count"]} for doc in cursor]
+
+    def compute(self) -> Tuple[Dict[str, Dict[str, int]], Dict[Tuple[str, str], int]]:
+        """Recompute both tables from the approved recitations"""
+        tags: Dict[str, Dict[str, int]] = {}
+        pairs = Counter()
+        cursor = self.recitations_collection.find(
+            {"status": RecitationStatus.APPROVED.value},
+            {"status": 1, "tags": 1, "likes_count": 1}
+        )
+        for doc in cursor:
+            doc_tags, likes = tag_contribution(doc)
+            for tag in doc_tags:
+                entry = tags.setdefault(tag, {"recitations": 0, "likes": 0})
+                entry["recitations"] += 1
+                entry["likes"] += likes
+            pairs.update(tag_pairs(doc_tags))
+        return tags, dict(pairs)
+
+    def reconcile(self, dry_run: bool = False) -> Dict[str, int]:
+        """Rewrite every tag and pair whose stored counts differ from the catalog.
+
+        Writes landing between the catalog scan and the rewrite can leave a
+        small error behind, which the following reconcile picks up.
+        """
+        tags, pairs = self.compute()
+
+        stored_tags = {
+            doc["_id"]: doc for doc in self.stats_collection.find({}, {"recitations": 1, "likes": 1})
+        }
+        tag_fixes = [
+            ReplaceOne({"_id": tag}, dict(entry, updated_at=datetime.utcnow()), upsert=True)
+            for tag, entry in tags.items()
+            if (stored_tags.get(tag, {}).get("recitations"), stored_tags.get(tag, {}).get("likes"))
+            != (entry["recitations"], entry["likes"])
+        ]
+        stale_tags = [tag for tag in stored_tags if tag not in tags]
+
+        stored_pairs = {
+            (doc["tag"], doc["related"]): doc.get("count")
+            for doc in self.cooccurrence_collection.find({}, {"tag": 1, "related": 1, "count": 1})
+        }
+        pair_fixes = [
+            UpdateOne({"tag": tag, "related": related}, {"$set": {"count": count}}, upsert=True)
+            for (tag, related), count in pairs.items() if stored_pairs.get((tag, related)) != count
+        ]
+        stale_pairs = [pair for pair in stored_pairs if pair not in pairs]
+
+        if not dry_run:
+            if tag_fixes:
+                self.stats_collection.bulk_write(tag_fixes, ordered=False)
+            if stale_tags:
+                self.stats_collection.delete_many({"_id": {"$in": stale_tags}})
+            pair_writes = pair_fixes + [
+                DeleteOne({"tag": tag, "related": related}) for tag, related in stale_pairs
+            ]
+            if pair_writes:
+                self.cooccurrence_collection.bulk_write(pair_writes, ordered=False)
+
+        drift = {
+            "tags": len(tags),
+            "pairs": len(pairs),
+            "tags_fixed": len(tag_fixes),
+            "tags_removed": len(stale_tags),
+            "pairs_fixed": len(pair_fixes),
+            "pairs_removed": len(stale_pairs)
+        }
+        if not dry_run:
+            self.reconciles += 1
+            self.last_drift = drift
+        return drift
+
+    def start(self):
+        """Start the periodic reconcile in a daemon thread"""
+        if not settings.tag_stats_enabled or settings.tag_stats_reconcile_interval_seconds <= 0 or self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="tag-stats-reconcile", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(settings.tag_stats_reconcile_interval_seconds):
+            try:
+                drift = self.reconcile()
+                if drift["tags_fixed"] or drift["tags_removed"] or drift["pairs_fixed"] or drift["pairs_removed"]:
+                    logger.info(f"Tag statistics reconciled: {drift}")
+            except PyMongoError as e:
+                logger.error(f"Tag statistics reconcile failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Incremental update and reconcile counters"""
+        return {
+            "enabled": settings.tag_stats_enabled,
+            "updates": self.updates,
+            "failures": self.failures,
+            "reconciles": self.reconciles,
+            "last_drift": self.last_drift
+        }
+
+
+# Global tag statistics instance
+tag_stats = TagStats()
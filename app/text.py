@@ -0,0 +1,13 @@
+import re
+import unicodedata
+
+_SEPARATORS = re.compile(r"[\s\-_'`’.,/()]+")
+
+
+def normalize_name(value: str) -> str:
+    """Fold a name for matching: no diacritics or case, single spaces between words"""
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    # Arabic tatweel only stretches letters
+    stripped = stripped.replace("ـ", "")
+    return _SEPARATORS.sub(" ", stripped.casefold()).strip()
@@ -0,0 +1,176 @@
+from fastapi import Request
+from pymongo import monitoring
+from starlette.middleware.base import BaseHTTPMiddleware
+from app.config import settings
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+import json
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger("app.slow_requests")
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Command fields whose values say nothing about user data and help read a plan
+_SAFE_FIELDS = {"limit", "skip", "batchSize", "sort", "projection", "ordered", "upsert", "multi", "$db"}
+# Session and cluster bookkeeping that only adds noise
+_DROPPED_FIELDS = {"lsid", "$clusterTime", "txnNumber", "$readPreference", "signature", "apiVersion"}
+
+
+class RequestTrace:
+    """Timing for one request, broken down by dependency"""
+
+    def __init__(self, request_id: str, method: str, path: str):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.dependencies: Dict[str, Dict[str, float]] = {}
+        self.commands: List[Dict[str, Any]] = []
+        self._pending_commands: Dict[int, Any] = {}
+        # Dependency calls can run in worker threads (single-flight, threadpool)
+        self._lock = threading.Lock()
+
+    def record(self, dependency: str, seconds: float):
+        """Add one call to a dependency"""
+        with self._lock:
+            stats = self.dependencies.setdefault(dependency, {"calls": 0, "ms": 0.0})
+            stats["calls"] += 1
+            stats["ms"] += seconds * 1000
+
+    def command_started(self, operation_id: int, command: Any):
+        with self._lock:
+            self._pending_commands[operation_id] = command
+
+    def command_finished(self, operation_id: int, name: str, seconds: float, failed: bool = False):
+        self.record("mongo", seconds)
+        with self._lock:
+            command = self._pending_commands.pop(operation_id, None)
+            # Keep a reference only; redaction happens if the request turns out slow
+            if len(self.commands) < settings.slow_request_max_commands:
+                self.commands.append({"name": name, "ms": seconds * 1000, "failed": failed, "command": command})
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def to_record(self, status_code: int, total_ms: float) -> Dict[str, Any]:
+        """Build the structured slow-request record"""
+        dependencies = {
+            name: {"calls": stats["calls"], "ms": round(stats["ms"], 2)}
+            for name, stats in self.dependencies.items()
+        }
+        dependency_ms = sum(stats["ms"] for stats in self.dependencies.values())
+        return {
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "status": status_code,
+            "total_ms": round(total_ms, 2),
+            "dependencies": dependencies,
+            "app_ms": round(max(total_ms - dependency_ms, 0.0), 2),
+            "mongo_commands": [
+                {
+                    "name": command["name"],
+                    "ms": round(command["ms"], 2),
+                    "failed": command["failed"],
+                    "command": redact(command["command"]),
+                }
+                for command in self.commands
+            ],
+        }
+
+
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    """The ID of the request being handled, if any"""
+    trace = current_trace.get()
+    return trace.request_id if trace else None
+
+
+def redact(value: Any, top_level: bool = True) -> Any:
+    """Replace values in a command document with '?' while keeping its shape"""
+    if isinstance(value, dict) or hasattr(value, "items"):
+        redacted = {}
+        for index, (key, item) in enumerate(value.items()):
+            if key in _DROPPED_FIELDS:
+                continue
+            if key in _SAFE_FIELDS or (top_level and index == 0):
+                # The first top-level field is the command name and its collection
+                redacted[key] = item
+            else:
+                redacted[key] = redact(item, top_level=False)
+        return redacted
+    if isinstance(value, (list, tuple)):
+        # One element shows the shape; the rest would only repeat it
+        return [redact(value[0], top_level=False), f"... {len(value)} items"] if len(value) > 1 \
+            else [redact(item, top_level=False) for item in value]
+    if value is None:
+        return None
+    return "?"
+
+
+@contextmanager
+def trace_span(dependency: str):
+    """Time a block as a call to a dependency of the current request"""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.record(dependency, time.perf_counter() - started)
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """Attributes Mongo commands to the request that issued them"""
+
+    def started(self, event):
+        trace = current_trace.get()
+        if trace is not None:
+            trace.command_started(event.request_id, event.command)
+
+    def succeeded(self, event):
+        trace = current_trace.get()
+        if trace is not None:
+            trace.command_finished(event.request_id, event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        trace = current_trace.get()
+        if trace is not None:
+            trace.command_finished(event.request_id, event.command_name, event.duration_micros / 1e6, failed=True)
+
+
+class TracingMiddleware(BaseHTTPMiddleware):
+    """Assigns a request ID and logs a dependency breakdown for slow requests"""
+
+    async def dispatch(self, request: Request, call_next):
+        request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        trace = RequestTrace(request_id, request.method, request.url.path)
+        token = current_trace.set(trace)
+        status_code = 500
+        streaming = False
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            # Event streams stay open by design; their timing says nothing about latency
+            streaming = response.headers.get("content-type", "").startswith("text/event-stream")
+            response.headers[REQUEST_ID_HEADER] = request_id
+            return response
+        finally:
+            current_trace.reset(token)
+            total_ms = trace.elapsed_ms()
+            if not streaming and total_ms >= settings.slow_request_threshold_ms:
+                slow_logger.warning(json.dumps(trace.to_record(status_code, total_ms), default=str))
+
+
+# Global Mongo command tracer instance
+mongo_tracer = MongoCommandTracer()
@@ -4,13 +4,24 @@ from app.routes import router
 from app.config import settings
 from app.database import db_manager
 from app.s3_audio import router as s3_audio_router
+from app.rate_limit import RateLimitMiddleware
+from app.compression import CompressionMiddleware
+from app.resilience import CircuitBreakerMiddleware
+from app.tracing import TracingMiddleware
+from app.profiling import ProfilingMiddleware, router as profiling_router
+from app.change_streams import change_stream_consumer
+from app.like_counters import like_counter
+from app.fingerprint import fingerprint_indexer
+from app.autocomplete import autocomplete_index
+from app.catalog_snapshot import catalog_snapshot
+from app.play_counters import play_counter
+from app.live_updates import live_likes
+from app.tag_stats import tag_stats
+from app.logging_config import configure_logging
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging (JSON lines written from a background thread by default)
+configure_logging()
 
 # Create FastAPI app
 app = FastAPI(
@@ -21,6 +32,17 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Add response compression for bodies above the minimum size
+if settings.compression_enabled:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_minimum_size)
+
+# Fail fast while Mongo's circuit breaker is open, and bound each request's Mongo time
+app.add_middleware(CircuitBreakerMiddleware)
+
+# Add rate limiting middleware (CORS is added after it so 429/503 responses carry CORS headers)
+if settings.rate_limit_enabled:
+    app.add_middleware(RateLimitMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -30,15 +52,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Add profiling middleware only when debug endpoints are enabled, so it costs nothing otherwise
+if settings.debug_endpoints_enabled:
+    app.add_middleware(ProfilingMiddleware)
+
+# Add request tracing middleware outermost so its timings cover the whole request
+if settings.tracing_enabled:
+    app.add_middleware(TracingMiddleware)
+
 # Include routes
 app.include_router(router, prefix="/api/v1")
 app.include_router(s3_audio_router)
+if settings.debug_endpoints_enabled:
+    app.include_router(profiling_router, prefix="/api/v1")
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize database connection on startup"""
     try:
         db_manager.connect()
+        if settings.change_streams_enabled:
+            change_stream_consumer.start()
+        like_counter.start()
+        play_counter.start()
+        fingerprint_indexer.start()
+        autocomplete_index.start()
+        catalog_snapshot.start()
+        live_likes.start()
+        tag_stats.start()
         logging.info("Application started successfully")
     except Exception as e:
         logging.error(f"Failed to start application: {e}")
@@ -48,6 +89,13 @@ async def startup_event():
 async def shutdown_event():
     """Close database connection on shutdown"""
     try:
+        await live_likes.stop()
+        change_stream_consumer.stop()
+        like_counter.stop()
+        play_counter.stop()
+        fingerprint_indexer.stop()
+        catalog_snapshot.stop()
+        tag_stats.stop()
         db_manager.disconnect()
         logging.info("Application shutdown successfully")
     except Exception as e:
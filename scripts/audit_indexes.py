@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Index audit for Quran Platform
+Seeds a scratch database, creates the indexes from setup_database.py and runs
+every query shape issued by the app through explain("executionStats").
+
+Flags per shape:
+  COLLSCAN  the winning plan scans the whole collection
+  SORT      the winning plan sorts in memory instead of walking an index
+  RATIO     documents examined / returned exceeds --max-ratio
+
+Indexes that no winning plan uses, or whose keys are a prefix of another
+index, are reported as unused or redundant ($indexStats access counts are
+included for reference).
+
+With --check the script exits non-zero when a shape has a flag it is not
+explicitly allowed to have, so it can run in CI as a regression test:
+
+    python scripts/audit_indexes.py --check
+
+Feed, search and recommendation filters are built with the RecitationService
+helpers the routes use, so they follow the service when it changes. New query
+shapes in app/ should be added to QUERY_SHAPES below, commented with the
+method they come from.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import db_manager
+from app.fractional_index import keys_between
+from app.services import recitation_service
+from scripts.setup_database import create_indexes
+from bson import ObjectId
+from datetime import datetime, timedelta
+import argparse
+import json
+import logging
+import random
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+AUDIT_DB = "quranApp_index_audit"
+
+APPROVED = "approved"
+SAMPLE_USER = "user_1"
+SAMPLE_IDS = [ObjectId() for _ in range(20)]
+SAMPLE_PLAYLIST = ObjectId()
+
+FEED = recitation_service._feed_query(None, False)
+MY_FEED = recitation_service._feed_query(SAMPLE_USER, True)
+SIMILAR = recitation_service._recommendation_query(
+    [str(i) for i in SAMPLE_IDS], {"Mishary Alafasy"}, {"Al-Mulk"}, {"tajweed"}
+)
+
+
+class QueryShape:
+    """One query the app issues, with the flags it is allowed to raise"""
+
+    def __init__(self, name, collection, filter, sort=None, limit=0, skip=0, projection=None, allow=()):
+        self.name = name
+        self.collection = collection
+        self.filter = filter
+        self.sort = sort
+        self.limit = limit
+        self.skip = skip
+        self.projection = projection
+        self.allow = set(allow)
+
+    def command(self):
+        command = {"find": self.collection, "filter": self.filter}
+        if self.sort:
+            command["sort"] = dict(self.sort)
+        if self.limit:
+            command["limit"] = self.limit
+        if self.skip:
+            command["skip"] = self.skip
+        if self.projection:
+            command["projection"] = self.projection
+        return command
+
+
+QUERY_SHAPES = [
+    # RecitationService.get_recitations (_find_page)
+    QueryShape("feed_page", "recitations", FEED,
+               sort=[("created_at", -1)], limit=20),
+    QueryShape("feed_page_deep", "recitations", FEED,
+               sort=[("created_at", -1)], skip=2000, limit=20,
+               # skip-based pagination walks every skipped key
+               allow={"RATIO"}),
+    # RecitationService.get_recitations_etag
+    QueryShape("feed_validator", "recitations", FEED,
+               sort=[("created_at", -1)], limit=20,
+               projection={"updated_at": 1, "likes_count": 1, "like_shards": 1}),
+    QueryShape("my_recitations", "recitations", MY_FEED,
+               sort=[("created_at", -1)], limit=20),
+    # RecitationService.get_recitation_by_id
+    QueryShape("recitation_by_id", "recitations", {"_id": SAMPLE_IDS[0]}),
+    # RecitationService.get_recitations_by_status
+    QueryShape("pending_by_status", "recitations", {"status": "pending"},
+               sort=[("created_at", -1)], limit=20),
+    # RecitationService.search_recitations (_search_query, _find_page); unanchored
+    # case-insensitive regexes cannot use an index bound
+    QueryShape("search_reciter_regex", "recitations",
+               recitation_service._search_query({"reciter_name": "sudais"}),
+               sort=[("created_at", -1)], limit=20, allow={"RATIO"}),
+    QueryShape("search_location_regex", "recitations",
+               recitation_service._search_query({"masjid_location": "city 1"}),
+               sort=[("created_at", -1)], limit=20, allow={"RATIO"}),
+    QueryShape("search_surah_regex", "recitations",
+               recitation_service._search_query({"surah_name": "kahf"}),
+               sort=[("created_at", -1)], limit=20, allow={"RATIO"}),
+    QueryShape("search_tags", "recitations", recitation_service._search_query({"tags": ["tajweed"]}),
+               sort=[("created_at", -1)], limit=20),
+    # RecitationService.get_recommendations (_most_engaged) for users without likes
+    QueryShape("recommendations_popular", "recitations", FEED,
+               sort=[("likes_count", -1)], limit=50),
+    QueryShape("recommendations_popular_plays", "recitations", FEED,
+               sort=[("plays_count", -1)], limit=50),
+    # RecitationService.get_recommendations (_recommendation_query, _most_engaged);
+    # the $or branches are merged and ranked by likes in memory
+    QueryShape("recommendations_similar", "recitations", SIMILAR,
+               sort=[("likes_count", -1)], limit=50, allow={"SORT", "RATIO"}),
+    QueryShape("recommendations_similar_plays", "recitations", SIMILAR,
+               sort=[("plays_count", -1)], limit=50, allow={"SORT", "RATIO"}),
+    # $geoNear in RecitationService.get_nearby_recitations; $nearSphere is the same index scan as a find
+    QueryShape("nearby_recitations", "recitations",
+               {"masjid_geo": {"$nearSphere": {"$geometry": {"type": "Point", "coordinates": [39.6, 24.47]},
+                                               "$maxDistance": 25000}},
+                "status": APPROVED},
+               limit=500),
+    # RecitationService.get_recommendations (liked recitations)
+    QueryShape("liked_recitations", "recitations", {"_id": {"$in": SAMPLE_IDS}}),
+    # RecitationService.create_recitations_bulk (already imported)
+    QueryShape("imported_recitations", "recitations", {"import_key": {"$in": ["imports/user_1/0a1b2c3d4e5f6a7b.mp3"]}},
+               projection={"import_key": 1}),
+    # RecitationService.get_recitations_by_ids
+    QueryShape("recitations_batch", "recitations", {"_id": {"$in": SAMPLE_IDS + [ObjectId() for _ in range(280)]}}),
+    # app/export.py iter_documents
+    QueryShape("export_recitations", "recitations",
+               {"updated_at": {"$gt": datetime(2024, 6, 1), "$lte": datetime(2024, 6, 8)}},
+               sort=[("updated_at", 1), ("_id", 1)]),
+    QueryShape("export_recitations_resume", "recitations",
+               {"updated_at": {"$gte": datetime(2024, 6, 1), "$lte": datetime(2024, 6, 8)},
+                "$or": [{"updated_at": {"$gt": datetime(2024, 6, 1)}}, {"_id": {"$gt": SAMPLE_IDS[0]}}]},
+               sort=[("updated_at", 1), ("_id", 1)]),
+    # RecitationService.get_recitation_by_id and like_recitation
+    QueryShape("like_lookup", "likes", {"user_id": SAMPLE_USER, "recitation_id": str(SAMPLE_IDS[0])}),
+    # RecitationService._liked_ids
+    QueryShape("liked_ids_in_page", "likes",
+               {"user_id": SAMPLE_USER, "recitation_id": {"$in": [str(i) for i in SAMPLE_IDS]}},
+               projection={"recitation_id": 1, "_id": 0}),
+    # RecitationService.get_recommendations
+    QueryShape("user_likes", "likes", {"user_id": SAMPLE_USER}),
+    # RecitationService.delete_recitation
+    QueryShape("likes_by_recitation", "likes", {"recitation_id": str(SAMPLE_IDS[0])}),
+    # app/export.py iter_documents
+    QueryShape("export_likes", "likes", {"created_at": {"$gt": datetime(2024, 6, 1), "$lte": datetime(2024, 6, 8)}},
+               sort=[("created_at", 1), ("_id", 1)]),
+    # ShardedLikeCounter.pending and pending_many (app/like_counters.py)
+    QueryShape("like_shards_by_recitation", "like_counter_shards", {"recitation_id": str(SAMPLE_IDS[0])}),
+    QueryShape("like_shards_for_batch", "like_counter_shards",
+               {"recitation_id": {"$in": [str(i) for i in SAMPLE_IDS]}},
+               projection={"recitation_id": 1, "count": 1}),
+    # FingerprintIndexer.find_duplicates, the $match of the coarse pass (app/fingerprint.py)
+    QueryShape("fingerprint_candidates", "audio_fingerprints",
+               {"hashes": {"$in": list(range(0, 8000, 4))}, "_id": {"$ne": str(SAMPLE_IDS[0])}},
+               projection={"hashes": 1}),
+    # ShardedLikeCounter.rollup and reconcile
+    QueryShape("like_shards_nonzero", "like_counter_shards", {"count": {"$ne": 0}}),
+    QueryShape("sharded_recitations", "recitations", {"like_shards": {"$exists": True}},
+               projection={"likes_count": 1}),
+    QueryShape("likes_for_reconcile", "likes", {"recitation_id": {"$in": [str(i) for i in SAMPLE_IDS]}},
+               projection={"recitation_id": 1, "_id": 0}),
+    # ReciterProfiles (app/reciter_profiles.py)
+    QueryShape("reciter_latest_uploads", "recitations", {"reciter_name": "Mishary Alafasy", "status": APPROVED},
+               sort=[("created_at", -1)], limit=10, projection={"title": 1, "surah_name": 1, "created_at": 1}),
+    QueryShape("reciter_profile", "reciters", {"_id": "Mishary Alafasy"}),
+    # TagStats (app/tag_stats.py)
+    QueryShape("tags_by_recitations", "tag_stats", {"recitations": {"$gt": 0}},
+               sort=[("recitations", -1), ("_id", 1)], limit=50),
+    QueryShape("tags_by_likes", "tag_stats", {"recitations": {"$gt": 0}},
+               sort=[("likes", -1), ("_id", 1)], limit=50),
+    QueryShape("tags_by_prefix", "tag_stats", {"recitations": {"$gt": 0}, "_id": {"$regex": "^ta"}},
+               sort=[("_id", 1)], limit=50),
+    QueryShape("tag_lookup", "tag_stats", {"_id": "tajweed", "recitations": {"$gt": 0}}),
+    QueryShape("related_tags", "tag_cooccurrence", {"tag": "tajweed", "count": {"$gt": 0}},
+               sort=[("count", -1), ("related", 1)], limit=20,
+               projection={"related": 1, "count": 1, "_id": 0}),
+    # RecitationService._sync_phase
+    QueryShape("sync_recitations", "recitations",
+               {"status": APPROVED, "changed_at": {"$gt": datetime(2024, 6, 1), "$lte": datetime(2024, 6, 8)}},
+               sort=[("changed_at", 1), ("_id", 1)], limit=200),
+    QueryShape("sync_recitations_resume", "recitations",
+               {"status": APPROVED, "changed_at": {"$gte": datetime(2024, 6, 1), "$lte": datetime(2024, 6, 8)},
+                "$or": [{"changed_at": {"$gt": datetime(2024, 6, 1)}}, {"_id": {"$gt": SAMPLE_IDS[0]}}]},
+               sort=[("changed_at", 1), ("_id", 1)], limit=200),
+    QueryShape("sync_removed", "tombstones",
+               {"collection": "recitations", "user_id": None,
+                "removed_at": {"$gt": datetime(2024, 6, 1), "$lte": datetime(2024, 6, 8)}},
+               sort=[("removed_at", 1), ("_id", 1)], limit=200),
+    QueryShape("sync_unliked", "tombstones",
+               {"collection": "likes", "user_id": SAMPLE_USER,
+                "removed_at": {"$gt": datetime(2024, 1, 1), "$lte": datetime(2024, 6, 8)}},
+               sort=[("removed_at", 1), ("_id", 1)], limit=200),
+    QueryShape("sync_liked", "likes",
+               {"user_id": SAMPLE_USER, "created_at": {"$gt": datetime(2024, 1, 1), "$lte": datetime(2024, 6, 8)}},
+               sort=[("created_at", 1), ("_id", 1)], limit=200),
+    # PlaylistService (app/playlists.py)
+    QueryShape("user_playlists", "playlists", {"owner_id": SAMPLE_USER},
+               sort=[("updated_at", -1), ("_id", -1)], limit=20),
+    QueryShape("playlist_page", "playlist_items", {"playlist_id": SAMPLE_PLAYLIST, "position": {"$gt": "a0"}},
+               sort=[("position", 1)], limit=51),
+    QueryShape("playlist_previous_item", "playlist_items",
+               {"playlist_id": SAMPLE_PLAYLIST, "position": {"$lt": "b0V"}},
+               sort=[("position", -1)], limit=1, projection={"position": 1}),
+    QueryShape("playlist_prune", "playlist_items",
+               {"playlist_id": SAMPLE_PLAYLIST, "recitation_id": {"$in": [str(i) for i in SAMPLE_IDS[:3]]}}),
+]
+
+RECITERS = ["Mishary Alafasy", "Abdul Rahman Al-Sudais", "Saad Al-Ghamdi", "Maher Al-Muaiqly",
+            "Yasser Al-Dosari", "Abdul Basit", "Saud Al-Shuraim", "Ahmed Al-Ajmi"]
+SURAHS = ["Al-Fatiha", "Al-Baqarah", "Al-Kahf", "Ya-Sin", "Ar-Rahman", "Al-Mulk", "Al-Waqiah"]
+TAGS = ["tajweed", "taraweeh", "ramadan", "murattal", "mujawwad", "emotional", "fajr"]
+STATUSES = [APPROVED] * 8 + ["pending", "rejected"]
+
+
+def seed(db, recitations: int, users: int):
+    """Fill the scratch database with synthetic recitations, likes and counter shards"""
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    docs = []
+    for i in range(recitations):
+        created = start + timedelta(minutes=i * 7)
+        docs.append({
+            "_id": SAMPLE_IDS[i] if i < len(SAMPLE_IDS) else ObjectId(),
+            "title": f"Recitation {i}",
+            "reciter_name": rng.choice(RECITERS),
+            "masjid_name": f"Masjid {i % 50}",
+            "masjid_location": f"City {i % 30}",
+            "masjid_geo": {"type": "Point", "coordinates": [39.6 + (i % 50) * 0.02, 24.47 + (i % 30) * 0.02]},
+            "surah_name": rng.choice(SURAHS),
+            "surah_number": rng.randint(1, 114),
+            "description": "Synthetic recitation for the index audit",
+            "tags": rng.sample(TAGS, rng.randint(0, 3)),
+            "uploader_id": f"user_{i % users}",
+            "audio_url": f"https://example.invalid/{i}.mp3",
+            "status": rng.choice(STATUSES),
+            "likes_count": int(rng.paretovariate(1.5)) - 1,
+            "plays_count": int(rng.paretovariate(1.2) * 10) - 10,
+            "created_at": created,
+            "updated_at": created + timedelta(hours=rng.randint(0, 48)),
+        })
+        docs[-1]["changed_at"] = docs[-1]["updated_at"] + timedelta(hours=rng.randint(0, 48))
+    for doc in docs[:50]:
+        doc["like_shards"] = 16
+    db.recitations.insert_many(docs)
+
+    likes = {}
+    for _ in range(recitations * 3):
+        user_id = f"user_{rng.randrange(users)}"
+        recitation_id = str(rng.choice(docs)["_id"])
+        likes[(user_id, recitation_id)] = {
+            "user_id": user_id,
+            "recitation_id": recitation_id,
+            "created_at": start + timedelta(minutes=rng.randrange(recitations * 7)),
+        }
+    db.likes.insert_many(list(likes.values()))
+
+    db.like_counter_shards.insert_many([
+        {"_id": f"{doc['_id']}:{shard}", "recitation_id": str(doc["_id"]), "count": rng.randint(0, 2)}
+        for doc in docs[:50] for shard in range(16)
+    ])
+
+    tag_counts, pair_counts = {}, {}
+    for doc in docs:
+        if doc["status"] != APPROVED:
+            continue
+        for tag in doc["tags"]:
+            entry = tag_counts.setdefault(tag, {"_id": tag, "recitations": 0, "likes": 0})
+            entry["recitations"] += 1
+            entry["likes"] += doc["likes_count"]
+            for related in doc["tags"]:
+                if related != tag:
+                    pair_counts[(tag, related)] = pair_counts.get((tag, related), 0) + 1
+    db.reciters.insert_many([{"_id": reciter, "recitations": 1, "likes": 0} for reciter in RECITERS])
+    db.tag_stats.insert_many(list(tag_counts.values()))
+    db.tag_cooccurrence.insert_many([
+        {"tag": tag, "related": related, "count": count} for (tag, related), count in pair_counts.items()
+    ])
+
+    db.tombstones.insert_many([
+        {"collection": "recitations", "user_id": None, "recitation_id": str(ObjectId()),
+         "removed_at": start + timedelta(minutes=rng.randrange(recitations * 7))}
+        for _ in range(recitations // 20)
+    ] + [
+        {"collection": "likes", "user_id": f"user_{rng.randrange(users)}", "recitation_id": str(rng.choice(docs)["_id"]),
+         "removed_at": start + timedelta(minutes=rng.randrange(recitations * 7))}
+        for _ in range(recitations // 2)
+    ])
+
+    playlists = [SAMPLE_PLAYLIST] + [ObjectId() for _ in range(users // 2)]
+    db.playlists.insert_many([
+        {"_id": playlist_id, "owner_id": f"user_{i % users}", "name": f"Playlist {i}", "is_public": i % 3 == 0,
+         "item_count": 0, "created_at": start, "updated_at": start + timedelta(minutes=i)}
+        for i, playlist_id in enumerate(playlists)
+    ])
+    db.playlist_items.insert_many([
+        {"playlist_id": playlist_id, "recitation_id": str(rng.choice(docs)["_id"]), "position": position,
+         "added_at": start}
+        for playlist_id in playlists
+        for position in keys_between(None, None, 2000 if playlist_id == SAMPLE_PLAYLIST else 20)
+    ])
+
+    db.audio_fingerprints.insert_many([
+        {"_id": str(doc["_id"]), "hashes": sorted(rng.sample(range(1 << 21), 400))}
+        for doc in docs[:500]
+    ])
+
+
+def plan_nodes(node):
+    """Yield every stage dict in an explain plan, whatever the plan format"""
+    if isinstance(node, dict):
+        if "stage" in node:
+            yield node
+        for value in node.values():
+            yield from plan_nodes(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from plan_nodes(item)
+
+
+def audit_shape(db, shape: QueryShape, max_ratio: float) -> dict:
+    """Explain one shape and collect its flags"""
+    explain = db.command("explain", shape.command(), verbosity="executionStats")
+    nodes = list(plan_nodes(explain["queryPlanner"]["winningPlan"]))
+    stages = {node["stage"] for node in nodes}
+    indexes = sorted({node["indexName"] for node in nodes if "indexName" in node})
+    stats = explain["executionStats"]
+    returned = stats["nReturned"]
+    examined = stats["totalDocsExamined"]
+    ratio = examined / max(returned, 1)
+
+    flags = set()
+    if "COLLSCAN" in stages:
+        flags.add("COLLSCAN")
+    if "SORT" in stages:
+        flags.add("SORT")
+    if ratio > max_ratio:
+        flags.add("RATIO")
+
+    return {
+        "shape": shape.name,
+        "collection": shape.collection,
+        "indexes": indexes,
+        "returned": returned,
+        "docs_examined": examined,
+        "keys_examined": stats["totalKeysExamined"],
+        "ratio": round(ratio, 2),
+        "millis": stats["executionTimeMillis"],
+        "flags": sorted(flags),
+        "regressions": sorted(flags - shape.allow),
+    }
+
+
+def audit_indexes(db, used: dict) -> list:
+    """Report unused and redundant indexes per collection"""
+    findings = []
+    for collection in sorted({shape.collection for shape in QUERY_SHAPES}):
+        index_info = db[collection].index_information()
+        accesses = {
+            stat["name"]: stat["accesses"]["ops"]
+            for stat in db[collection].aggregate([{"$indexStats": {}}])
+        }
+        for name, info in index_info.items():
+            if name == "_id_":
+                continue
+            keys = info["key"]
+            # A plain index whose keys prefix another index is covered by it
+            redundant_with = [
+                other for other, other_info in index_info.items()
+                if other != name and len(other_info["key"]) > len(keys)
+                and other_info["key"][:len(keys)] == keys
+                and not info.get("unique") and "text" not in [direction for _, direction in keys]
+            ]
+            if name not in used.get(collection, set()) or redundant_with:
+                findings.append({
+                    "collection": collection,
+                    "index": name,
+                    "unused": name not in used.get(collection, set()),
+                    "redundant_with": redundant_with,
+                    "accesses": accesses.get(name, 0),
+                })
+    return findings
+
+
+def run_audit(recitations: int, users: int, max_ratio: float, keep: bool) -> dict:
+    """Seed, explain every query shape and audit the indexes"""
+    db_manager.connect()
+    db_manager.client.drop_database(AUDIT_DB)
+    db = db_manager.client[AUDIT_DB]
+    try:
+        create_indexes(db)
+        seed(db, recitations, users)
+
+        shapes = []
+        used = {}
+        for shape in QUERY_SHAPES:
+            # Run the query for real too, so $indexStats sees the access
+            list(db[shape.collection].find(shape.filter, shape.projection, sort=shape.sort,
+                                           skip=shape.skip, limit=shape.limit))
+            result = audit_shape(db, shape, max_ratio)
+            used.setdefault(shape.collection, set()).update(result["indexes"])
+            shapes.append(result)
+
+        return {"shapes": shapes, "indexes": audit_indexes(db, used)}
+    finally:
+        if not keep:
+            db_manager.client.drop_database(AUDIT_DB)
+        db_manager.disconnect()
+
+
+def print_report(report: dict):
+    """Print the per-shape table and the index findings"""
+    print(f"{'shape':<28} {'index':<34} {'ret':>5} {'docs':>6} {'ratio':>7}  flags")
+    for shape in report["shapes"]:
+        flags = ", ".join(
+            flag if flag in shape["regressions"] else f"{flag} (allowed)" for flag in shape["flags"]
+        )
+        print(
+            f"{shape['shape']:<28} {','.join(shape['indexes']) or '-':<34} {shape['returned']:>5} "
+            f"{shape['docs_examined']:>6} {shape['ratio']:>7}  {flags}"
+        )
+    print()
+    for finding in report["indexes"]:
+        reasons = []
+        if finding["unused"]:
+            reasons.append("unused by every query shape")
+        if finding["redundant_with"]:
+            reasons.append(f"prefix of {', '.join(finding['redundant_with'])}")
+        print(f"{finding['collection']}.{finding['index']}: {'; '.join(reasons)} "
+              f"({finding['accesses']} accesses)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit query shapes against the indexes")
+    parser.add_argument("--recitations", type=int, default=20000, help="Recitations to seed")
+    parser.add_argument("--users", type=int, default=2000, help="Distinct users to seed")
+    parser.add_argument("--max-ratio", type=float, default=10.0,
+                        help="Highest acceptable docs examined / returned ratio")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero on unallowed flags")
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded database")
+    args = parser.parse_args()
+
+    report = run_audit(args.recitations, args.users, args.max_ratio, args.keep)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    regressions = [shape for shape in report["shapes"] if shape["regressions"]]
+    if args.check and regressions:
+        for shape in regressions:
+            logger.error(f"Query shape {shape['shape']} regressed: {', '.join(shape['regressions'])}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Catalog snapshot benchmark for Quran Platform
+Builds the in-memory catalog snapshot from the configured database and runs
+the same feed, search and recommendation queries against the snapshot and
+against Mongo, reporting latency for both and any result differences.
+
+    python scripts/benchmark_catalog_snapshot.py --queries 500
+
+Read-only; the snapshot is built in this process whatever
+CATALOG_SNAPSHOT_ENABLED says.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.catalog_snapshot import catalog_snapshot
+from app.database import db_manager
+from app.models import RecitationStatus
+from app.services import recitation_service
+import argparse
+import logging
+import random
+import re
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+APPROVED = RecitationStatus.APPROVED.value
+
+
+def sample_queries(db, count: int, rng: random.Random) -> list:
+    """(kind, snapshot call, Mongo call) triples drawn from values in the catalog"""
+    recitations = db.recitations
+    reciters = recitations.distinct("reciter_name", {"status": APPROVED})
+    surahs = recitations.distinct("surah_name", {"status": APPROVED})
+    tags = recitations.distinct("tags", {"status": APPROVED})
+    uploaders = recitations.distinct("uploader_id", {"status": APPROVED})
+
+    def find(query, sort, skip, limit):
+        return lambda: list(recitations.find(query).sort(sort, -1).skip(skip).limit(limit))
+
+    queries = []
+    for _ in range(count):
+        kind = rng.choice(["feed", "feed_mine", "search_reciter", "search_tags", "recommend"])
+        skip = rng.choice([0, 0, 20, 200])
+        if kind == "feed":
+            queries.append((kind, lambda skip=skip: catalog_snapshot.feed(skip, 20),
+                            find({"status": APPROVED}, "created_at", skip, 20)))
+        elif kind == "feed_mine" and uploaders:
+            uploader = rng.choice(uploaders)
+            queries.append((kind, lambda uploader=uploader: catalog_snapshot.feed(0, 20, uploader),
+                            find({"status": APPROVED, "uploader_id": uploader}, "created_at", 0, 20)))
+        elif kind == "search_reciter" and reciters:
+            # A fragment of a name, as typed into the search box
+            name = rng.choice(reciters)
+            start = rng.randrange(max(1, len(name) - 3))
+            fragment = re.escape(name[start:start + 4].lower())
+            queries.append((kind, lambda fragment=fragment, skip=skip: catalog_snapshot.search({"reciter_name": fragment}, skip, 20),
+                            find({"status": APPROVED, "reciter_name": {"$regex": fragment, "$options": "i"}},
+                                 "created_at", skip, 20)))
+        elif kind == "search_tags" and tags:
+            chosen = rng.sample(tags, min(2, len(tags)))
+            queries.append((kind, lambda chosen=chosen, skip=skip: catalog_snapshot.search({"tags": chosen}, skip, 20),
+                            find({"status": APPROVED, "tags": {"$in": chosen}}, "created_at", skip, 20)))
+        elif kind == "recommend" and reciters and surahs:
+            reciter, surah = {rng.choice(reciters)}, {rng.choice(surahs)}
+            tag = set(rng.sample(tags, 1)) if tags else set()
+            query = {"status": APPROVED, "$or": [{"reciter_name": {"$in": list(reciter)}},
+                                                 {"surah_name": {"$in": list(surah)}},
+                                                 {"tags": {"$in": list(tag)}}]}
+            queries.append((kind, lambda reciter=reciter, surah=surah, tag=tag: catalog_snapshot.recommend([], reciter, surah, tag, 10),
+                            lambda query=query: recitation_service._most_engaged(query, None, 10)))
+    return queries
+
+
+def sort_keys(docs: list, kind: str) -> list:
+    # Ties may come back in either order, so compare the sort keys rather than the IDs
+    if kind == "recommend":
+        return [recitation_service._engagement(doc) for doc in docs]
+    return [doc.get("created_at") for doc in docs]
+
+
+def run_benchmark(queries: int, seed: int):
+    db = db_manager.get_db()
+    catalog_snapshot.build()
+    stats = catalog_snapshot.stats()
+    logger.info(f"Snapshot: {stats['recitations']} recitations built in {stats['last_build_ms']:.0f} ms")
+
+    timings = {}
+    mismatches = 0
+    for kind, snapshot_call, mongo_call in sample_queries(db, queries, random.Random(seed)):
+        started = time.perf_counter()
+        from_snapshot = snapshot_call()
+        snapshot_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        from_mongo = mongo_call()
+        mongo_ms = (time.perf_counter() - started) * 1000
+        timings.setdefault(kind, []).append((snapshot_ms, mongo_ms))
+
+        if sort_keys(from_snapshot, kind) != sort_keys(from_mongo, kind):
+            mismatches += 1
+            logger.warning(f"{kind}: snapshot and Mongo disagree")
+
+    print(f"{'query':<16} {'count':>6} {'snapshot p50':>13} {'snapshot p95':>13} {'mongo p50':>10} {'mongo p95':>10}")
+    for kind, pairs in sorted(timings.items()):
+        snapshot = sorted(pair[0] for pair in pairs)
+        mongo = sorted(pair[1] for pair in pairs)
+        p95 = min(int(len(pairs) * 0.95), len(pairs) - 1)
+        print(f"{kind:<16} {len(pairs):>6} {snapshot[len(pairs) // 2]:>11.3f}ms {snapshot[p95]:>11.3f}ms "
+              f"{mongo[len(pairs) // 2]:>8.3f}ms {mongo[p95]:>8.3f}ms")
+    print(f"mismatches: {mismatches}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare catalog snapshot queries with Mongo")
+    parser.add_argument("--queries", type=int, default=300, help="Queries to run")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the query mix")
+    args = parser.parse_args()
+
+    db_manager.connect()
+    try:
+        mismatches = run_benchmark(args.queries, args.seed)
+    finally:
+        db_manager.disconnect()
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Response size benchmark for Quran Platform
+Requests feed and search pages from a running API with and without a
+fields= selection, under each content encoding, and reports the bytes on
+the wire and the latency per page size.
+
+    python scripts/benchmark_fieldsets.py --base-url http://localhost:8000 --token <id token>
+    python scripts/benchmark_fieldsets.py --fields id,title,reciter_name,surah_name --runs 50
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+import argparse
+import logging
+import statistics
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ENCODINGS = ("identity", "gzip", "br")
+
+
+def fetch(url: str, encoding: str, token: str):
+    """One request; returns (bytes on the wire, seconds, content encoding used)"""
+    headers = {"Accept-Encoding": encoding}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    started = time.perf_counter()
+    with urlopen(Request(url, headers=headers)) as response:
+        # urllib does not decode content encodings, so this is the transferred size
+        body = response.read()
+        return len(body), time.perf_counter() - started, response.headers.get("Content-Encoding", "identity")
+
+
+def benchmark(base_url: str, path: str, page_sizes, fields: str, runs: int, token: str) -> list:
+    rows = []
+    for limit in page_sizes:
+        for selection in (None, fields):
+            params = {"limit": limit}
+            if selection:
+                params["fields"] = selection
+            url = f"{base_url}/api/v1/{path}?{urlencode(params)}"
+            for encoding in ENCODINGS:
+                fetch(url, encoding, token)  # warm up caches and connections
+                sizes, timings = [], []
+                used = encoding
+                for _ in range(runs):
+                    size, seconds, used = fetch(url, encoding, token)
+                    sizes.append(size)
+                    timings.append(seconds * 1000)
+                if used != encoding:
+                    # e.g. br asked for but the server has no brotli, or the body is below the minimum size
+                    encoding = f"{encoding}->{used}"
+                timings.sort()
+                rows.append({
+                    "path": path,
+                    "limit": limit,
+                    "fields": "sparse" if selection else "full",
+                    "encoding": encoding,
+                    "bytes": int(statistics.mean(sizes)),
+                    "mean_ms": statistics.mean(timings),
+                    "p95_ms": timings[min(int(len(timings) * 0.95), len(timings) - 1)],
+                })
+    return rows
+
+
+def print_report(rows: list):
+    print(f"{'path':<12} {'limit':>5} {'fields':<7} {'encoding':<16} {'bytes':>9} {'saved':>7} {'mean ms':>8} {'p95 ms':>8}")
+    baselines = {
+        (row["path"], row["limit"]): row["bytes"]
+        for row in rows if row["fields"] == "full" and row["encoding"] == "identity"
+    }
+    for row in rows:
+        baseline = baselines[(row["path"], row["limit"])]
+        saved = 1 - row["bytes"] / baseline if baseline else 0.0
+        print(
+            f"{row['path']:<12} {row['limit']:>5} {row['fields']:<7} {row['encoding']:<16} "
+            f"{row['bytes']:>9} {saved:>7.1%} {row['mean_ms']:>8.2f} {row['p95_ms']:>8.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure bytes and latency saved by fields= and compression")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--token", default="", help="Bearer token, if the deployment requires one")
+    parser.add_argument("--fields", default="id,title,reciter_name,surah_name", help="Sparse field selection")
+    parser.add_argument("--page-sizes", default="10,20,50,100", help="Comma-separated page sizes")
+    parser.add_argument("--runs", type=int, default=20, help="Requests per combination")
+    args = parser.parse_args()
+
+    page_sizes = [int(size) for size in args.page_sizes.split(",")]
+    rows = []
+    for path in ("recitations", "search"):
+        rows.extend(benchmark(args.base_url.rstrip("/"), path, page_sizes, args.fields, args.runs, args.token))
+    print_report(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Fingerprint benchmark for Quran Platform
+Indexes a synthetic catalog into a scratch database and measures hashing
+throughput, indexing throughput, duplicate query latency and match quality
+(trimmed, quieter and noisy copies vs unrelated recordings).
+
+    python scripts/benchmark_fingerprints.py --recordings 5000 --seconds 120 --queries 200
+
+Synthetic audio is used so no ffmpeg or S3 access is needed; decoding cost
+is not included.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.database import db_manager
+from app.fingerprint import SAMPLE_RATE, fingerprint_indexer, fingerprint_samples
+from bson import ObjectId
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import logging
+import multiprocessing
+import statistics
+import time
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BENCH_DB = "quranApp_fingerprint_bench"
+NOTE_SECONDS = 0.15
+
+
+def synthesize(seed: int, seconds: float) -> np.ndarray:
+    """A recording-like signal: a few random tones that change every NOTE_SECONDS"""
+    rng = np.random.default_rng(seed)
+    note = int(NOTE_SECONDS * SAMPLE_RATE)
+    notes = int(seconds / NOTE_SECONDS)
+    t = np.arange(note) / SAMPLE_RATE
+    freqs = rng.uniform(100, 3500, (notes, 3, 1))
+    amplitudes = rng.uniform(0.1, 0.4, (notes, 3, 1))
+    return (amplitudes * np.sin(2 * np.pi * freqs * t)).sum(axis=1).ravel().astype(np.float32)
+
+
+def distort(samples: np.ndarray, seed: int) -> np.ndarray:
+    """A trimmed, quieter and noisy copy, as a re-encoded re-upload would be"""
+    rng = np.random.default_rng(seed)
+    start = int(rng.uniform(0, 0.2) * len(samples))
+    end = len(samples) - int(rng.uniform(0, 0.2) * len(samples))
+    copy = samples[start:end] * rng.uniform(0.5, 1.0)
+    return (copy + rng.normal(0, 0.03, len(copy))).astype(np.float32)
+
+
+def catalog_fingerprint(seed: int, seconds: float) -> np.ndarray:
+    return fingerprint_samples(synthesize(seed, seconds))
+
+
+def copy_fingerprint(seed: int, seconds: float) -> np.ndarray:
+    return fingerprint_samples(distort(synthesize(seed, seconds), seed + 1))
+
+
+def percentile(values: list, share: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def run_benchmark(recordings: int, seconds: float, queries: int, workers: int):
+    mp_context = multiprocessing.get_context("spawn")
+    rng = np.random.default_rng(0)
+    ids = [str(ObjectId()) for _ in range(recordings)]
+
+    # Hashing throughput across the process pool
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+        fingerprints = list(pool.map(catalog_fingerprint, range(recordings), [seconds] * recordings, chunksize=8))
+    hashing = time.perf_counter() - started
+    pairs = sum(len(fingerprint) for fingerprint in fingerprints)
+    logger.info(
+        f"Hashed {recordings} recordings in {hashing:.1f}s: {recordings / hashing:.1f} recordings/s, "
+        f"{recordings * seconds / hashing:.0f}x realtime, {pairs / recordings:.0f} hashes each"
+    )
+
+    # Indexing throughput, including the duplicate check every upload gets
+    started = time.perf_counter()
+    for recitation_id, fingerprint in zip(ids, fingerprints):
+        fingerprint_indexer.index_recitation(recitation_id, fingerprint)
+    indexing = time.perf_counter() - started
+    logger.info(f"Indexed {recordings} recordings in {indexing:.1f}s: {recordings / indexing:.1f} recordings/s")
+
+    # Queries: distorted copies of catalog recordings, and recordings not in the catalog
+    originals = rng.choice(recordings, size=min(queries, recordings), replace=False).tolist()
+    unrelated = list(range(recordings, recordings + queries))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+        copies = list(pool.map(copy_fingerprint, originals, [seconds] * len(originals)))
+        strangers = list(pool.map(catalog_fingerprint, unrelated, [seconds] * len(unrelated)))
+
+    latencies, hits, copy_scores = [], 0, []
+    for original, fingerprint in zip(originals, copies):
+        started = time.perf_counter()
+        candidates = fingerprint_indexer.find_duplicates(fingerprint)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if candidates and candidates[0]["recitation_id"] == ids[original]:
+            hits += 1
+            copy_scores.append(candidates[0]["score"])
+
+    false_positives = 0
+    for fingerprint in strangers:
+        started = time.perf_counter()
+        candidates = fingerprint_indexer.find_duplicates(fingerprint)
+        latencies.append((time.perf_counter() - started) * 1000)
+        false_positives += bool(candidates)
+
+    print(f"catalog:          {recordings} recordings x {seconds:.0f}s")
+    print(f"hashing:          {recordings / hashing:.1f} recordings/s ({workers} workers)")
+    print(f"indexing:         {recordings / indexing:.1f} recordings/s")
+    print(f"query latency:    p50 {percentile(latencies, 0.5):.1f} ms, p95 {percentile(latencies, 0.95):.1f} ms")
+    print(f"copies found:     {hits}/{len(originals)} "
+          f"(median score {statistics.median(copy_scores) if copy_scores else 0:.3f})")
+    print(f"false positives:  {false_positives}/{len(strangers)} (min score {settings.fingerprint_min_score})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fingerprint indexing and duplicate queries")
+    parser.add_argument("--recordings", type=int, default=1000, help="Catalog size")
+    parser.add_argument("--seconds", type=float, default=60, help="Length of each recording")
+    parser.add_argument("--queries", type=int, default=100, help="Copies and unrelated recordings to query")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Worker processes")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database")
+    args = parser.parse_args()
+
+    db_manager.connect()
+    db_manager.client.drop_database(BENCH_DB)
+    # The indexer looks its collections up on db_manager, so point it at the scratch database
+    db_manager.db = db_manager.client[BENCH_DB]
+    db_manager.db.audio_fingerprints.create_index("hashes")
+    try:
+        run_benchmark(args.recordings, args.seconds, args.queries, args.workers)
+    finally:
+        if not args.keep:
+            db_manager.client.drop_database(BENCH_DB)
+        db_manager.disconnect()
+
+
+if __name__ == "__main__":
+    main()
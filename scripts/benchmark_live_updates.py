@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Live update load test for Quran Platform
+Opens many idle Server-Sent Event streams on /api/v1/live/likes against a
+running API, optionally toggles likes while they are open, and reports how
+long the streams took to open and how quickly like frames arrived.
+
+    python scripts/benchmark_live_updates.py --connections 10000 --seconds 30
+    python scripts/benchmark_live_updates.py --connections 2000 --like-token <id token>
+
+Raise the open file limit (ulimit -n) on both ends for large connection counts.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+import argparse
+import asyncio
+import json
+import logging
+import random
+import statistics
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class StreamStats:
+    def __init__(self):
+        self.opened = 0
+        self.failed = 0
+        self.open_ms = []
+        self.frames = 0
+        self.keepalives = 0
+        self.frame_delays_ms = []
+
+
+def fetch_ids(base_url: str, count: int) -> list:
+    with urlopen(f"{base_url}/api/v1/recitations?limit={count}&fields=id") as response:
+        return [recitation["id"] for recitation in json.loads(response.read())]
+
+
+async def follow(host: str, port: int, ids: list, stats: StreamStats, likes_sent: dict, stop: asyncio.Event):
+    started = time.perf_counter()
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(
+            f"GET /api/v1/live/likes?ids={','.join(ids)} HTTP/1.1\r\nHost: {host}\r\n"
+            f"Accept: text/event-stream\r\n\r\n".encode()
+        )
+        await writer.drain()
+        status = await reader.readline()
+        if b" 200 " not in status:
+            raise ConnectionError(status.decode().strip())
+        stats.opened += 1
+        stats.open_ms.append((time.perf_counter() - started) * 1000)
+    except Exception as e:
+        stats.failed += 1
+        logger.debug(f"Stream failed to open: {e}")
+        return
+
+    try:
+        while not stop.is_set():
+            try:
+                line = await asyncio.wait_for(reader.readline(), timeout=1.0)
+            except asyncio.TimeoutError:
+                continue
+            if not line:
+                break
+            if line.startswith(b": keepalive"):
+                stats.keepalives += 1
+            elif line.startswith(b"data: "):
+                stats.frames += 1
+                for recitation_id in json.loads(line[6:]):
+                    sent = likes_sent.get(recitation_id)
+                    if sent:
+                        stats.frame_delays_ms.append((time.perf_counter() - sent) * 1000)
+    finally:
+        writer.close()
+
+
+def toggle_likes(base_url: str, token: str, ids: list, likes_sent: dict, stop_at: float):
+    """Toggle likes on random followed IDs until stop_at (runs in a thread)"""
+    while time.perf_counter() < stop_at:
+        recitation_id = random.choice(ids)
+        likes_sent[recitation_id] = time.perf_counter()
+        request = Request(
+            f"{base_url}/api/v1/likes",
+            data=json.dumps({"recitation_id": recitation_id}).encode(),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {token}"},
+            method="POST"
+        )
+        urlopen(request).read()
+        time.sleep(0.05)
+
+
+async def run(base_url: str, connections: int, ids_per_stream: int, seconds: float, like_token: str):
+    ids = fetch_ids(base_url, 100)
+    if not ids:
+        raise SystemExit("No recitations to follow")
+    parts = urlsplit(base_url)
+    stats = StreamStats()
+    likes_sent = {}
+    stop = asyncio.Event()
+
+    streams = [
+        asyncio.create_task(follow(parts.hostname, parts.port or 80, random.sample(ids, min(ids_per_stream, len(ids))),
+                                   stats, likes_sent, stop))
+        for _ in range(connections)
+    ]
+    await asyncio.sleep(min(10, seconds / 3))
+    logger.info(f"{stats.opened} streams open, {stats.failed} failed")
+
+    if like_token:
+        await asyncio.to_thread(toggle_likes, base_url, like_token, ids, likes_sent, time.perf_counter() + seconds)
+    else:
+        await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*streams, return_exceptions=True)
+
+    print(f"streams:      {stats.opened} opened, {stats.failed} failed")
+    if stats.open_ms:
+        print(f"open time:    p50 {statistics.median(stats.open_ms):.0f} ms, max {max(stats.open_ms):.0f} ms")
+    print(f"frames:       {stats.frames} like frames, {stats.keepalives} keepalives")
+    if stats.frame_delays_ms:
+        delays = sorted(stats.frame_delays_ms)
+        print(f"like->frame:  p50 {delays[len(delays) // 2]:.0f} ms, p95 {delays[int(len(delays) * 0.95)]:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test live like-count streams")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--connections", type=int, default=1000, help="Streams to open")
+    parser.add_argument("--ids-per-stream", type=int, default=20, help="Recitations each stream follows")
+    parser.add_argument("--seconds", type=float, default=30, help="How long to keep the streams open")
+    parser.add_argument("--like-token", default="", help="Bearer token used to toggle likes during the run")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.base_url.rstrip("/"), args.connections, args.ids_per_stream, args.seconds, args.like_token))
+
+
+if __name__ == "__main__":
+    main()
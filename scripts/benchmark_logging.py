@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Logging overhead benchmark for Quran Platform
+Measures what logging costs the request thread under several setups. Each
+simulated request logs what an authenticated upload logs (token verified,
+recitation created) inside a request trace, so the request ID filter runs
+too. The output stream can be slowed down to stand in for a busy disk or
+log shipper.
+
+  sync-text     records written on the request thread (the previous setup)
+  async-json    JSON records handed to the listener thread through the queue
+  async-sampled async-json plus the default per-logger sampling
+  error-storm   one failing call site logging an error per request
+
+    python scripts/benchmark_logging.py --requests 100000
+    python scripts/benchmark_logging.py --sink-delay-us 50
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.logging_config import logging_setup
+from app.tracing import RequestTrace, current_trace
+import argparse
+import io
+import logging
+import time
+
+auth_logger = logging.getLogger("app.auth")
+service_logger = logging.getLogger("app.services")
+
+SETUPS = {
+    "sync-text": {"log_async": False, "log_format": "text", "log_sample_rates": {}},
+    "async-json": {"log_async": True, "log_format": "json", "log_sample_rates": {}},
+    "async-sampled": {"log_async": True, "log_format": "json", "log_sample_rates": {"app.auth": 0.01}},
+    "error-storm": {"log_async": True, "log_format": "json", "log_sample_rates": {"app.auth": 0.01}},
+}
+
+
+class SlowSink(io.TextIOBase):
+    """A write-only stream that takes delay_us per write call, like a slow disk or pipe"""
+
+    def __init__(self, delay_us: float):
+        self.delay = delay_us / 1_000_000
+        self.lines = 0
+
+    def write(self, text: str) -> int:
+        if self.delay:
+            time.sleep(self.delay)
+        self.lines += text.count("\n")
+        return len(text)
+
+
+def simulate_request(number: int, error: bool):
+    token = current_trace.set(RequestTrace(f"req-{number}", "POST", "/api/v1/upload"))
+    try:
+        auth_logger.info("Token verified for user: %s", f"user_{number % 1000}")
+        if error:
+            service_logger.error(f"Failed to create recitation: connection refused ({number})")
+        else:
+            service_logger.info("Recitation created successfully: %s", f"{number:024x}")
+    finally:
+        current_trace.reset(token)
+
+
+def run_setup(name: str, requests: int, sink_delay_us: float):
+    for key, value in SETUPS[name].items():
+        setattr(settings, key, value)
+    sink = SlowSink(sink_delay_us)
+    logging_setup.configure(stream=sink)
+
+    timings = []
+    for number in range(requests):
+        started = time.perf_counter()
+        simulate_request(number, error=name == "error-storm")
+        timings.append(time.perf_counter() - started)
+    drain_started = time.perf_counter()
+    stats = logging_setup.stats()
+    logging_setup.stop()
+    drain = time.perf_counter() - drain_started
+
+    timings.sort()
+    mean_us = sum(timings) / len(timings) * 1_000_000
+    print(f"{name:<14} mean {mean_us:>7.2f} us  p50 {timings[len(timings) // 2] * 1_000_000:>7.2f} us  "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1_000_000:>8.2f} us  written {sink.lines:>7}  "
+          f"dropped {stats['dropped']:>6}  sampled out {stats['sampled_out']:>6}  "
+          f"suppressed {stats['suppressed']:>6}  drain {drain * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-request logging overhead")
+    parser.add_argument("--requests", type=int, default=50000, help="Simulated requests per setup")
+    parser.add_argument("--sink-delay-us", type=float, default=0, help="Time each write to the output takes")
+    parser.add_argument("--setups", default=",".join(SETUPS), help="Comma-separated setups to run")
+    args = parser.parse_args()
+
+    for name in args.setups.split(","):
+        run_setup(name, args.requests, args.sink_delay_us)
+
+
+if __name__ == "__main__":
+    main()
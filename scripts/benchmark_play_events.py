@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Play event benchmark for Quran Platform
+Measures play ingestion at two levels:
+
+  buffer  PlayCounter.record() and flush() in-process, flushing into a
+          scratch database (no server needed)
+  http    POST /api/v1/events/plays against a running API with several
+          batch sizes and concurrent clients
+
+    python scripts/benchmark_play_events.py buffer --events 1000000 --recitations 20000
+    python scripts/benchmark_play_events.py http --base-url http://localhost:8000 --seconds 10
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import db_manager
+from app.play_counters import play_counter
+from bson import ObjectId
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import Request, urlopen
+import argparse
+import json
+import logging
+import random
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BENCH_DB = "quranApp_play_bench"
+
+
+def benchmark_buffer(events: int, recitations: int, batch_size: int):
+    db_manager.client.drop_database(BENCH_DB)
+    db = db_manager.client[BENCH_DB]
+    ids = [ObjectId() for _ in range(recitations)]
+    db.recitations.insert_many([{"_id": rid, "plays_count": 0} for rid in ids])
+    # The counter writes through its collection handle, so point it at the scratch database
+    play_counter.recitations_collection = db.recitations
+
+    rng = random.Random(0)
+    ids = [str(rid) for rid in ids]
+    # Skewed like real traffic: a few recitations get most plays
+    batches = [
+        [ids[min(int(rng.paretovariate(1.1)) - 1, recitations - 1)] for _ in range(batch_size)]
+        for _ in range(events // batch_size)
+    ]
+
+    started = time.perf_counter()
+    for batch in batches:
+        play_counter.record(batch)
+    recording = time.perf_counter() - started
+    pending = play_counter.stats()["pending_recitations"]
+
+    started = time.perf_counter()
+    play_counter.flush()
+    flushing = time.perf_counter() - started
+
+    total = sum(doc["plays_count"] for doc in db.recitations.find({}, {"plays_count": 1}))
+    print(f"record:  {len(batches) * batch_size / recording:,.0f} events/s (batches of {batch_size})")
+    print(f"flush:   {pending} recitations in {flushing * 1000:.0f} ms")
+    print(f"counted: {total} of {len(batches) * batch_size} events")
+    db_manager.client.drop_database(BENCH_DB)
+
+
+def post(url: str, body: bytes, token: str) -> int:
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    with urlopen(Request(url, data=body, headers=headers, method="POST")) as response:
+        return json.loads(response.read())["accepted"]
+
+
+def benchmark_http(base_url: str, seconds: float, clients: int, batch_sizes, token: str):
+    url = f"{base_url.rstrip('/')}/api/v1/events/plays"
+    ids = [str(ObjectId()) for _ in range(1000)]
+    for batch_size in batch_sizes:
+        events = [{"recitation_id": random.choice(ids)} for _ in range(batch_size)]
+        body = json.dumps(events[0] if batch_size == 1 else {"events": events}).encode()
+
+        def client():
+            accepted = requests = 0
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                accepted += post(url, body, token)
+                requests += 1
+            return accepted, requests
+
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            results = list(pool.map(lambda _: client(), range(clients)))
+        accepted = sum(result[0] for result in results)
+        requests = sum(result[1] for result in results)
+        print(f"batch {batch_size:>5}: {accepted / seconds:>10,.0f} events/s, {requests / seconds:>8,.0f} requests/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark play event ingestion")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+    buffer_parser = subparsers.add_parser("buffer", help="In-process buffer and flush")
+    buffer_parser.add_argument("--events", type=int, default=1000000, help="Events to record")
+    buffer_parser.add_argument("--recitations", type=int, default=20000, help="Distinct recitations")
+    buffer_parser.add_argument("--batch-size", type=int, default=100, help="Events per record() call")
+    http_parser = subparsers.add_parser("http", help="POST /api/v1/events/plays against a running API")
+    http_parser.add_argument("--base-url", default="http://localhost:8000", help="API base URL")
+    http_parser.add_argument("--seconds", type=float, default=10, help="Duration per batch size")
+    http_parser.add_argument("--clients", type=int, default=8, help="Concurrent clients")
+    http_parser.add_argument("--batch-sizes", default="1,100,1000", help="Comma-separated batch sizes")
+    http_parser.add_argument("--token", default="", help="Bearer token, if the deployment requires one")
+    args = parser.parse_args()
+
+    if args.mode == "http":
+        benchmark_http(args.base_url, args.seconds, args.clients,
+                       [int(size) for size in args.batch_sizes.split(",")], args.token)
+        return
+
+    db_manager.connect()
+    try:
+        benchmark_buffer(args.events, args.recitations, args.batch_size)
+    finally:
+        db_manager.disconnect()
+
+
+if __name__ == "__main__":
+    main()
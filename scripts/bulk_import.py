@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Bulk archive importer for Quran Platform
+Uploads a directory of recitation audio to S3 in parallel and inserts the
+recitations from a CSV or JSON manifest in batches.
+
+The manifest has one row per file: a "file" column with the path relative to
+the directory, plus the RecitationCreate fields (title, reciter_name,
+masjid_name, masjid_location, surah_name, surah_number, ayah_start, ayah_end,
+description, tags). In CSV, tags are comma-separated.
+
+    python scripts/bulk_import.py /archive/masjid manifest.csv --uploader-id <uid>
+
+Progress is appended to a checkpoint file after every inserted batch, so an
+interrupted import can be re-run with the same arguments and skips the files
+that are already in. S3 keys are derived from the file path, so audio that was
+uploaded but not yet inserted is overwritten rather than duplicated. The S3 key
+is also stored as the recitation's unique import_key, so a batch inserted just
+before a crash, but not yet checkpointed, is recognised instead of inserted again.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.s3_client import s3_manager
+from app.services import recitation_service
+from app.models import RecitationCreate
+from pydantic import ValidationError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import logging
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+    ".aac": "audio/aac",
+    ".wav": "audio/wav",
+    ".ogg": "audio/ogg",
+    ".flac": "audio/flac",
+}
+
+INT_FIELDS = ("surah_number", "ayah_start", "ayah_end")
+
+
+def load_manifest(path: str) -> list:
+    """Read manifest rows from a CSV or JSON file"""
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    rows = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            row = {key: value.strip() for key, value in row.items() if value and value.strip()}
+            if "tags" in row:
+                row["tags"] = [tag.strip() for tag in row["tags"].split(",") if tag.strip()]
+            for field in INT_FIELDS:
+                if field in row:
+                    row[field] = int(row[field])
+            rows.append(row)
+    return rows
+
+
+def load_checkpoint(path: str) -> set:
+    """Files already imported by a previous run"""
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                done.add(json.loads(line)["file"])
+    return done
+
+
+def s3_key_for(uploader_id: str, relative_path: str) -> str:
+    """Deterministic S3 key, so a resumed import overwrites instead of duplicating"""
+    digest = hashlib.sha1(relative_path.encode("utf-8")).hexdigest()[:16]
+    extension = os.path.splitext(relative_path)[1].lower()
+    return f"imports/{uploader_id}/{digest}{extension}"
+
+
+def upload(directory: str, relative_path: str, uploader_id: str):
+    """Upload one file; returns (audio_url, size in bytes)"""
+    path = os.path.join(directory, relative_path)
+    content_type = CONTENT_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+    url = s3_manager.upload_local_file(path, s3_key_for(uploader_id, relative_path), content_type)
+    return url, os.path.getsize(path)
+
+
+class ImportStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.bytes_uploaded = 0
+        self.uploaded = 0
+        self.inserted = 0
+        self.failed = 0
+
+    def report(self, prefix: str = "Progress"):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        logger.info(
+            f"{prefix}: {self.uploaded} uploaded, {self.inserted} inserted, {self.failed} failed; "
+            f"{self.bytes_uploaded / elapsed / (1024 * 1024):.2f} MB/s, {self.inserted / elapsed:.1f} docs/s"
+        )
+
+
+def bulk_import(directory: str, manifest_path: str, uploader_id: str, workers: int,
+                batch_size: int, checkpoint_path: str) -> ImportStats:
+    """Upload and insert every manifest row that is not in the checkpoint yet"""
+    rows = load_manifest(manifest_path)
+    done = load_checkpoint(checkpoint_path)
+    stats = ImportStats()
+
+    # Validate everything up front so a bad row fails fast instead of mid-import
+    pending = []
+    for number, row in enumerate(rows, start=1):
+        relative_path = row.get("file")
+        if not relative_path:
+            logger.error(f"Manifest row {number}: missing 'file'")
+            stats.failed += 1
+            continue
+        if relative_path in done:
+            continue
+        if not os.path.isfile(os.path.join(directory, relative_path)):
+            logger.error(f"Manifest row {number}: {relative_path} not found")
+            stats.failed += 1
+            continue
+        try:
+            recitation_data = RecitationCreate(**{k: v for k, v in row.items() if k != "file"})
+        except ValidationError as e:
+            logger.error(f"Manifest row {number} ({relative_path}) is invalid: {e}")
+            stats.failed += 1
+            continue
+        pending.append((relative_path, recitation_data))
+
+    logger.info(f"{len(pending)} files to import, {len(done)} already imported")
+    if not pending:
+        return stats
+
+    s3_manager.initialize()
+    batch = []
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+
+        def flush():
+            try:
+                inserted_ids = asyncio.run(recitation_service.create_recitations_bulk(
+                    [(recitation_data, audio_url) for _, recitation_data, audio_url in batch], uploader_id,
+                    import_keys=[s3_key_for(uploader_id, relative_path) for relative_path, _, _ in batch]
+                ))
+            except Exception as e:
+                # Leave the batch out of the checkpoint; a re-run picks it up by import_key
+                logger.error(f"Insert of a batch of {len(batch)} failed: {e}")
+                inserted_ids = [None] * len(batch)
+            for (relative_path, _, _), recitation_id in zip(batch, inserted_ids):
+                if recitation_id is None:
+                    stats.failed += 1
+                    continue
+                checkpoint.write(json.dumps({"file": relative_path, "recitation_id": recitation_id}) + "\n")
+                stats.inserted += 1
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+            batch.clear()
+            stats.report()
+
+        futures = {
+            pool.submit(upload, directory, relative_path, uploader_id): (relative_path, recitation_data)
+            for relative_path, recitation_data in pending
+        }
+        for future in as_completed(futures):
+            relative_path, recitation_data = futures[future]
+            try:
+                audio_url, size = future.result()
+            except Exception as e:
+                logger.error(f"Upload of {relative_path} failed: {e}")
+                audio_url, size = None, 0
+            if not audio_url:
+                stats.failed += 1
+                continue
+            stats.uploaded += 1
+            stats.bytes_uploaded += size
+            batch.append((relative_path, recitation_data, audio_url))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+    stats.report("Import finished")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import a recitation archive")
+    parser.add_argument("directory", help="Directory containing the audio files")
+    parser.add_argument("manifest", help="CSV or JSON manifest of recitation metadata")
+    parser.add_argument("--uploader-id", required=True, help="User ID recorded as the uploader")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent S3 uploads")
+    parser.add_argument("--batch-size", type=int, default=200, help="Documents per insert_many")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <manifest>.checkpoint)")
+    args = parser.parse_args()
+
+    stats = bulk_import(
+        args.directory,
+        args.manifest,
+        args.uploader_id,
+        args.workers,
+        args.batch_size,
+        args.checkpoint or f"{args.manifest}.checkpoint"
+    )
+    sys.exit(1 if stats.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
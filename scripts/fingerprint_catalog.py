@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Fingerprint backfill script for Quran Platform
+Fingerprints recitations that are not in audio_fingerprints yet (uploads from
+before fingerprinting, bulk imports, or uploads dropped from a full queue)
+and records their likely duplicates.
+
+    python scripts/fingerprint_catalog.py --status pending --workers 8
+
+Requires ffmpeg on the PATH (or FINGERPRINT_FFMPEG_PATH).
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.database import db_manager
+from app.fingerprint import fingerprint_indexer, fingerprint_source
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import logging
+import multiprocessing
+import shutil
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def missing_recitations(status: str, limit: int) -> list:
+    """(recitation_id, audio_url) of recitations without a fingerprint"""
+    db = db_manager.get_db()
+    indexed = {doc["_id"] for doc in db.audio_fingerprints.find({}, {"_id": 1})}
+    query = {"status": status} if status else {}
+    missing = []
+    for doc in db.recitations.find(query, {"audio_url": 1}).sort("created_at", 1):
+        if str(doc["_id"]) not in indexed and doc.get("audio_url"):
+            missing.append((str(doc["_id"]), doc["audio_url"]))
+            if limit and len(missing) >= limit:
+                break
+    return missing
+
+
+def backfill(status: str, workers: int, limit: int):
+    pending = missing_recitations(status, limit)
+    logger.info(f"{len(pending)} recitations to fingerprint")
+    started = time.perf_counter()
+    done = failed = duplicates = 0
+
+    # Submitted oldest first, so earlier uploads are mostly indexed before the copies that match them
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {
+            pool.submit(
+                fingerprint_source, audio_url, settings.fingerprint_max_seconds,
+                settings.fingerprint_ffmpeg_path, settings.fingerprint_decode_timeout_seconds
+            ): recitation_id
+            for recitation_id, audio_url in pending
+        }
+        for future in as_completed(futures):
+            recitation_id = futures[future]
+            try:
+                candidates = fingerprint_indexer.index_recitation(recitation_id, future.result())
+            except Exception as e:
+                logger.error(f"Failed to fingerprint {recitation_id}: {e}")
+                failed += 1
+                continue
+            done += 1
+            if candidates:
+                duplicates += 1
+            if done % 100 == 0:
+                logger.info(f"{done} fingerprinted, {done / (time.perf_counter() - started):.1f}/s")
+
+    logger.info(f"Backfill finished: {done} fingerprinted, {duplicates} with likely duplicates, {failed} failed")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fingerprint recitations missing from the index")
+    parser.add_argument("--status", default="", help="Only recitations with this status (default: all)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Worker processes")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many recitations")
+    args = parser.parse_args()
+    if shutil.which(settings.fingerprint_ffmpeg_path) is None:
+        parser.error(f"'{settings.fingerprint_ffmpeg_path}' not found; install ffmpeg or set FINGERPRINT_FFMPEG_PATH")
+
+    db_manager.connect()
+    try:
+        failed = backfill(args.status, args.workers, args.limit)
+    finally:
+        db_manager.disconnect()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
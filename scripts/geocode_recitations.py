@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Masjid coordinate backfill for Quran Platform
+Resolves masjid_geo for recitations stored before nearby search, or for all
+recitations after the gazetteer (app/data/masjids.json or GAZETTEER_PATH)
+has been extended. Uses the bundled gazetteer only; nothing is geocoded
+over the network.
+
+    python scripts/geocode_recitations.py
+    python scripts/geocode_recitations.py --all --dry-run
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import db_manager
+from app.geo import gazetteer
+from collections import Counter
+from pymongo import UpdateOne
+import argparse
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def geocode(all_recitations: bool, dry_run: bool):
+    db = db_manager.get_db()
+    query = {} if all_recitations else {"masjid_geo": {"$exists": False}}
+    cursor = db.recitations.find(query, {"masjid_name": 1, "masjid_location": 1, "masjid_geo": 1})
+
+    resolved = Counter()
+    unresolved = Counter()
+    operations = []
+    for doc in cursor:
+        geo_fields = gazetteer.geo_fields(doc.get("masjid_name"), doc.get("masjid_location"))
+        if geo_fields:
+            resolved[geo_fields["masjid_geo_precision"]] += 1
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": geo_fields}))
+        else:
+            if doc.get("masjid_name") or doc.get("masjid_location"):
+                unresolved[(doc.get("masjid_name") or "", doc.get("masjid_location") or "")] += 1
+            if "masjid_geo" in doc:
+                # The gazetteer no longer knows this masjid
+                operations.append(UpdateOne(
+                    {"_id": doc["_id"]}, {"$unset": {"masjid_geo": "", "masjid_geo_precision": ""}}
+                ))
+        if len(operations) >= BATCH_SIZE:
+            if not dry_run:
+                db.recitations.bulk_write(operations, ordered=False)
+            operations = []
+    if operations and not dry_run:
+        db.recitations.bulk_write(operations, ordered=False)
+
+    logger.info(
+        f"{'Would resolve' if dry_run else 'Resolved'} {resolved['masjid']} recitations to a masjid "
+        f"and {resolved['city']} to a city; {sum(unresolved.values())} with a masjid left unresolved"
+    )
+    # The most common unknown places are the best gazetteer additions
+    for (masjid_name, masjid_location), count in unresolved.most_common(20):
+        logger.info(f"  unresolved x{count}: {masjid_name!r} / {masjid_location!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve masjid coordinates from the gazetteer")
+    parser.add_argument("--all", action="store_true", help="Re-resolve recitations that already have coordinates")
+    parser.add_argument("--dry-run", action="store_true", help="Report without writing")
+    args = parser.parse_args()
+
+    db_manager.connect()
+    try:
+        geocode(args.all, args.dry_run)
+    finally:
+        db_manager.disconnect()
+
+
+if __name__ == "__main__":
+    main()
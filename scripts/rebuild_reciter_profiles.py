@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Reciter profile rebuild for Quran Platform
+Recomputes the reciters collection from the approved recitations with one
+aggregation that $merges into it (MongoDB 4.2+), then removes profiles of
+reciters with no approved recitations left. Use it to backfill profiles for
+an existing catalog, or to correct drift in the incrementally maintained
+counts.
+
+    python scripts/rebuild_reciter_profiles.py
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import db_manager
+from app.reciter_profiles import reciter_profiles
+import logging
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    db_manager.connect()
+    try:
+        started = time.perf_counter()
+        removed = reciter_profiles.rebuild()
+        count = db_manager.get_db().reciters.count_documents({})
+        logger.info(
+            f"Rebuilt {count} reciter profiles in {time.perf_counter() - started:.1f}s; "
+            f"removed {removed} with no approved recitations"
+        )
+    finally:
+        db_manager.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Tag statistics reconcile for Quran Platform
+Recomputes tag_stats and tag_cooccurrence from the approved recitations and
+rewrites whatever has drifted. Run it once to backfill the tables for an
+existing catalog; the API repeats it every
+TAG_STATS_RECONCILE_INTERVAL_SECONDS (or schedule this script instead when
+that is 0).
+
+    python scripts/reconcile_tag_stats.py
+    python scripts/reconcile_tag_stats.py --dry-run
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import db_manager
+from app.tag_stats import tag_stats
+import argparse
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute tag statistics from the catalog")
+    parser.add_argument("--dry-run", action="store_true", help="Report drift without writing")
+    args = parser.parse_args()
+
+    db_manager.connect()
+    try:
+        drift = tag_stats.reconcile(dry_run=args.dry_run)
+        logger.info(
+            f"{drift['tags']} tags and {drift['pairs']} related pairs in the catalog; "
+            f"{'would fix' if args.dry_run else 'fixed'} {drift['tags_fixed']} tags and {drift['pairs_fixed']} pairs, "
+            f"{'would remove' if args.dry_run else 'removed'} {drift['tags_removed']} tags and {drift['pairs_removed']} pairs"
+        )
+    finally:
+        db_manager.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,9 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from app.config import settings
 from app.database import db_manager
-from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, TEXT
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -22,45 +23,15 @@ def setup_database():
         db = db_manager.get_db()
         
         # Create collections
-        collections = ['recitations', 'likes', 'users']
+        collections = ['recitations', 'likes', 'users', 'like_counter_shards', 'audio_fingerprints']
         
         for collection_name in collections:
             if collection_name not in db.list_collection_names():
                 db.create_collection(collection_name)
                 logger.info(f"Created collection: {collection_name}")
         
-        # Create indexes for recitations collection
-        recitations = db.recitations
-        
-        # Text search indexes
-        recitations.create_index([("title", TEXT), ("reciter_name", TEXT), ("surah_name", TEXT)])
-        recitations.create_index([("reciter_name", ASCENDING)])
-        recitations.create_index([("surah_name", ASCENDING)])
-        recitations.create_index([("uploader_id", ASCENDING)])
-        recitations.create_index([("status", ASCENDING)])
-        recitations.create_index([("created_at", DESCENDING)])
-        recitations.create_index([("likes_count", DESCENDING)])
-        
-        # Compound indexes for better query performance
-        recitations.create_index([("status", ASCENDING), ("created_at", DESCENDING)])
-        recitations.create_index([("uploader_id", ASCENDING), ("status", ASCENDING)])
-        
-        logger.info("Created indexes for recitations collection")
-        
-        # Create indexes for likes collection
-        likes = db.likes
-        likes.create_index([("user_id", ASCENDING), ("recitation_id", ASCENDING)], unique=True)
-        likes.create_index([("recitation_id", ASCENDING)])
-        likes.create_index([("user_id", ASCENDING)])
-        
-        logger.info("Created indexes for likes collection")
-        
-        # Create indexes for users collection (if needed)
-        users = db.users
-        users.create_index([("email", ASCENDING)], unique=True)
-        users.create_index([("created_at", DESCENDING)])
-        
-        logger.info("Created indexes for users collection")
+        create_indexes(db)
+        backfill_changed_at(db)
         
         logger.info("Database setup completed successfully!")
         
@@ -68,5 +39,106 @@ def setup_database():
         logger.error(f"Database setup failed: {e}")
         raise
 
+def backfill_changed_at(db):
+    """Give recitations written before changed_at existed one, so delta sync sees them"""
+    result = db.recitations.update_many(
+        {"changed_at": {"$exists": False}},
+        [{"$set": {"changed_at": "$updated_at"}}]
+    )
+    if result.modified_count:
+        logger.info(f"Backfilled changed_at on {result.modified_count} recitations")
+
+def create_indexes(db):
+    """Create the indexes for every collection"""
+    # Create indexes for recitations collection
+    recitations = db.recitations
+    
+    # Text search indexes
+    recitations.create_index([("title", TEXT), ("reciter_name", TEXT), ("surah_name", TEXT)])
+    # Also serves reciter_name lookups; newest approved uploads per reciter for profiles
+    recitations.create_index([("reciter_name", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)])
+    recitations.create_index([("surah_name", ASCENDING)])
+    recitations.create_index([("uploader_id", ASCENDING)])
+    recitations.create_index([("status", ASCENDING)])
+    recitations.create_index([("created_at", DESCENDING)])
+    recitations.create_index([("likes_count", DESCENDING)])
+    recitations.create_index([("plays_count", DESCENDING)])
+    
+    # Compound indexes for better query performance
+    recitations.create_index([("status", ASCENDING), ("created_at", DESCENDING)])
+    recitations.create_index([("uploader_id", ASCENDING), ("status", ASCENDING)])
+    recitations.create_index([("updated_at", ASCENDING), ("_id", ASCENDING)])
+    # Delta sync pages approved recitations by changed_at, which like counts also move
+    recitations.create_index([("status", ASCENDING), ("changed_at", ASCENDING), ("_id", ASCENDING)])
+    
+    # Masjid coordinates for nearby search
+    recitations.create_index([("masjid_geo", GEOSPHERE), ("status", ASCENDING)])
+    
+    # Sharded like counters, reconciled against the likes collection
+    recitations.create_index([("like_shards", ASCENDING)], sparse=True)
+    
+    # Bulk imports tag each recitation with its S3 key so re-runs cannot insert it twice
+    recitations.create_index([("import_key", ASCENDING)], unique=True, sparse=True)
+    
+    logger.info("Created indexes for recitations collection")
+    
+    # Create indexes for likes collection
+    likes = db.likes
+    likes.create_index([("user_id", ASCENDING), ("recitation_id", ASCENDING)], unique=True)
+    likes.create_index([("recitation_id", ASCENDING)])
+    likes.create_index([("user_id", ASCENDING)])
+    likes.create_index([("created_at", ASCENDING), ("_id", ASCENDING)])
+    likes.create_index([("user_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)])
+    
+    logger.info("Created indexes for likes collection")
+    
+    # Create indexes for sharded like counters
+    like_counter_shards = db.like_counter_shards
+    like_counter_shards.create_index([("recitation_id", ASCENDING)])
+    like_counter_shards.create_index([("count", ASCENDING)])
+    
+    logger.info("Created indexes for like_counter_shards collection")
+    
+    # Create the inverted index for audio fingerprints
+    audio_fingerprints = db.audio_fingerprints
+    audio_fingerprints.create_index([("hashes", ASCENDING)])
+    
+    logger.info("Created indexes for audio_fingerprints collection")
+    
+    # Create indexes for tag statistics (_id is the tag, so prefix browsing uses the _id index)
+    tag_stats = db.tag_stats
+    tag_stats.create_index([("recitations", DESCENDING), ("_id", ASCENDING)])
+    tag_stats.create_index([("likes", DESCENDING), ("_id", ASCENDING)])
+    tag_cooccurrence = db.tag_cooccurrence
+    tag_cooccurrence.create_index([("tag", ASCENDING), ("related", ASCENDING)], unique=True)
+    tag_cooccurrence.create_index([("tag", ASCENDING), ("count", DESCENDING), ("related", ASCENDING)])
+    
+    logger.info("Created indexes for tag_stats and tag_cooccurrence collections")
+    
+    # Create indexes for playlists; items are paged and placed by their ordering key
+    playlists = db.playlists
+    playlists.create_index([("owner_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)])
+    playlist_items = db.playlist_items
+    playlist_items.create_index([("playlist_id", ASCENDING), ("position", ASCENDING)], unique=True)
+    playlist_items.create_index([("playlist_id", ASCENDING), ("recitation_id", ASCENDING)])
+    
+    logger.info("Created indexes for playlists and playlist_items collections")
+    
+    # Create indexes for delta sync tombstones, which expire with the oldest accepted sync token
+    tombstones = db.tombstones
+    tombstones.create_index([("collection", ASCENDING), ("user_id", ASCENDING),
+                             ("removed_at", ASCENDING), ("_id", ASCENDING)])
+    tombstones.create_index([("removed_at", ASCENDING)],
+                            expireAfterSeconds=settings.sync_tombstone_retention_days * 86400)
+    
+    logger.info("Created indexes for tombstones collection")
+    
+    # Create indexes for users collection (if needed)
+    users = db.users
+    users.create_index([("email", ASCENDING)], unique=True)
+    users.create_index([("created_at", DESCENDING)])
+    
+    logger.info("Created indexes for users collection")
+
 if __name__ == "__main__":
     setup_database() 
\ No newline at end of file